@@ -1,38 +1,1871 @@
-#To Toogle the Monte Carlo Simulation, go to line 3450
-#To Edit iteration count of Monte Carlo Simulation, go to line 3451
+#To Toogle the Monte Carlo Simulation, set run_monte_carlo in main()
+#To Edit iteration count of Monte Carlo Simulation, set monte_carlo_iterations in main()
 #Create an .env file to store your API keys (line 44-46)  
 
 import os
+import json
+import zlib
+import hashlib
+import sqlite3
+import zipfile
+import threading
+import pickle
+import atexit
+import asyncio
+import contextvars
+import functools
+import concurrent.futures
 import numpy as np
 import pandas as pd
 import yfinance as yf
 import time
 from datetime import datetime 
 import matplotlib.pyplot as plt
-from tqdm import tqdm
-import random
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from sec_api import QueryApi, RenderApi
 import pandas_datareader as pdr
 import traceback
+import random
+from collections import OrderedDict, deque
+from collections.abc import Mapping
 from scipy import stats
+try:
+    import pyarrow  # Parquet support for FundamentalsStore
+except ImportError:
+    pyarrow = None
 import warnings
 
-warnings.filterwarnings('ignore', category=RuntimeWarning) 
+warnings.filterwarnings('ignore', category=RuntimeWarning) 
+    
+# If you make seperate files for the main functions, be sure to install: 
+# from wacc_calculator import calculate_wacc
+# from growth_rate_estimator import calculate_growth_rates
+# from terminal_value_calculator import calculate_terminal_value
+
+# Local cache directory for persisted responses and datasets (override with DCF_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.environ.get('DCF_CACHE_DIR', '.dcf_cache')
+
+
+class StoredResponse:
+    """
+    Minimal stand-in for requests.Response used for responses served from local storage.
+    """
+    
+    def __init__(self, status_code, content, headers=None, url=None, from_cache=False):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+        self.from_cache = from_cache
+    
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+    
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+    
+    def json(self):
+        return json.loads(self.content)
+
+
+class ReplayMissError(Exception):
+    """A replayed run made a request that is not in the fixture archive"""
+
+
+class RecordedCallError(Exception):
+    """Replayed failure of a recorded call whose original exception could not be stored"""
+
+
+class NetworkRecorder:
+    """
+    Record/replay of all network I/O for deterministic offline runs.
+    
+    In 'record' mode every HTTP GET made through HTTPSessionPool and every yfinance,
+    pandas_datareader and sec-api call made through recorded_call() runs live and its
+    result (or exception) is kept; save() writes them to a compact zip archive. In
+    'replay' mode the same requests are answered from the archive, optionally after an
+    injected latency, and anything missing raises ReplayMissError.
+    
+    API keys in query strings are redacted from request keys, so archives can be shared
+    and replayed with placeholder keys. Results are stored with pickle: only replay
+    archives you recorded yourself. Record with an empty DCF_CACHE_DIR so that responses
+    served from local caches are captured too.
+    """
+    
+    # Query parameters dropped from request keys
+    SECRET_PARAMS = ('apikey', 'api_key', 'token')
+    
+    def __init__(self, archive_path, mode='replay', latency=0.0):
+        """
+        Initialize the recorder.
+        
+        Args:
+            archive_path (str): Zip archive of recorded responses
+            mode (str): 'record' or 'replay'
+            latency (float or callable): Seconds to wait per replayed request, or a
+                function of the request key returning seconds
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown network recorder mode: {mode}")
+        self.archive_path = archive_path
+        self.mode = mode
+        self.latency = latency
+        self._entries = {}
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self._load()
+        else:
+            atexit.register(self.save)
+    
+    def http_get(self, url, fetch, params=None):
+        """
+        Record or replay an HTTP GET.
+        
+        Args:
+            url (str): Request URL
+            fetch (callable): Performs the live request, returns a response
+            params (dict): Query parameters passed separately from the URL
+        
+        Returns:
+            Response object (StoredResponse when replayed)
+        """
+        key = ('GET', self._redact(url), tuple(sorted((k, str(v)) for k, v in (params or {}).items()
+                                                      if k.lower() not in self.SECRET_PARAMS)))
+        if self.mode == 'replay':
+            entry = self._replay(key)
+            return StoredResponse(entry['status_code'], entry['content'], entry['headers'], url)
+        
+        try:
+            response = fetch()
+        except Exception as e:
+            self._store(key, {'error': self._portable_error(e)})
+            raise
+        self._store(key, {'value': {
+            'status_code': response.status_code,
+            'content': response.content,
+            'headers': {name: value for name, value in response.headers.items()
+                        if name.lower() in ('content-type', 'etag', 'last-modified', 'retry-after')}
+        }})
+        return response
+    
+    def call(self, key, func):
+        """
+        Record or replay a library call (yfinance, pandas_datareader, ...).
+        
+        Args:
+            key (tuple): Picklable, deterministic description of the call
+            func (callable): Performs the live call
+        
+        Returns:
+            The call's result
+        """
+        if self.mode == 'replay':
+            return self._replay(key)
+        try:
+            value = func()
+        except Exception as e:
+            self._store(key, {'error': self._portable_error(e)})
+            raise
+        self._store(key, {'value': value})
+        return value
+    
+    def save(self):
+        """Write recorded entries to the archive (record mode)"""
+        if self.mode != 'record':
+            return
+        with self._lock:
+            entries = dict(self._entries)
+        os.makedirs(os.path.dirname(os.path.abspath(self.archive_path)), exist_ok=True)
+        tmp_path = f"{self.archive_path}.tmp"
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            index = {}
+            for key, entry in entries.items():
+                name = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+                archive.writestr(name, pickle.dumps((key, entry), protocol=pickle.HIGHEST_PROTOCOL))
+                index[name] = repr(key)
+            archive.writestr('index.json', json.dumps(index, indent=1))
+        os.replace(tmp_path, self.archive_path)
+        print(f"Recorded {len(entries)} network responses to {self.archive_path}")
+    
+    def _replay(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            raise ReplayMissError(f"No recorded response for {key!r}")
+        delay = self.latency(key) if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+        if 'error' in entry:
+            raise entry['error']
+        return entry['value']
+    
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+    
+    def _load(self):
+        with zipfile.ZipFile(self.archive_path) as archive:
+            for name in archive.namelist():
+                if name != 'index.json':
+                    key, entry = pickle.loads(archive.read(name))
+                    self._entries[key] = entry
+    
+    def _redact(self, url):
+        parsed = urlparse(url)
+        if not parsed.query:
+            return url
+        query = '&'.join(part for part in parsed.query.split('&')
+                         if part.split('=', 1)[0].lower() not in self.SECRET_PARAMS)
+        return parsed._replace(query=query).geturl()
+    
+    @staticmethod
+    def _portable_error(error):
+        """The exception itself if it survives pickling, else a RecordedCallError with its message"""
+        try:
+            pickle.loads(pickle.dumps(error))
+            return error
+        except Exception:
+            return RecordedCallError(f"{type(error).__name__}: {error}")
+
+
+# Active recorder (None for live network access)
+_network_recorder = None
+
+def get_network_recorder():
+    """The active NetworkRecorder, or None"""
+    return _network_recorder
+
+def set_network_recorder(recorder):
+    """Route network I/O through a NetworkRecorder (None to go back to live access)"""
+    global _network_recorder
+    _network_recorder = recorder
+
+def network_recorder_from_env():
+    """
+    Recorder configured by DCF_NETWORK_MODE (record/replay), DCF_NETWORK_ARCHIVE and
+    DCF_REPLAY_LATENCY (seconds per request), or None when DCF_NETWORK_MODE is unset.
+    """
+    mode = os.environ.get('DCF_NETWORK_MODE')
+    if not mode:
+        return None
+    archive_path = os.environ.get('DCF_NETWORK_ARCHIVE', os.path.join(DEFAULT_CACHE_DIR, 'network_fixtures.zip'))
+    return NetworkRecorder(archive_path, mode, float(os.environ.get('DCF_REPLAY_LATENCY', 0)))
+
+def recorded_call(key, func):
+    """Run a library call that hits the network, through the active recorder if any"""
+    recorder = _network_recorder
+    return recorder.call(key, func) if recorder else func()
+
+def _yf_download(tickers, **kwargs):
+    """yf.download through the active recorder"""
+    key = ('yf.download', tuple(tickers), tuple(sorted(kwargs.items())))
+    return recorded_call(key, lambda: yf.download(tickers, **kwargs))
+
+def _get_data_fred(series_id, start=None):
+    """pdr.get_data_fred through the active recorder"""
+    key = ('pdr.get_data_fred', series_id, str(start) if start is not None else None)
+    return recorded_call(key, lambda: pdr.get_data_fred(series_id, start=start))
+
+
+class HTTPSessionPool:
+    """
+    Pooled keep-alive HTTP sessions, one requests.Session per host.
+    
+    Reusing sessions avoids a new TCP+TLS handshake on every request. Sessions are
+    created lazily under a lock and their connection pools can be shared by threads.
+    """
+    
+    def __init__(self, pool_size=10, retries=2, backoff_factor=0.5, timeout=(5, 30)):
+        """
+        Initialize the pool.
+        
+        Args:
+            pool_size (int): Maximum pooled connections per host
+            retries (int): Retries for failed connections/reads (HTTP error statuses are left to the caller)
+            backoff_factor (float): urllib3 backoff factor between connection retries
+            timeout (float or tuple): Default (connect, read) timeout in seconds
+        """
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+    
+    def session_for(self, url):
+        """Keep-alive session for the host of a URL"""
+        host = urlparse(url).netloc
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._create_session()
+                    self._sessions[host] = session
+        return session
+    
+    def get(self, url, **kwargs):
+        """GET a URL on the pooled session for its host (drop-in for requests.get)"""
+        kwargs.setdefault('timeout', self.timeout)
+        recorder = get_network_recorder()
+        if recorder:
+            return recorder.http_get(url, lambda: self.session_for(url).get(url, **kwargs), kwargs.get('params'))
+        return self.session_for(url).get(url, **kwargs)
+    
+    def close(self):
+        """Close every pooled session"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+    
+    def _create_session(self):
+        retry = Retry(total=self.retries, connect=self.retries, read=self.retries, status=0,
+                      backoff_factor=self.backoff_factor, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+# Session pool shared by the module-level helpers (and FinancialDataAcquisition by default)
+_shared_session_pool = None
+_shared_session_pool_lock = threading.Lock()
+
+def get_shared_session_pool():
+    """Process-wide HTTPSessionPool, created on first use"""
+    global _shared_session_pool
+    if _shared_session_pool is None:
+        with _shared_session_pool_lock:
+            if _shared_session_pool is None:
+                _shared_session_pool = HTTPSessionPool()
+    return _shared_session_pool
+
+def set_shared_session_pool(session_pool):
+    """Make module-level helpers reuse the given HTTPSessionPool"""
+    global _shared_session_pool
+    with _shared_session_pool_lock:
+        _shared_session_pool = session_pool
+
+
+class ProviderCallCancelled(Exception):
+    """A hedged provider call was abandoned because another provider already answered"""
+
+
+# Set while a hedged provider call runs (see FinancialDataAcquisition._race_providers);
+# once set, the call's next rate-limited request raises ProviderCallCancelled
+_provider_cancel_event = contextvars.ContextVar('provider_cancel_event', default=None)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second up to `capacity`.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        """
+        Initialize a full bucket.
+        
+        Args:
+            rate (float): Tokens added per second (sustained requests per second)
+            capacity (float): Maximum burst size (defaults to max(1, rate))
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=1, cancel=None):
+        """
+        Take tokens, blocking until enough have accumulated.
+        
+        Args:
+            tokens (float): Tokens to take
+            cancel (threading.Event): Stop waiting, without taking tokens, once this is set
+        
+        Returns:
+            float: Seconds spent waiting
+        
+        Raises:
+            ProviderCallCancelled: If cancel was set before the tokens were taken
+        """
+        waited = 0.0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise ProviderCallCancelled()
+            wait = self._take(tokens)
+            if not wait:
+                return waited
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+            waited += wait
+    
+    def try_acquire(self, tokens=1):
+        """Take tokens only if available right now; returns True if taken"""
+        return not self._take(tokens)
+    
+    def _take(self, tokens):
+        """Take tokens if available; otherwise return the seconds until they will be"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One TokenBucket per data provider, so each provider is called as fast as it allows.
+    """
+    
+    # (requests per second, burst) per provider
+    DEFAULT_LIMITS = {
+        'sec': (10, 10),                # SEC fair-access policy: 10 requests/second
+        'fmp': (5, 5),                  # FMP paid plans start at 300 requests/minute
+        'alpha_vantage': (5 / 60, 5),   # Alpha Vantage free tier: 5 requests/minute
+        'yahoo': (2, 5),                # Unofficial endpoint, kept polite
+    }
+    
+    # Request host -> provider bucket
+    HOST_PROVIDERS = {
+        'data.sec.gov': 'sec',
+        'www.sec.gov': 'sec',
+        'efts.sec.gov': 'sec',
+        'financialmodelingprep.com': 'fmp',
+        'www.alphavantage.co': 'alpha_vantage',
+        'query1.finance.yahoo.com': 'yahoo',
+        'query2.finance.yahoo.com': 'yahoo',
+    }
+    
+    def __init__(self, limits=None):
+        """
+        Initialize the limiter.
+        
+        Args:
+            limits (dict): Overrides of DEFAULT_LIMITS as {provider: (requests_per_second, burst)};
+                a value of None disables limiting for that provider
+        """
+        self.limits = dict(self.DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.host_providers = dict(self.HOST_PROVIDERS)
+        self._buckets = {provider: TokenBucket(*limit)
+                         for provider, limit in self.limits.items() if limit is not None}
+    
+    def acquire(self, provider, tokens=1):
+        """
+        Wait for the provider's bucket; unknown or unlimited providers pass straight through.
+        
+        Raises ProviderCallCancelled instead when called from a hedged provider call that lost its race.
+        """
+        cancel = _provider_cancel_event.get()
+        if cancel is not None and cancel.is_set():
+            raise ProviderCallCancelled()
+        bucket = self._buckets.get(provider)
+        return bucket.acquire(tokens, cancel) if bucket else 0.0
+    
+    def acquire_for_url(self, url, tokens=1):
+        """Wait for the bucket of the provider serving a URL"""
+        return self.acquire(self.host_providers.get(urlparse(url).netloc), tokens)
+    
+    def register_host(self, host, provider):
+        """Count requests to another host (e.g. a local stand-in server) against a provider's bucket"""
+        self.host_providers[host] = provider
+
+
+# Rate limiter shared by the module-level helpers and Yahoo Finance snapshots
+_shared_rate_limiter = None
+_shared_rate_limiter_lock = threading.Lock()
+
+def get_shared_rate_limiter():
+    """Process-wide RateLimiter, created with the default limits on first use"""
+    global _shared_rate_limiter
+    if _shared_rate_limiter is None:
+        with _shared_rate_limiter_lock:
+            if _shared_rate_limiter is None:
+                _shared_rate_limiter = RateLimiter()
+    return _shared_rate_limiter
+
+def set_shared_rate_limiter(rate_limiter):
+    """Make module-level helpers and snapshots use the given RateLimiter"""
+    global _shared_rate_limiter
+    with _shared_rate_limiter_lock:
+        _shared_rate_limiter = rate_limiter
+
+
+class TransientHTTPError(Exception):
+    """A provider answered with a retryable status (429/5xx) or a throttling notice"""
+    
+    def __init__(self, status_code, url=None, retry_after=None):
+        super().__init__(f"HTTP {status_code} from {url}" if url else f"HTTP {status_code}")
+        self.status_code = status_code
+        self.url = url
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """
+    Shared retry policy: classifies failures and spaces retries with exponential backoff.
+    
+    Only transient failures (throttling, 5xx, timeouts, dropped connections) are retried.
+    Delays use "full jitter", a random wait between 0 and base_delay * multiplier**attempt
+    capped at max_delay, so concurrent workers don't retry in lockstep. A server's
+    Retry-After is honoured when given.
+    """
+    
+    RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+    
+    def __init__(self, base_delay=1.0, max_delay=30.0, multiplier=2.0):
+        """
+        Initialize the policy.
+        
+        Args:
+            base_delay (float): Upper bound of the first retry delay in seconds
+            max_delay (float): Cap on any single delay in seconds
+            multiplier (float): Growth of the delay bound per attempt
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+    
+    def is_retryable_status(self, status_code):
+        """Whether an HTTP status is worth retrying"""
+        return status_code in self.RETRYABLE_STATUSES
+    
+    def is_retryable_error(self, error):
+        """Whether an exception is transient (network trouble or throttling) rather than permanent"""
+        if isinstance(error, TransientHTTPError):
+            return True
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return self.is_retryable_status(error.response.status_code)
+        # yfinance signals throttling with its own exception types
+        return 'ratelimit' in type(error).__name__.lower()
+    
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait before the retry following a failed attempt.
+        
+        Args:
+            attempt (int): Zero-based index of the attempt that failed
+            retry_after: Retry-After value from the server, in seconds, if any
+        """
+        try:
+            if retry_after is not None:
+                return min(self.max_delay, max(0.0, float(retry_after)))
+        except (TypeError, ValueError):
+            pass  # HTTP-date form, fall back to backoff
+        bound = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return random.uniform(0, bound)
+
+
+class CircuitBreaker:
+    """
+    Skips a provider for a cooldown window after repeated transient failures.
+    
+    Closed: calls go through. After failure_threshold consecutive failures the breaker
+    opens and calls are refused until cooldown seconds have passed; then a single trial
+    call is let through (half-open), which closes the breaker on success or reopens it.
+    A failure is one provider call that ended on a transient error after its retries,
+    not each attempt (see FinancialDataAcquisition._retry_delay).
+    """
+    
+    def __init__(self, name, failure_threshold=3, cooldown=300):
+        """
+        Initialize a closed breaker.
+        
+        Args:
+            name (str): Provider name, used in messages
+            failure_threshold (int): Consecutive failed calls before opening
+            cooldown (float): Seconds the provider is skipped once open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        """'closed', 'open' or 'half-open'"""
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+    
+    def allow(self):
+        """Whether a call may be made now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def release(self):
+        """
+        End an allowed call that finished without a transient failure (e.g. a 404 or
+        missing data): the provider answered, so consecutive failures reset and a
+        half-open trial closes the breaker.
+        """
+        with self._lock:
+            self._failures = 0
+            if self._trial_in_flight:
+                self._opened_at = None
+                self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    print(f"{self.name} circuit open, skipping it for {self.cooldown:.0f} seconds")
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class HTTPResponseCache:
+    """
+    Persistent on-disk cache of HTTP GET responses keyed by URL.
+    
+    Entries are zlib-compressed, stay fresh for a TTL configured per endpoint family,
+    and are revalidated with ETag/Last-Modified conditional requests once stale.
+    """
+    
+    # Seconds an entry is served without contacting the server
+    DEFAULT_TTLS = {
+        'sec_concept': 7 * 24 * 3600,   # Annual XBRL facts only change when a new filing lands
+        'sec_facts': 7 * 24 * 3600,
+        'sec_submissions': 12 * 3600,
+        'sec_tickers': 24 * 3600,
+        'default': 3600
+    }
+    
+    # URL fragments identifying each endpoint family
+    ENDPOINT_FAMILIES = (
+        ('sec_concept', '/api/xbrl/companyconcept/'),
+        ('sec_facts', '/api/xbrl/companyfacts/'),
+        ('sec_submissions', '/submissions/'),
+        ('sec_tickers', '/company_tickers'),
+    )
+    
+    # Status codes worth caching (404 = concept not reported by the company)
+    CACHEABLE_STATUSES = (200, 404)
+    
+    def __init__(self, cache_dir=None, ttls=None):
+        """
+        Initialize the cache.
+        
+        Args:
+            cache_dir (str): Directory for cache entries (default: <DEFAULT_CACHE_DIR>/http)
+            ttls (dict): TTL overrides in seconds, keyed by endpoint family
+        """
+        self.cache_dir = cache_dir or os.path.join(DEFAULT_CACHE_DIR, 'http')
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+    
+    def family_for(self, url):
+        """Endpoint family of a URL, used to pick its TTL"""
+        for family, fragment in self.ENDPOINT_FAMILIES:
+            if fragment in url:
+                return family
+        return 'default'
+    
+    def get(self, url, headers=None, fetch=None):
+        """
+        GET a URL through the cache.
+        
+        Args:
+            url (str): URL to fetch
+            headers (dict): Request headers
+            fetch (callable): Function performing the network GET as fetch(url, headers=...),
+                defaults to requests.get
+        
+        Returns:
+            Response object (StoredResponse when served from the cache)
+        """
+        fetch = fetch or requests.get
+        entry = self._load(url)
+        now = time.time()
+        
+        if entry and now - entry['stored_at'] < self.ttls.get(self.family_for(url), self.ttls['default']):
+            return self._to_response(url, entry)
+        
+        # Stale or missing: ask the server, revalidating when we hold a copy
+        request_headers = dict(headers or {})
+        if entry:
+            if entry['headers'].get('ETag'):
+                request_headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                request_headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        
+        try:
+            response = fetch(url, headers=request_headers)
+        except Exception as e:
+            if entry:
+                print(f"Request for {url} failed ({e}), serving stale cached copy")
+                return self._to_response(url, entry)
+            raise
+        
+        if response.status_code == 304 and entry:
+            entry['stored_at'] = now
+            self._save(url, entry)
+            return self._to_response(url, entry)
+        
+        if response.status_code in self.CACHEABLE_STATUSES:
+            self._save(url, {
+                'status_code': response.status_code,
+                'stored_at': now,
+                'headers': {name: response.headers.get(name) for name in ('ETag', 'Last-Modified', 'Content-Type')
+                            if response.headers.get(name)},
+                'content': response.content
+            })
+        
+        return response
+    
+    def invalidate(self, url):
+        """Drop the cached entry for a URL"""
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            pass
+    
+    def _path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + '.z')
+    
+    def _load(self, url):
+        try:
+            with open(self._path(url), 'rb') as f:
+                raw = zlib.decompress(f.read())
+            meta, content = raw.split(b'\n', 1)
+            entry = json.loads(meta)
+            entry['content'] = content
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable cache entry for {url}: {e}")
+            return None
+    
+    def _save(self, url, entry):
+        path = self._path(url)
+        meta = {key: value for key, value in entry.items() if key != 'content'}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(json.dumps(meta).encode('utf-8') + b'\n' + entry['content']))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write cache entry for {url}: {e}")
+    
+    def _to_response(self, url, entry):
+        return StoredResponse(entry['status_code'], entry['content'], entry['headers'], url, from_cache=True)
+
+class CompanyFactsStore:
+    """
+    Indexed local SQLite store of SEC XBRL company facts.
+    
+    Filled from SEC's bulk companyfacts.zip archive (one CIK##########.json per company),
+    so FinancialDataAcquisition can read facts for thousands of companies without network access.
+    """
+    
+    FACT_FIELDS = ('start', 'end', 'val', 'accn', 'fy', 'fp', 'form', 'filed', 'frame')
+    
+    def __init__(self, db_path=None):
+        """
+        Open (or create) the store.
+        
+        Args:
+            db_path (str): SQLite database path (default: <DEFAULT_CACHE_DIR>/companyfacts.sqlite)
+        """
+        self.db_path = db_path or os.path.join(DEFAULT_CACHE_DIR, 'companyfacts.sqlite')
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS companies (
+                    cik TEXT PRIMARY KEY,
+                    entity_name TEXT
+                );
+                CREATE TABLE IF NOT EXISTS facts (
+                    cik TEXT, taxonomy TEXT, concept TEXT, unit TEXT,
+                    start TEXT, "end" TEXT, val REAL, accn TEXT,
+                    fy INTEGER, fp TEXT, form TEXT, filed TEXT, frame TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_facts_cik_concept ON facts (cik, taxonomy, concept);
+            """)
+    
+    def ingest_archive(self, zip_path, ciks=None, taxonomies=('us-gaap', 'dei')):
+        """
+        Ingest SEC's bulk companyfacts.zip from a local path.
+        
+        Args:
+            zip_path (str): Path to companyfacts.zip
+            ciks (iterable, optional): Only ingest these CIKs
+            taxonomies (tuple): XBRL taxonomies to keep
+        
+        Returns:
+            int: Number of companies ingested
+        """
+        wanted = {str(cik).lstrip('0').zfill(10) for cik in ciks} if ciks else None
+        count = 0
+        
+        with zipfile.ZipFile(zip_path) as archive:
+            for name in archive.namelist():
+                base_name = os.path.basename(name)
+                if not (base_name.startswith('CIK') and base_name.endswith('.json')):
+                    continue
+                if wanted is not None and base_name[3:13] not in wanted:
+                    continue
+                
+                try:
+                    with archive.open(name) as f:
+                        company_facts = json.load(f)
+                    self.ingest_company_facts(company_facts, taxonomies, commit=False)
+                    count += 1
+                except Exception as e:
+                    print(f"Skipping {name}: {e}")
+                    continue
+                
+                if count % 250 == 0:
+                    with self._lock:
+                        self._conn.commit()
+                    print(f"Ingested {count} companies...")
+        
+        with self._lock:
+            self._conn.commit()
+        print(f"Ingested {count} companies into {self.db_path}")
+        return count
+    
+    def ingest_company_facts(self, company_facts, taxonomies=('us-gaap', 'dei'), commit=True):
+        """
+        Replace the stored facts of one company with a companyfacts JSON document.
+        
+        Args:
+            company_facts (dict): Parsed companyfacts document
+            taxonomies (tuple): XBRL taxonomies to keep
+            commit (bool): Commit the transaction immediately
+        """
+        cik = str(company_facts['cik']).zfill(10)
+        rows = (
+            (cik, taxonomy, concept, unit) + tuple(fact.get(field) for field in self.FACT_FIELDS)
+            for taxonomy, concepts in company_facts.get('facts', {}).items() if taxonomy in taxonomies
+            for concept, concept_data in concepts.items()
+            for unit, facts in concept_data.get('units', {}).items()
+            for fact in facts
+        )
+        
+        with self._lock:
+            self._conn.execute("DELETE FROM facts WHERE cik = ?", (cik,))
+            self._conn.execute("INSERT OR REPLACE INTO companies (cik, entity_name) VALUES (?, ?)",
+                               (cik, company_facts.get('entityName')))
+            self._conn.executemany("INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if commit:
+                self._conn.commit()
+    
+    def has_company(self, cik):
+        """Whether facts for a CIK have been ingested"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM companies WHERE cik = ?", (str(cik).zfill(10),)).fetchone()
+        return row is not None
+    
+    def get_company_facts_index(self, cik, taxonomy='us-gaap'):
+        """
+        Concept index for a company, shaped like the units section of SEC's API.
+        
+        Returns:
+            dict: {concept: {unit: [facts]}}, or None if the company was not ingested
+        """
+        if not self.has_company(cik):
+            return None
+        
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT concept, unit, start, "end", val, accn, fy, fp, form, filed, frame '
+                'FROM facts WHERE cik = ? AND taxonomy = ?', (str(cik).zfill(10), taxonomy)
+            ).fetchall()
+        
+        index = {}
+        for row in rows:
+            fact = {field: value for field, value in zip(self.FACT_FIELDS, row[2:]) if value is not None}
+            index.setdefault(row[0], {}).setdefault(row[1], []).append(fact)
+        return index
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FundamentalsStore:
+    """
+    Normalized long-format table of statement line items from every provider.
+    
+    One row per (ticker, statement, concept, period) and source, with concepts named
+    like yfinance statement rows ('Operating Cash Flow', 'Total Revenue', ...) so a
+    yfinance-shaped statement can be rebuilt from any source. Persisted as Parquet
+    (pickle if pyarrow is not installed). Ingested rows are buffered and merged into
+    the table once, on the next read or save. Reads go through column arrays sorted by
+    (ticker, period_type, source, statement, concept, period_end); values() returns
+    slices of those arrays, which are views rather than copies.
+    """
+    
+    COLUMNS = ('cik', 'ticker', 'statement', 'concept', 'period_type', 'period_end', 'fiscal_year',
+               'fiscal_period', 'value', 'unit', 'source', 'filed', 'accession', 'ingested_at')
+    KEY_COLUMNS = ('ticker', 'statement', 'concept', 'period_type', 'period_end', 'source')
+    
+    # Preferred source when several providers reported the same line item
+    SOURCE_PRIORITY = ('SEC EDGAR', 'Financial Modeling Prep', 'Alpha Vantage', 'Yahoo Finance')
+    
+    # Statement read when a line item (e.g. 'Net Income') appears in more than one
+    STATEMENT_PRIORITY = ('income', 'cashflow', 'balance')
+    
+    SORT_COLUMNS = ['ticker', 'period_type', 'source', 'statement', 'concept', 'period_end']
+    
+    def __init__(self, path=None, max_age=7 * 24 * 3600):
+        """
+        Open (or create) the store.
+        
+        Args:
+            path (str): Store file (default: <DEFAULT_CACHE_DIR>/fundamentals.parquet, .pkl without pyarrow)
+            max_age (float): Seconds stored statements are served before being fetched again
+        """
+        default_name = 'fundamentals.parquet' if pyarrow is not None else 'fundamentals.pkl'
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, default_name)
+        self.filings_path = f"{os.path.splitext(self.path)[0]}_filings.json"
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._frame = self._read()
+        self._pending = []
+        self._filings = self._read_filings()
+        self._dirty = False
+        self._index = None
+    
+    def ingest(self, records):
+        """
+        Add or replace rows. A row replaces an existing one with the same key columns.
+        
+        Rows are buffered; duplicates are resolved once when the table is next read or saved.
+        
+        Args:
+            records (list or pd.DataFrame): Rows with (a subset of) COLUMNS
+        
+        Returns:
+            int: Number of rows ingested
+        """
+        frame = pd.DataFrame(records)
+        if frame.empty:
+            return 0
+        frame = frame.reindex(columns=self.COLUMNS)
+        frame['ingested_at'] = frame['ingested_at'].fillna(time.time())
+        frame = self._normalize_types(frame.dropna(subset=['value', 'period_end']))
+        
+        with self._lock:
+            self._pending.append(frame)
+            self._dirty = True
+            self._index = None
+        return len(frame)
+    
+    def ingest_statement(self, ticker, statement, period_type, frame, source='Yahoo Finance', cik=None):
+        """
+        Ingest a yfinance-shaped statement (line items x period end dates).
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            statement (str): 'cashflow', 'income' or 'balance'
+            period_type (str): 'annual' or 'quarterly'
+            frame (pd.DataFrame): Statement with line items as rows and period ends as columns
+            source (str): Provider name
+            cik (str): Company CIK, if known
+        """
+        if frame is None or frame.empty:
+            return 0
+        rows, columns = frame.shape
+        long = pd.DataFrame({
+            'concept': np.repeat(np.asarray(frame.index, dtype=object), columns),
+            'period_end': np.tile(np.asarray(frame.columns), rows),
+            'value': pd.to_numeric(pd.Series(frame.to_numpy().ravel()), errors='coerce')
+        })
+        long['cik'] = cik
+        long['ticker'] = ticker
+        long['statement'] = statement
+        long['period_type'] = period_type
+        long['source'] = source
+        return self.ingest(long)
+    
+    def values(self, ticker, concept, period_type='annual', source=None, statement=None):
+        """
+        Period ends and values of one line item, oldest first, as views into the store's columns.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            concept (str): Line item, e.g. 'Free Cash Flow'
+            period_type (str): 'annual' or 'quarterly'
+            source (str): Provider to read; the highest-priority one with data if not given
+            statement (str): Statement to read; the first of STATEMENT_PRIORITY with data if not given
+        
+        Returns:
+            tuple: (period_end ndarray, value ndarray), empty arrays if nothing is stored
+        """
+        with self._lock:
+            index = self._get_index()
+        ranges = index['concepts'].get((ticker, period_type, concept), {})
+        if ranges:
+            known_sources = {key[0] for key in ranges}
+            known_statements = {key[1] for key in ranges}
+            sources = [source] if source else list(self.SOURCE_PRIORITY) + sorted(
+                known_sources - set(self.SOURCE_PRIORITY))
+            statements = [statement] if statement else list(self.STATEMENT_PRIORITY) + sorted(
+                known_statements - set(self.STATEMENT_PRIORITY))
+            for candidate in sources:
+                for statement_name in statements:
+                    bounds = ranges.get((candidate, statement_name))
+                    if bounds:
+                        start, stop = bounds
+                        return index['period_end'][start:stop], index['value'][start:stop]
+        return np.array([], dtype='datetime64[ns]'), np.array([], dtype=float)
+    
+    def statement(self, ticker, statement, period_type='annual', source='Yahoo Finance', max_age=None):
+        """
+        Rebuild a yfinance-shaped statement (line items x period ends, latest first).
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            statement (str): 'cashflow', 'income' or 'balance'
+            period_type (str): 'annual' or 'quarterly'
+            source (str): Provider whose rows to use
+            max_age (float): Ignore rows ingested longer ago than this many seconds
+        
+        Returns:
+            pd.DataFrame: The statement, or None if not stored (or too old)
+        """
+        with self._lock:
+            index = self._get_index()
+        bounds = index['statements'].get((ticker, period_type, source, statement))
+        if not bounds:
+            return None
+        rows = index['frame'].iloc[bounds[0]:bounds[1]]
+        if max_age is not None and time.time() - rows['ingested_at'].max() > max_age:
+            return None
+        table = rows.pivot(index='concept', columns='period_end', values='value')
+        table = table[sorted(table.columns, reverse=True)]
+        table.index.name = None
+        table.columns.name = None
+        return table
+    
+    def invalidate(self, ticker=None, cik=None, sources=None):
+        """
+        Drop stored rows for a ticker and/or CIK so they are fetched again.
+        
+        Args:
+            ticker (str): Drop this ticker's rows
+            cik (str): Drop rows recorded with this CIK
+            sources (iterable): Only drop rows from these providers
+        """
+        with self._lock:
+            frame = self._merged()
+            mask = pd.Series(False, index=frame.index)
+            if ticker is not None:
+                mask |= frame['ticker'] == ticker
+            if cik is not None:
+                mask |= frame['cik'] == str(cik).zfill(10)
+            if sources is not None:
+                mask &= frame['source'].isin(list(sources))
+            if mask.any():
+                self._frame = frame[~mask].reset_index(drop=True)
+                self._dirty = True
+                self._index = None
+    
+    def ticker_for_cik(self, cik):
+        """Ticker stored with a CIK's rows (e.g. by SEC ingestion), or None"""
+        with self._lock:
+            frame = self._merged()
+        tickers = frame.loc[(frame['cik'] == str(cik).zfill(10)) & frame['ticker'].notna(), 'ticker']
+        return tickers.iloc[-1] if len(tickers) else None
+    
+    def last_filing(self, cik):
+        """
+        Last filing ingested for a CIK.
+        
+        Returns:
+            dict: {'accession', 'form', 'filed'}, or None if the CIK was never refreshed
+        """
+        with self._lock:
+            return self._filings.get(str(cik).zfill(10))
+    
+    def record_filing(self, cik, accession, form=None, filed=None):
+        """Remember the newest filing ingested for a CIK"""
+        with self._lock:
+            self._filings[str(cik).zfill(10)] = {'accession': accession, 'form': form, 'filed': filed}
+            self._dirty = True
+    
+    def save(self):
+        """Write the table to disk if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            frame = self._merged()
+            filings = dict(self._filings)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.filings_path) or '.', exist_ok=True)
+            with open(f"{self.filings_path}.tmp", 'w') as f:
+                json.dump(filings, f)
+            os.replace(f"{self.filings_path}.tmp", self.filings_path)
+        except OSError as e:
+            print(f"Could not save filing state {self.filings_path}: {e}")
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            if self.path.endswith('.parquet'):
+                frame.to_parquet(tmp_path, index=False)
+            else:
+                frame.to_pickle(tmp_path)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Could not save fundamentals store {self.path}: {e}")
+    
+    def _merged(self):
+        """Fold buffered ingests into the table, resolving duplicate keys once (call with the lock held)"""
+        if self._pending:
+            frames = [self._frame] if not self._frame.empty else []
+            combined = pd.concat(frames + self._pending, ignore_index=True)
+            self._frame = combined.drop_duplicates(subset=list(self.KEY_COLUMNS), keep='last').reset_index(drop=True)
+            self._pending = []
+        return self._frame
+    
+    def _get_index(self):
+        """
+        Sorted table and row ranges (call with the lock held).
+        
+        Returns:
+            dict: 'frame' sorted by SORT_COLUMNS, its 'period_end'/'value' arrays,
+                'concepts' mapping (ticker, period_type, concept) -> {(source, statement): (start, stop)}
+                and 'statements' mapping (ticker, period_type, source, statement) -> (start, stop)
+        """
+        if self._index is None:
+            frame = self._merged().sort_values(self.SORT_COLUMNS, kind='mergesort').reset_index(drop=True)
+            concepts = {}
+            statements = {}
+            if not frame.empty:
+                group_columns = self.SORT_COLUMNS[:-1]
+                keys = frame[group_columns]
+                # Rows are sorted by the group columns, so each group is one contiguous run
+                changed = np.ones(len(frame), dtype=bool)
+                changed[1:] = (keys.iloc[1:].to_numpy() != keys.iloc[:-1].to_numpy()).any(axis=1)
+                starts = np.flatnonzero(changed)
+                stops = np.append(starts[1:], len(frame))
+                for (ticker, period_type, source, statement, concept), start, stop in zip(
+                        keys.iloc[starts].itertuples(index=False, name=None), starts, stops):
+                    concepts.setdefault((ticker, period_type, concept), {})[(source, statement)] = (start, stop)
+                    key = (ticker, period_type, source, statement)
+                    statements[key] = (statements.get(key, (start, stop))[0], stop)
+            self._index = {
+                'frame': frame,
+                'period_end': frame['period_end'].to_numpy(),
+                'value': frame['value'].to_numpy(),
+                'concepts': concepts,
+                'statements': statements
+            }
+        return self._index
+    
+    def _read_filings(self):
+        try:
+            with open(self.filings_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _read(self):
+        try:
+            if self.path.endswith('.parquet'):
+                frame = pd.read_parquet(self.path) if pyarrow is not None else None
+            else:
+                frame = pd.read_pickle(self.path)
+        except (OSError, ValueError):
+            frame = None
+        if frame is None:
+            return self._normalize_types(pd.DataFrame(columns=self.COLUMNS))
+        return self._normalize_types(frame.reindex(columns=self.COLUMNS))
+    
+    @staticmethod
+    def _normalize_types(frame):
+        frame = frame.copy()
+        frame['period_end'] = pd.to_datetime(frame['period_end'])
+        frame['filed'] = pd.to_datetime(frame['filed'])
+        frame['value'] = pd.to_numeric(frame['value'], errors='coerce').astype('float64')
+        frame['fiscal_year'] = pd.to_numeric(frame['fiscal_year'], errors='coerce').astype('float64')
+        frame['ingested_at'] = pd.to_numeric(frame['ingested_at'], errors='coerce').astype('float64')
+        for column in ('cik', 'ticker', 'statement', 'concept', 'period_type', 'fiscal_period',
+                       'unit', 'source', 'accession'):
+            frame[column] = frame[column].astype(object)
+        return frame
+
+
+# Fundamentals store shared by providers and Yahoo snapshots (None when disabled)
+_fundamentals_store = None
+_fundamentals_store_enabled = True
+_fundamentals_store_lock = threading.Lock()
+
+def get_fundamentals_store():
+    """Process-wide FundamentalsStore (saved at exit), or None if disabled"""
+    global _fundamentals_store
+    if _fundamentals_store is None and _fundamentals_store_enabled:
+        with _fundamentals_store_lock:
+            if _fundamentals_store is None:
+                _fundamentals_store = FundamentalsStore()
+                atexit.register(_fundamentals_store.save)
+    return _fundamentals_store
+
+def set_fundamentals_store(store):
+    """Use the given FundamentalsStore process-wide (None disables the store)"""
+    global _fundamentals_store, _fundamentals_store_enabled
+    with _fundamentals_store_lock:
+        _fundamentals_store = store
+        _fundamentals_store_enabled = store is not None
+
+def ingest_fundamentals(records):
+    """Add rows to the shared store, if enabled. Failures are reported, never raised."""
+    store = get_fundamentals_store()
+    if store is None or not records:
+        return
+    try:
+        store.ingest(records)
+    except Exception as e:
+        print(f"Could not store fundamentals: {e}")
+
+class SECFactFrame:
+    """
+    Annual values of one SEC XBRL concept, loaded into a frame once and indexed by period end.
+    
+    A 10-K reports the prior years again as comparatives, tagged with the filing's own
+    fiscal year, so the same period appears in several filings. Amendments are collapsed
+    on (fy, fp, end) and restated comparatives on the period end, keeping the latest filed
+    value in both cases; quarter-length durations inside a 10-K are dropped.
+    """
+    
+    FIELDS = ('end', 'start', 'val', 'fy', 'fp', 'form', 'filed', 'accn')
+    ANNUAL_FORMS = ('10-K', '10-K/A')
+    MIN_ANNUAL_DAYS = 300
+    
+    def __init__(self, facts, annual_forms=ANNUAL_FORMS):
+        """
+        Build the frame from a list of SEC fact dicts.
+        
+        Args:
+            facts (list): Facts from a companyconcept/companyfacts unit list
+            annual_forms (tuple): Forms treated as annual reports; every form is used if none match
+        """
+        frame = pd.DataFrame.from_records(facts or [], columns=list(self.FIELDS))
+        frame = frame.dropna(subset=['end', 'val'])
+        for column in ('end', 'start', 'filed'):
+            frame[column] = pd.to_datetime(frame[column], errors='coerce')
+        
+        annual = frame[frame['form'].isin(annual_forms)]
+        if len(annual):
+            full_year = annual['start'].isna() | ((annual['end'] - annual['start']).dt.days >= self.MIN_ANNUAL_DAYS)
+            annual = annual[full_year]
+        else:
+            annual = frame  # No annual reports, use whatever was filed
+        
+        annual = annual.sort_values(['filed', 'end'], kind='stable')
+        annual = annual.drop_duplicates(['fy', 'fp', 'end'], keep='last')
+        annual = annual.drop_duplicates('end', keep='last').sort_values('end', kind='stable')
+        
+        self.frame = annual.set_index('end')
+        self.values = self.frame['val'].astype(float)
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def latest(self):
+        """Most recent annual value, or None"""
+        return self.values.iat[-1] if len(self.values) else None
+    
+    def history(self, years=5):
+        """
+        Annual values for the most recent periods.
+        
+        Returns:
+            list: Up to `years` values, most recent first
+        """
+        return self.values.iloc[-years:].iloc[::-1].tolist()
+    
+    def value_at(self, period_end):
+        """Value for a period end date, or None"""
+        return self.values.get(pd.Timestamp(period_end))
+
+def align_sec_facts(**concepts):
+    """
+    Align several concepts on their common period ends.
+    
+    Args:
+        **concepts: name=SECFactFrame
+        
+    Returns:
+        pd.DataFrame: One column per concept, rows for periods every concept reports, oldest first
+    """
+    return pd.concat({name: facts.values for name, facts in concepts.items()}, axis=1, join='inner').sort_index()
+
+def sec_quarterly_values(facts):
+    """
+    Discrete quarterly values of a duration concept from 10-Q and 10-K facts.
+    
+    Three-month facts are used as reported. Year-to-date facts (10-Q cash flows are
+    cumulative from the start of the fiscal year, and the 10-K holds the full year)
+    are de-cumulated by subtracting the previous year-to-date value with the same start.
+    
+    Args:
+        facts (list): Facts from a companyconcept/companyfacts unit list
+        
+    Returns:
+        pd.Series: Quarter values indexed by quarter end, oldest first
+    """
+    frame = pd.DataFrame.from_records(facts or [], columns=list(SECFactFrame.FIELDS))
+    frame = frame.dropna(subset=['start', 'end', 'val'])
+    for column in ('end', 'start', 'filed'):
+        frame[column] = pd.to_datetime(frame[column], errors='coerce')
+    frame = frame.dropna(subset=['start', 'end'])
+    frame = frame.sort_values('filed', kind='stable').drop_duplicates(['start', 'end'], keep='last')
+    
+    days = (frame['end'] - frame['start']).dt.days
+    chain = frame[days >= TTMWindow.QUARTER_DAYS[0]].sort_values(['start', 'end'])
+    chain_days = (chain['end'] - chain['start']).dt.days
+    
+    # Previous cumulative value of the same fiscal year, one quarter earlier
+    previous = chain.groupby('start')[['end', 'val']].shift()
+    gap = (chain['end'] - previous['end']).dt.days
+    derived = (chain['val'] - previous['val'])[gap.between(*TTMWindow.QUARTER_DAYS)]
+    discrete = chain['val'][chain_days.between(*TTMWindow.QUARTER_DAYS)]
+    
+    quarters = pd.concat([pd.Series(discrete.values, index=chain.loc[discrete.index, 'end']),
+                          pd.Series(derived.values, index=chain.loc[derived.index, 'end'])])
+    # Prefer values reported for the quarter over derived ones
+    quarters = quarters[~quarters.index.duplicated(keep='first')]
+    return quarters.sort_index().astype(float)
+
+class TTMWindow:
+    """Last four consecutive quarters of one concept and their running sum"""
+    
+    __slots__ = ('quarters', 'total')
+    
+    # Days between consecutive quarter ends (fiscal quarters are 13 weeks, or 3 months)
+    QUARTER_DAYS = (70, 120)
+    
+    def __init__(self):
+        self.quarters = deque(maxlen=4)
+        self.total = 0.0
+    
+    def add(self, period_end, value):
+        """
+        Roll a quarter into the window in constant time.
+        
+        A quarter already in the window replaces its old value (restatement); older
+        quarters are ignored; a gap between quarters starts a new window.
+        """
+        period_end = pd.Timestamp(period_end)
+        if value is None or pd.isna(value):
+            self.reset()
+            return
+        value = float(value)
+        
+        if self.quarters:
+            last_end = self.quarters[-1][0]
+            if period_end <= last_end:
+                for i, (end, old_value) in enumerate(self.quarters):
+                    if end == period_end:
+                        self.quarters[i] = (end, value)
+                        self.total += value - old_value
+                return
+            if not self.QUARTER_DAYS[0] <= (period_end - last_end).days <= self.QUARTER_DAYS[1]:
+                self.reset()
+        
+        if len(self.quarters) == self.quarters.maxlen:
+            self.total -= self.quarters[0][1]
+        self.quarters.append((period_end, value))
+        self.total += value
+    
+    def reset(self):
+        self.quarters.clear()
+        self.total = 0.0
+    
+    @property
+    def period_end(self):
+        return self.quarters[-1][0] if self.quarters else None
+    
+    @property
+    def value(self):
+        """Trailing-twelve-month sum, or None until four consecutive quarters are in"""
+        return self.total if len(self.quarters) == self.quarters.maxlen else None
+
+class TTMEngine:
+    """
+    Trailing-twelve-month values per ticker and concept, rolled forward as quarters arrive.
+    """
     
-# If you make seperate files for the main functions, be sure to install: 
-# from wacc_calculator import calculate_wacc
-# from growth_rate_estimator import calculate_growth_rates
-# from terminal_value_calculator import calculate_terminal_value
+    def __init__(self):
+        self._windows = {}
+        self._lock = threading.Lock()
+    
+    def update(self, ticker, concept, period_end, value):
+        """
+        Add one quarter.
+        
+        Returns:
+            float: TTM value after the update, or None if fewer than four consecutive quarters
+        """
+        with self._lock:
+            window = self._windows.setdefault((ticker, concept), TTMWindow())
+            window.add(period_end, value)
+            return window.value
+    
+    def load(self, ticker, concept, quarters):
+        """
+        Add quarters in date order, skipping those that already rolled out of the window.
+        
+        Args:
+            quarters: pd.Series indexed by quarter end, or iterable of (period_end, value)
+        """
+        items = quarters.items() if isinstance(quarters, pd.Series) else quarters
+        with self._lock:
+            window = self._windows.setdefault((ticker, concept), TTMWindow())
+            first_end = window.quarters[0][0] if window.quarters else None
+            for period_end, value in items:
+                if first_end is None or pd.Timestamp(period_end) >= first_end:
+                    window.add(period_end, value)
+    
+    def load_statement(self, ticker, statement, concepts=('Operating Cash Flow', 'Capital Expenditure', 'Total Revenue')):
+        """
+        Add quarters from a yfinance quarterly statement (line items x quarter ends, newest first).
+        """
+        if statement is None or statement.empty:
+            return
+        for concept in concepts:
+            if concept in statement.index:
+                row = statement.loc[concept]
+                row.index = pd.to_datetime(row.index)
+                self.load(ticker, concept, row.sort_index())
+    
+    def ttm(self, ticker, concept):
+        """
+        Returns:
+            tuple: (period_end, ttm_value), or None if not available
+        """
+        with self._lock:
+            window = self._windows.get((ticker, concept))
+            if window is None or window.value is None:
+                return None
+            return window.period_end, window.value
+    
+    def invalidate(self, ticker=None):
+        """Drop the windows for a ticker, or all"""
+        with self._lock:
+            if ticker is None:
+                self._windows.clear()
+            else:
+                for key in [key for key in self._windows if key[0] == ticker]:
+                    del self._windows[key]
+
+
+# TTM engine shared by every provider path
+_ttm_engine = None
+_ttm_engine_lock = threading.Lock()
+
+def get_ttm_engine():
+    """Process-wide TTMEngine"""
+    global _ttm_engine
+    if _ttm_engine is None:
+        with _ttm_engine_lock:
+            if _ttm_engine is None:
+                _ttm_engine = TTMEngine()
+    return _ttm_engine
+
+def set_ttm_engine(ttm_engine):
+    """Replace the process-wide TTMEngine"""
+    global _ttm_engine
+    with _ttm_engine_lock:
+        _ttm_engine = ttm_engine
+
+def ttm_free_cash_flow(ticker):
+    """
+    Trailing-twelve-month FCF from operating cash flow and capex windows ending on the same quarter.
+    
+    Returns:
+        tuple: (period_end, fcf), or None if not available
+    """
+    engine = get_ttm_engine()
+    operating = engine.ttm(ticker, 'Operating Cash Flow')
+    capex = engine.ttm(ticker, 'Capital Expenditure')
+    if not operating or not capex or operating[0] != capex[0]:
+        return None
+    return operating[0], operating[1] + capex[1]  # Capex is stored negative
+
+class TickerCIKIndex:
+    """
+    Local ticker <-> CIK index built from SEC's company_tickers_exchange.json file.
+    
+    The mapping is cached on disk and refreshed once it is older than the refresh
+    interval; lookups are plain dictionary hits. SIC codes are not part of the SEC
+    ticker file, so they are filled in per CIK from the submissions endpoint on demand.
+    """
+    
+    COMPANY_TICKERS_URL = "https://www.sec.gov/files/company_tickers_exchange.json"
+    SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{}.json"
+    
+    def __init__(self, cache_path=None, refresh_interval=7 * 24 * 3600, headers=None, fetch=None,
+                 tickers_url=None, submissions_url=None):
+        """
+        Initialize the index. The mapping is loaded on first lookup.
+        
+        Args:
+            cache_path (str): JSON file holding the index (default: <DEFAULT_CACHE_DIR>/company_tickers.json,
+                or a file named after tickers_url when that is overridden)
+            refresh_interval (int): Seconds before the SEC ticker file is downloaded again
+            headers (dict): Request headers (SEC requires a descriptive User-Agent)
+            fetch (callable): Function performing GET requests as fetch(url, headers=...), defaults to requests.get
+            tickers_url (str): URL of the company tickers file (default COMPANY_TICKERS_URL)
+            submissions_url (str): Submissions URL template used for SIC codes (default SUBMISSIONS_URL)
+        """
+        self.tickers_url = tickers_url or self.COMPANY_TICKERS_URL
+        self.submissions_url = submissions_url or self.SUBMISSIONS_URL
+        if cache_path is None:
+            # Another source (e.g. a stand-in server) must not share the SEC file's cache
+            name = 'company_tickers.json' if self.tickers_url == self.COMPANY_TICKERS_URL else \
+                f"company_tickers_{hashlib.sha256(self.tickers_url.encode('utf-8')).hexdigest()[:8]}.json"
+            cache_path = os.path.join(DEFAULT_CACHE_DIR, name)
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.headers = headers or {'User-Agent': 'Financial Analysis Tool user@example.com'}
+        self.fetch = fetch or requests.get
+        
+        self._by_ticker = None
+        self._by_cik = {}
+        self._sic = {}
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize_ticker(ticker):
+        """SEC lists share classes with dashes (BRK-B), like Yahoo Finance"""
+        return ticker.strip().upper().replace('.', '-')
+    
+    def cik_for_ticker(self, ticker):
+        """10-digit CIK for a ticker, or None"""
+        entry = self._load().get(self.normalize_ticker(ticker))
+        return entry['cik'] if entry else None
+    
+    def ticker_for_cik(self, cik):
+        """Primary ticker for a CIK, or None"""
+        self._load()
+        entry = self._by_cik.get(str(cik).lstrip('0').zfill(10))
+        return entry['ticker'] if entry else None
+    
+    def exchange_for_ticker(self, ticker):
+        """Listing exchange for a ticker, or None"""
+        entry = self._load().get(self.normalize_ticker(ticker))
+        return entry['exchange'] if entry else None
+    
+    def company_for_ticker(self, ticker):
+        """Full index entry (cik, name, ticker, exchange) for a ticker, or None"""
+        return self._load().get(self.normalize_ticker(ticker))
+    
+    def sic_for_cik(self, cik):
+        """
+        SIC code and description for a CIK, looked up once from the submissions endpoint.
+        
+        Returns:
+            tuple: (sic, sic_description), or (None, None) if unavailable
+        """
+        cik_padded = str(cik).lstrip('0').zfill(10)
+        self._load()
+        if cik_padded not in self._sic:
+            sic = (None, None)
+            try:
+                headers = dict(self.headers, Host='data.sec.gov')
+                response = self.fetch(self.submissions_url.format(cik_padded), headers=headers)
+                if response.status_code == 200:
+                    submissions = response.json()
+                    sic = (submissions.get('sic'), submissions.get('sicDescription'))
+            except Exception as e:
+                print(f"Error fetching SIC code for CIK {cik_padded}: {e}")
+            with self._lock:
+                self._sic[cik_padded] = sic
+                self._save()
+        return self._sic[cik_padded]
+    
+    def refresh(self):
+        """Download the SEC ticker file and rebuild the index"""
+        response = self.fetch(self.tickers_url, headers=self.headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"SEC company tickers request failed: Status {response.status_code}")
+        
+        payload = response.json()
+        fields = payload['fields']
+        companies = [dict(zip(fields, row)) for row in payload['data']]
+        
+        with self._lock:
+            self._build(companies)
+            self._fetched_at = time.time()
+            self._save()
+    
+    def _load(self):
+        """Ticker map, loading it from disk or SEC when missing or due for refresh"""
+        if self._by_ticker is not None and time.time() - self._fetched_at < self.refresh_interval:
+            return self._by_ticker
+        
+        with self._lock:
+            if self._by_ticker is None:
+                self._read_cache_file()
+        
+        if self._by_ticker is None or time.time() - self._fetched_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Could not refresh SEC ticker index: {e}")
+                if self._by_ticker is None:
+                    self._by_ticker = {}
+                # Retry on the next scheduled refresh rather than on every lookup
+                self._fetched_at = time.time()
+        
+        return self._by_ticker
+    
+    def _build(self, companies):
+        by_ticker = {}
+        by_cik = {}
+        for company in companies:
+            if not company.get('ticker') or company.get('cik') is None:
+                continue
+            entry = {
+                'cik': str(company['cik']).zfill(10),
+                'name': company.get('name'),
+                'ticker': self.normalize_ticker(company['ticker']),
+                'exchange': company.get('exchange')
+            }
+            by_ticker[entry['ticker']] = entry
+            # The SEC file lists the primary share class first
+            by_cik.setdefault(entry['cik'], entry)
+        self._by_ticker = by_ticker
+        self._by_cik = by_cik
+    
+    def _read_cache_file(self):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            self._build(cached['companies'])
+            self._sic = {cik: tuple(value) for cik, value in cached.get('sic', {}).items()}
+            self._fetched_at = cached.get('fetched_at', 0)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ignoring unreadable ticker index {self.cache_path}: {e}")
+    
+    def _save(self):
+        try:
+            if os.path.dirname(self.cache_path):
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'fetched_at': self._fetched_at,
+                    'companies': list((self._by_ticker or {}).values()),
+                    'sic': self._sic
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write ticker index {self.cache_path}: {e}")
+
+
+class FinancialSnapshot(Mapping):
+    """
+    Financial data for one company, the same fields whichever provider supplied it.
+    
+    Reads like the provider dicts it replaces (snapshot['free_cash_flow'], snapshot.get(...),
+    'cash_flow' in snapshot); fields left as None count as absent keys. Histories are float64
+    arrays, one entry per year, most recent first, with NaN for years a provider left blank.
+    The slotted layout keeps a snapshot to a fixed ~150 bytes plus its two small arrays;
+    statements and the TickerSnapshot are shared references, not copies.
+    """
+    
+    __slots__ = ('ticker', 'data_source', 'free_cash_flow', 'shares_outstanding', 'current_price',
+                 'historical_fcf', 'historical_revenue', 'fcf_basis', 'fcf_period_end',
+                 'cash_flow', 'income_stmt', 'stock')
+    
+    def __init__(self, ticker, free_cash_flow=None, shares_outstanding=None, current_price=None,
+                 data_source=None, historical_fcf=None, historical_revenue=None, fcf_basis='annual',
+                 fcf_period_end=None, cash_flow=None, income_stmt=None, stock=None):
+        """
+        Args:
+            ticker (str): Stock ticker symbol
+            free_cash_flow, shares_outstanding, current_price (float): Latest values
+            data_source (str): Provider name
+            historical_fcf, historical_revenue (sequence): Annual history, most recent first
+            fcf_basis (str): 'annual' or 'TTM'
+            fcf_period_end (Timestamp): Period end of free_cash_flow
+            cash_flow, income_stmt (pd.DataFrame): Annual statements already fetched, if any
+            stock (TickerSnapshot): Shared Yahoo Finance snapshot, if any
+        """
+        self.ticker = ticker
+        self.data_source = data_source
+        self.free_cash_flow = self._number(free_cash_flow)
+        self.shares_outstanding = self._number(shares_outstanding)
+        self.current_price = self._number(current_price)
+        self.historical_fcf = self._history(historical_fcf)
+        self.historical_revenue = self._history(historical_revenue)
+        self.fcf_basis = fcf_basis
+        self.fcf_period_end = fcf_period_end
+        self.cash_flow = cash_flow
+        self.income_stmt = income_stmt
+        self.stock = stock
+    
+    @classmethod
+    def from_provider(cls, data):
+        """
+        Build a snapshot from a provider result.
+        
+        Args:
+            data (dict): Provider result; unknown keys are ignored
+            
+        Returns:
+            FinancialSnapshot: Snapshot, or None if data is None (snapshots are returned as is)
+        """
+        if data is None or isinstance(data, cls):
+            return data
+        return cls(**{key: data[key] for key in cls.__slots__ if key in data})
+    
+    @staticmethod
+    def _number(value):
+        return None if value is None else float(value)
+    
+    @staticmethod
+    def _history(values):
+        if values is None:
+            return np.empty(0)
+        # Missing years stay as NaN so positions keep matching years
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    
+    def to_dict(self):
+        """Plain dict of the fields that are set"""
+        return dict(self)
+    
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+    
+    def __iter__(self):
+        return (key for key in self.__slots__ if getattr(self, key) is not None)
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def __repr__(self):
+        return (f"FinancialSnapshot({self.ticker!r}, source={self.data_source!r}, "
+                f"fcf={self.free_cash_flow}, shares={self.shares_outstanding}, price={self.current_price})")
 
  
+# Outcome of the provider call running in the current thread/task: {'allowed', 'transient'}
+_provider_call_state = contextvars.ContextVar('provider_call_state', default=None)
+
+def _provider_call(provider):
+    """
+    Decorator for provider fetch methods: a call the breaker let through and that ended
+    without a transient failure releases the breaker, whichever way it returned.
+    """
+    def end_call(self, token):
+        state = _provider_call_state.get()
+        _provider_call_state.reset(token)
+        # An abandoned hedged call says nothing about the provider's health
+        cancel = _provider_cancel_event.get()
+        if state['allowed'] and not state['transient'] and not (cancel is not None and cancel.is_set()):
+            self.circuit_breakers[provider].release()
+    
+    def decorate(method):
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                token = _provider_call_state.set({'allowed': False, 'transient': False})
+                try:
+                    return await method(self, *args, **kwargs)
+                finally:
+                    end_call(self, token)
+        else:
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                token = _provider_call_state.set({'allowed': False, 'transient': False})
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    end_call(self, token)
+        return wrapper
+    return decorate
+
+
 class FinancialDataAcquisition:
     """
     Enhanced financial data acquisition module with multiple data sources
     and fallback mechanisms for reliable DCF analysis.
     """
     
-    def __init__(self, sec_api_key=None, fmp_api_key=None, alpha_vantage_key=None):
+    # SEC concepts kept in the FundamentalsStore: (line item, statement, sign, unit)
+    SEC_FUNDAMENTAL_CONCEPTS = {
+        'NetCashProvidedByUsedInOperatingActivities': ('Operating Cash Flow', 'cashflow', 1, 'USD'),
+        'CashProvidedByUsedInOperatingActivities': ('Operating Cash Flow', 'cashflow', 1, 'USD'),
+        'PaymentsToAcquirePropertyPlantAndEquipment': ('Capital Expenditure', 'cashflow', -1, 'USD'),
+        'CapitalExpenditures': ('Capital Expenditure', 'cashflow', -1, 'USD'),
+        'CommonStockSharesOutstanding': ('Ordinary Shares Number', 'balance', 1, 'shares'),
+        'WeightedAverageNumberOfSharesOutstandingBasic': ('Basic Average Shares', 'income', 1, 'shares'),
+        'Revenues': ('Total Revenue', 'income', 1, 'USD'),
+        'RevenueFromContractWithCustomerExcludingAssessedTax': ('Total Revenue', 'income', 1, 'USD'),
+    }
+    
+    # Filing forms that change the fundamentals
+    REFRESH_FORMS = ('10-K', '10-K/A', '10-Q', '10-Q/A', '20-F', '40-F')
+    
+    # Base URL attributes that can be overridden, and the provider each belongs to
+    BASE_URL_PROVIDERS = {
+        'SEC_SUBMISSION_BASE': 'sec',
+        'SEC_COMPANY_CONCEPT': 'sec',
+        'SEC_COMPANY_FACTS': 'sec',
+        'SEC_COMPANY_TICKERS': 'sec',
+        'FMP_BASE_URL': 'fmp',
+        'ALPHA_VANTAGE_BASE': 'alpha_vantage',
+    }
+    
+    def __init__(self, sec_api_key=None, fmp_api_key=None, alpha_vantage_key=None,
+                 use_http_cache=True, cache_dir=None, cache_ttls=None, use_company_facts=True,
+                 facts_store=None, ticker_index=None, session_pool=None, pool_size=10,
+                 http_retries=2, http_timeout=(5, 30), race_providers=False, hedge_delay=3.0,
+                 hedge_grace=0.5, rate_limiter=None, rate_limits=None, retry_policy=None, breaker_threshold=3,
+                 breaker_cooldown=300, base_urls=None, use_sec_edgar=None, use_yahoo=True):
         """
         Initialize with API keys for various financial data sources.
         
@@ -40,14 +1873,70 @@ class FinancialDataAcquisition:
             sec_api_key (str): API key for SEC API (https://sec-api.io)
             fmp_api_key (str): API key for Financial Modeling Prep
             alpha_vantage_key (str): API key for Alpha Vantage
+            use_http_cache (bool): Persist SEC responses on disk between runs
+            cache_dir (str): Directory for the SEC response cache
+            cache_ttls (dict): TTL overrides in seconds per endpoint family (see HTTPResponseCache)
+            use_company_facts (bool): Fetch the companyfacts document once per CIK and answer every
+                concept lookup from it instead of one companyconcept request per concept
+            facts_store (CompanyFactsStore or str): Local bulk companyfacts store (or its path);
+                companies found there are served without network requests
+            ticker_index (TickerCIKIndex): Ticker to CIK index (one backed by the default cache is created if not given)
+            session_pool (HTTPSessionPool): Pooled HTTP sessions to use; if not given one is created from
+                pool_size/http_retries/http_timeout and shared with the module-level helpers
+            pool_size (int): Maximum keep-alive connections per host
+            http_retries (int): Connection-level retries per request
+            http_timeout (float or tuple): (connect, read) timeout in seconds
+            race_providers (bool): Hedge across providers instead of trying them strictly in sequence
+            hedge_delay (float): Seconds to wait on a provider before also starting the next one
+            hedge_grace (float): Seconds a higher-priority provider still running is given to answer
+                once a lower-priority one has
+            rate_limiter (RateLimiter): Per-provider request limiter to use; if not given one is created
+                from rate_limits and shared with the module-level helpers
+            rate_limits (dict): Per-provider (requests_per_second, burst) overrides, e.g. for your FMP plan
+            retry_policy (RetryPolicy): Backoff policy for transient provider failures
+            breaker_threshold (int): Consecutive calls ending in transient failures (retries
+                exhausted) before a provider is skipped
+            breaker_cooldown (float): Seconds a tripped provider is skipped
+            base_urls (dict): Overrides of the provider base URL attributes (SEC_COMPANY_CONCEPT,
+                SEC_COMPANY_FACTS, SEC_SUBMISSION_BASE, SEC_COMPANY_TICKERS, FMP_BASE_URL,
+                ALPHA_VANTAGE_BASE), e.g. to point at local stand-in servers (see start_stand_in_providers)
+            use_sec_edgar (bool): Query the SEC EDGAR XBRL API (default: when an SEC API key or facts
+                store is configured, or the SEC base URLs are overridden)
+            use_yahoo (bool): Fall back to Yahoo Finance when the other providers fail
         """
         self.sec_api_key = sec_api_key or os.environ.get('SEC_API_KEY')
         self.fmp_api_key = fmp_api_key or os.environ.get('FMP_API_KEY')
         self.alpha_vantage_key = alpha_vantage_key or os.environ.get('ALPHA_VANTAGE_KEY')
         
+        # SEC endpoints pointed elsewhere (e.g. stand-in servers) must not reach the billed sec-api.io
+        sec_overridden = any(self.BASE_URL_PROVIDERS.get(name) == 'sec' for name in (base_urls or {}))
+        if use_sec_edgar is None:
+            use_sec_edgar = bool(self.sec_api_key or facts_store or sec_overridden)
+        self.use_sec_edgar = use_sec_edgar
+        self.use_yahoo = use_yahoo
+        
         # SEC API client if available
-        self.sec_query_api = QueryApi(self.sec_api_key) if self.sec_api_key else None
-        self.sec_render_api = RenderApi(self.sec_api_key) if self.sec_api_key else None
+        use_sec_api = self.sec_api_key and not sec_overridden
+        self.sec_query_api = QueryApi(self.sec_api_key) if use_sec_api else None
+        self.sec_render_api = RenderApi(self.sec_api_key) if use_sec_api else None
+        
+        # Keep-alive sessions per host, reused by every provider request
+        if session_pool is None:
+            session_pool = HTTPSessionPool(pool_size, http_retries, timeout=http_timeout)
+            set_shared_session_pool(session_pool)
+        self.session_pool = session_pool
+        
+        # Token buckets per provider instead of a fixed delay between tickers
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(rate_limits)
+            set_shared_rate_limiter(rate_limiter)
+        self.rate_limiter = rate_limiter
+        
+        # Backoff for transient failures, and per-provider breakers so a known outage is skipped
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breakers = {provider: CircuitBreaker(name, breaker_threshold, breaker_cooldown)
+                                 for provider, name in (('sec', 'SEC EDGAR'), ('fmp', 'Financial Modeling Prep'),
+                                                        ('alpha_vantage', 'Alpha Vantage'), ('yahoo', 'Yahoo Finance'))}
         
         # Standard SEC API headers
         self.sec_headers = {
@@ -59,8 +1948,44 @@ class FinancialDataAcquisition:
         # Base URLs
         self.SEC_SUBMISSION_BASE = "https://data.sec.gov/submissions/CIK{}.json"
         self.SEC_COMPANY_CONCEPT = "https://data.sec.gov/api/xbrl/companyconcept/CIK{}/us-gaap/{}.json"
+        self.SEC_COMPANY_FACTS = "https://data.sec.gov/api/xbrl/companyfacts/CIK{}.json"
+        self.SEC_COMPANY_TICKERS = TickerCIKIndex.COMPANY_TICKERS_URL
         self.FMP_BASE_URL = "https://financialmodelingprep.com/api/v3"
         self.ALPHA_VANTAGE_BASE = "https://www.alphavantage.co/query"
+        for name, url in (base_urls or {}).items():
+            if name not in self.BASE_URL_PROVIDERS:
+                raise ValueError(f"Unknown base URL setting: {name}")
+            setattr(self, name, url)
+        
+        # Overridden base URLs keep their provider's rate limit
+        for name, provider in self.BASE_URL_PROVIDERS.items():
+            host = urlparse(getattr(self, name)).netloc
+            if host not in self.rate_limiter.host_providers:
+                self.rate_limiter.register_host(host, provider)
+        
+        # Persistent cache for SEC responses (XBRL facts rarely change between runs)
+        self.http_cache = HTTPResponseCache(cache_dir, cache_ttls) if use_http_cache else None
+        
+        # In-memory concept indexes built from companyfacts, most recently used CIKs only
+        self.use_company_facts = use_company_facts
+        self._company_facts_index = OrderedDict()
+        self._company_facts_index_size = 32
+        
+        # Local bulk store of company facts (see CompanyFactsStore.ingest_archive)
+        if isinstance(facts_store, str):
+            facts_store = CompanyFactsStore(facts_store)
+        self.facts_store = facts_store
+        
+        # Ticker <-> CIK mapping from SEC's company tickers file (www.sec.gov, so no data.sec.gov Host header)
+        sec_www_headers = {key: value for key, value in self.sec_headers.items() if key != 'Host'}
+        self.ticker_index = ticker_index or TickerCIKIndex(headers=sec_www_headers, fetch=self._http_get,
+                                                           tickers_url=self.SEC_COMPANY_TICKERS,
+                                                           submissions_url=self.SEC_SUBMISSION_BASE)
+        
+        # Optional hedged provider racing (see _race_providers)
+        self.race_providers = race_providers
+        self.hedge_delay = hedge_delay
+        self.hedge_grace = hedge_grace
     
     def get_financial_data(self, ticker, cik=None, retry_count=3):
         """
@@ -72,7 +1997,7 @@ class FinancialDataAcquisition:
             retry_count (int): Number of retry attempts per source
             
         Returns:
-            dict: Standardized financial data for DCF analysis
+            FinancialSnapshot: Standardized financial data for DCF analysis, or None
         """
         print(f"\nFetching financial data for {ticker}...")
         
@@ -80,11 +2005,15 @@ class FinancialDataAcquisition:
         if not cik:
             cik = self._get_cik_for_ticker(ticker)
         
+        # Hedged mode: overlap providers rather than waiting out each one's retries
+        if self.race_providers:
+            return FinancialSnapshot.from_provider(self._race_providers(ticker, cik, retry_count))
+        
         # Try sources in order of reliability
         data = None
         
         # 1. Try SEC Edgar API first (most authoritative)
-        if self.sec_api_key:
+        if self.use_sec_edgar:
             data = self._get_data_from_sec(ticker, cik, retry_count)
         
         # 2. Try Financial Modeling Prep if SEC failed
@@ -96,23 +2025,210 @@ class FinancialDataAcquisition:
             data = self._get_data_from_alpha_vantage(ticker, retry_count)
             
         # 4. Fall back to Yahoo Finance as last resort
-        if not data:
+        if not data and self.use_yahoo:
             data = self._get_data_from_yahoo(ticker, retry_count)
             
-        return data
+        return FinancialSnapshot.from_provider(data)
+    
+    def _provider_chain(self, ticker, cik, retry_count=3):
+        """
+        Configured providers in priority order.
+        
+        Returns:
+            list: (name, callable) pairs, most authoritative first
+        """
+        providers = []
+        if self.use_sec_edgar:
+            providers.append(('SEC EDGAR', lambda: self._get_data_from_sec(ticker, cik, retry_count)))
+        if self.fmp_api_key:
+            providers.append(('Financial Modeling Prep', lambda: self._get_data_from_fmp(ticker, retry_count)))
+        if self.alpha_vantage_key:
+            providers.append(('Alpha Vantage', lambda: self._get_data_from_alpha_vantage(ticker, retry_count)))
+        if self.use_yahoo:
+            providers.append(('Yahoo Finance', lambda: self._get_data_from_yahoo(ticker, retry_count)))
+        return providers
+    
+    def _race_providers(self, ticker, cik, retry_count=3):
+        """
+        Hedged provider strategy for get_financial_data.
+        
+        The preferred provider starts immediately; each further provider is started
+        once hedge_delay passes without a usable result, or as soon as an earlier one
+        fails. Once a provider returns a complete, validated result, higher-priority
+        providers still running get hedge_grace seconds to answer; the highest-priority
+        result in hand then wins. The losing calls are cancelled: their next rate-limited
+        request raises ProviderCallCancelled instead of taking a token.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            cik (str): Company CIK number
+            retry_count (int): Number of retry attempts per source
+            
+        Returns:
+            dict: Standardized financial data, or None if every provider failed
+        """
+        providers = self._provider_chain(ticker, cik, retry_count)
+        if not providers:
+            return None
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(providers))
+        cancel = threading.Event()
+        pending = {}
+        next_provider = 0
+        best = None  # (rank, data) of the highest-priority usable result so far
+        deadline = None
+        
+        def hedged(fetch):
+            token = _provider_cancel_event.set(cancel)
+            try:
+                return fetch()
+            finally:
+                _provider_cancel_event.reset(token)
+        
+        try:
+            while True:
+                # Launch the next provider in the chain when there is nothing in flight
+                # or the running ones have had hedge_delay to answer
+                if best is None and next_provider < len(providers):
+                    name, fetch = providers[next_provider]
+                    pending[executor.submit(hedged, fetch)] = next_provider
+                    next_provider += 1
+                    if len(pending) > 1:
+                        print(f"Hedging {ticker}: also requesting {name}")
+                
+                if best is not None:
+                    # Only providers ranked above the result in hand are still worth waiting for
+                    preferred = [future for future, rank in pending.items() if rank < best[0]]
+                    remaining = deadline - time.monotonic()
+                    if not preferred or remaining <= 0:
+                        return best[1]
+                    done, _ = concurrent.futures.wait(preferred, timeout=remaining,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                elif not pending:
+                    return None
+                else:
+                    timeout = self.hedge_delay if next_provider < len(providers) else None
+                    done, _ = concurrent.futures.wait(pending, timeout=timeout,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                
+                # Rank whatever finished together by source priority
+                for future in sorted(done, key=pending.get):
+                    rank = pending.pop(future)
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        print(f"{providers[rank][0]} failed for {ticker}: {e}")
+                        continue
+                    if not self._is_valid_financial_data(data):
+                        print(f"{providers[rank][0]} returned no usable data for {ticker}")
+                    elif best is None:
+                        best = (rank, data)
+                        deadline = time.monotonic() + self.hedge_grace
+                    elif rank < best[0]:
+                        best = (rank, data)
+                
+                if best is None and next_provider >= len(providers) and not pending:
+                    return None
+        finally:
+            # Stop the losers before they spend more of their providers' rate limits
+            cancel.set()
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    def _is_valid_financial_data(self, data):
+        """Check a provider result has the fields the DCF needs"""
+        if not isinstance(data, Mapping):
+            return False
+        try:
+            return (data.get('free_cash_flow') is not None
+                    and float(data.get('shares_outstanding') or 0) > 0
+                    and float(data.get('current_price') or 0) > 0)
+        except (TypeError, ValueError):
+            return False
+    
+    def _provider_available(self, provider):
+        """Check the provider's circuit breaker before calling it"""
+        breaker = self.circuit_breakers[provider]
+        if breaker.allow():
+            state = _provider_call_state.get()
+            if state is not None:
+                state['allowed'] = True
+            return True
+        print(f"Skipping {breaker.name}: circuit open after repeated failures")
+        return False
+    
+    def _retry_delay(self, provider, attempt, retry_count, response=None, error=None):
+        """
+        Decide whether a failed provider attempt is retried.
+        
+        Args:
+            provider (str): Provider key in self.circuit_breakers
+            attempt (int): Zero-based index of the failed attempt
+            retry_count (int): Total attempts allowed
+            response: HTTP response with an error status, if the failure was a response
+            error (Exception): Exception raised, if the failure was an exception
+            
+        Returns:
+            float: Seconds to wait before retrying, or None to give up
+        """
+        retry_after = None
+        if response is not None:
+            transient = self.retry_policy.is_retryable_status(response.status_code)
+            retry_after = response.headers.get('Retry-After') if response.headers else None
+        elif error is not None:
+            transient = self.retry_policy.is_retryable_error(error)
+            retry_after = getattr(error, 'retry_after', None)
+        else:
+            transient = False  # Missing or unusable data won't change on retry
+        
+        # Only the latest attempt decides how the call ended
+        state = _provider_call_state.get()
+        if state is not None:
+            state['transient'] = transient
+        
+        if not transient:
+            return None
+        
+        # One failure per call that gives up, so a single ticker's retries can't open the breaker;
+        # a call that is a half-open trial, or sees the breaker opened meanwhile, gives up now
+        breaker = self.circuit_breakers[provider]
+        if attempt >= retry_count - 1 or breaker.state != 'closed':
+            breaker.record_failure()
+            return None
+        return self.retry_policy.delay(attempt, retry_after)
+    
+    def _retry_or_give_up(self, provider, attempt, retry_count, response=None, error=None):
+        """Sleep and return True if the failure should be retried, else return False"""
+        delay = self._retry_delay(provider, attempt, retry_count, response, error)
+        if delay is None:
+            return False
+        print(f"Retrying in {delay:.1f} seconds...")
+        time.sleep(delay)
+        return True
+    
+    def _raise_for_transient_status(self, response, url):
+        """Raise TransientHTTPError for retryable statuses so they are not mistaken for missing data"""
+        if self.retry_policy.is_retryable_status(response.status_code):
+            raise TransientHTTPError(response.status_code, url, response.headers.get('Retry-After') if response.headers else None)
     
     def _get_cik_for_ticker(self, ticker):
         """Get CIK number for a ticker symbol"""
         try:
-            # Try SEC API first
-            if self.sec_api_key:
+            # Local SEC ticker index first (no per-lookup requests)
+            cik = self.ticker_index.cik_for_ticker(ticker) if self.ticker_index else None
+            if cik:
+                return cik
+            
+            # Try SEC API next
+            if self.sec_query_api:
                 query = {
                     "query": f"ticker:{ticker}",
                     "formTypes": ["10-K"],
                     "startDate": "2020-01-01",
                     "endDate": datetime.now().strftime("%Y-%m-%d")
                 }
-                response = self.sec_query_api.get_filings(query)
+                response = recorded_call(('sec_api.get_filings', repr(query)),
+                                         lambda: self.sec_query_api.get_filings(query))
                 if response and 'filings' in response and len(response['filings']) > 0:
                     return response['filings'][0]['cik']
             
@@ -129,11 +2245,14 @@ class FinancialDataAcquisition:
             print(f"Error looking up CIK for {ticker}: {e}")
             return None
     
+    @_provider_call('sec')
     def _get_data_from_sec(self, ticker, cik, retry_count=3):
         """Get financial data from SEC EDGAR filings"""
         if not cik:
             print("Cannot fetch SEC data without CIK")
             return None
+        if not self._provider_available('sec'):
+            return None
             
         for attempt in range(retry_count):
             try:
@@ -154,8 +2273,6 @@ class FinancialDataAcquisition:
                 
                 if not cash_flow_data or not capex_data:
                     print(f"Could not retrieve complete SEC cash flow data for {ticker}")
-                    if attempt < retry_count - 1:
-                        continue
                     return None
                 
                 # Get shares outstanding data
@@ -164,144 +2281,452 @@ class FinancialDataAcquisition:
                 
                 if not shares_data:
                     print(f"Could not retrieve SEC shares data for {ticker}")
-                    if attempt < retry_count - 1:
-                        continue
-                    return None
-                
-                # Extract the latest annual data
-                latest_cash_flow = self._extract_latest_annual_value(cash_flow_data)
-                latest_capex = self._extract_latest_annual_value(capex_data)
-                latest_shares = self._extract_latest_annual_value(shares_data)
-                
-                if not all([latest_cash_flow, latest_capex, latest_shares]):
-                    print(f"Missing latest values from SEC data for {ticker}")
-                    if attempt < retry_count - 1:
-                        continue
                     return None
                 
-                # Get current price from Yahoo Finance (SEC doesn't provide this)
-                stock = yf.Ticker(ticker)
-                current_price = stock.history(period="1d")["Close"].iloc[-1]
-                
-                # Calculate FCF (capex is usually negative in filings)
-                # Make capex negative if positive
-                if latest_capex > 0:
-                    latest_capex = -latest_capex
-                    
-                free_cash_flow = latest_cash_flow + latest_capex
-                
-                # Create historical data for growth calculation
-                historical_cash_flows = self._get_historical_annual_values(cash_flow_data, years=5)
-                historical_capex = self._get_historical_annual_values(capex_data, years=5)
-                
-                # Make capex negative if positive
-                historical_capex = [-x if x > 0 else x for x in historical_capex]
-                
-                # Calculate historical FCF
-                historical_fcf = [cf + capex for cf, capex in zip(historical_cash_flows, historical_capex) if cf and capex]
-                
                 # Also get revenue data for growth calculations
                 revenue_data = self._get_sec_concept_data(cik_padded, "Revenues") or \
                               self._get_sec_concept_data(cik_padded, "RevenueFromContractWithCustomerExcludingAssessedTax")
-                historical_revenue = self._get_historical_annual_values(revenue_data, years=5)
                 
-                # Create a structure similar to what the rest of the code expects
-                return {
-                    'free_cash_flow': free_cash_flow,
-                    'shares_outstanding': latest_shares,
-                    'current_price': current_price,
-                    'ticker': ticker,
-                    'historical_fcf': historical_fcf,
-                    'historical_revenue': historical_revenue,
-                    'data_source': 'SEC EDGAR'
-                }
+                data = self._build_sec_result(ticker, cash_flow_data, capex_data, shares_data, revenue_data,
+                                              cik_padded=cik_padded)
+                if not data:
+                    print(f"Missing latest values from SEC data for {ticker}")
+                    return None
+                self.circuit_breakers['sec'].record_success()
+                return data
                 
             except Exception as e:
                 print(f"SEC data attempt {attempt + 1} failed: {e}")
-                if attempt < retry_count - 1:
-                    print(f"Retrying in 2 seconds...")
-                    time.sleep(2)
+                if not self._retry_or_give_up('sec', attempt, retry_count, error=e):
+                    return None
         
         return None
     
-    def _get_sec_concept_data(self, cik_padded, concept):
+    def _build_sec_result(self, ticker, cash_flow_data, capex_data, shares_data, revenue_data, stock=None,
+                          cik_padded=None):
+        """
+        Assemble the standardized SEC result from fetched concept data.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            cash_flow_data, capex_data, shares_data, revenue_data (list): SEC facts per concept
+            stock (TickerSnapshot): Snapshot used for the current price (created if not given)
+            cik_padded (str): 10-digit CIK, recorded with the facts in the fundamentals store
+            
+        Returns:
+            dict: Standardized financial data, or None if latest values are missing
+        """
+        # One frame per concept, deduplicated to one value per fiscal year
+        cash_flow = SECFactFrame(cash_flow_data)
+        capex = SECFactFrame(capex_data)
+        shares = SECFactFrame(shares_data)
+        revenue = SECFactFrame(revenue_data)
+        
+        latest_shares = shares.latest()
+        if not len(cash_flow) or not len(capex) or not latest_shares:
+            return None
+        
+        # FCF per fiscal year from cash flow and capex of the same period
+        # (capex is usually positive in filings, make it an outflow)
+        aligned = align_sec_facts(cash_flow=cash_flow, capex=capex)
+        fcf = aligned['cash_flow'] - aligned['capex'].abs()
+        if len(fcf):
+            free_cash_flow, fcf_period_end = fcf.iat[-1], fcf.index[-1]
+        else:
+            free_cash_flow, fcf_period_end = cash_flow.latest() - abs(capex.latest()), cash_flow.values.index[-1]
+        fcf_basis = 'annual'
+        
+        # Trailing twelve months from 10-Q filings when they are newer than the last 10-K
+        self._load_sec_quarters(ticker, cash_flow_data, capex_data, revenue_data)
+        ttm = ttm_free_cash_flow(ticker)
+        if ttm and ttm[0] > fcf_period_end:
+            fcf_period_end, free_cash_flow = ttm
+            fcf_basis = 'TTM'
+        
+        # Get current price from Yahoo Finance (SEC doesn't provide this)
+        stock = stock or TickerSnapshot(ticker)
+        current_price = get_price_service().get_price(ticker, stock)
+        
+        # Historical data for growth calculation, most recent first
+        historical_fcf = fcf.iloc[-5:].iloc[::-1].tolist()
+        historical_revenue = revenue.history(years=5)
+        
+        # Keep the normalized annual facts for later stages and runs
+        ingest_fundamentals(
+            self._sec_fundamentals(ticker, cik_padded, cash_flow, 'Operating Cash Flow', 'cashflow') +
+            self._sec_fundamentals(ticker, cik_padded, capex, 'Capital Expenditure', 'cashflow', sign=-1) +
+            self._sec_fundamentals(ticker, cik_padded, shares, 'Ordinary Shares Number', 'balance', unit='shares') +
+            self._sec_fundamentals(ticker, cik_padded, revenue, 'Total Revenue', 'income'))
+        
+        # Create a structure similar to what the rest of the code expects
+        return {
+            'free_cash_flow': free_cash_flow,
+            'shares_outstanding': latest_shares,
+            'current_price': current_price,
+            'ticker': ticker,
+            'historical_fcf': historical_fcf,
+            'historical_revenue': historical_revenue,
+            'data_source': 'SEC EDGAR',
+            'fcf_basis': fcf_basis,
+            'fcf_period_end': fcf_period_end,
+            'stock': stock
+        }
+    
+    def _load_sec_quarters(self, ticker, cash_flow_data, capex_data, revenue_data=None):
+        """Roll the quarters in SEC cash flow, capex and revenue facts into the TTM engine"""
+        engine = get_ttm_engine()
+        try:
+            engine.load(ticker, 'Operating Cash Flow', sec_quarterly_values(cash_flow_data))
+            engine.load(ticker, 'Capital Expenditure', -sec_quarterly_values(capex_data).abs())
+            if revenue_data:
+                engine.load(ticker, 'Total Revenue', sec_quarterly_values(revenue_data))
+        except Exception as e:
+            print(f"Could not compute quarterly values for {ticker}: {e}")
+    
+    def refresh_fundamentals(self, ciks, forms=None):
+        """
+        Bring stored fundamentals up to date for companies that filed since the last refresh.
+        
+        For each CIK the submissions index is compared with the last ingested accession
+        number; only companies with newer filings have their cached facts invalidated and
+        only the facts from those new filings are parsed into the fundamentals store: full
+        years from 10-Ks as annual rows, and quarters from 10-Qs and 10-Ks as quarterly rows.
+        
+        Provider rows stored without a CIK (Yahoo, FMP, Alpha Vantage) are found through the
+        ticker, taken from the SEC ticker index or else from earlier SEC rows for the CIK. A
+        company known by neither, or whose company facts could not be fetched, is left as it
+        was and tried again on the next refresh.
+        
+        Args:
+            ciks (iterable): Company CIKs
+            forms (tuple): Filing forms that count as new fundamentals (default REFRESH_FORMS)
+        
+        Returns:
+            list: 10-digit CIKs that had new filings
+        """
+        store = get_fundamentals_store()
+        if store is None:
+            print("Fundamentals store is disabled, nothing to refresh")
+            return []
+        
+        forms = forms or self.REFRESH_FORMS
+        ciks = [str(cik).lstrip('0').zfill(10) for cik in ciks]
+        changed = []
+        for cik_padded in ciks:
+            try:
+                new_filings = self._new_filings(cik_padded, store, forms)
+                if new_filings and self._apply_new_filings(cik_padded, new_filings, store):
+                    changed.append(cik_padded)
+            except Exception as e:
+                print(f"Could not refresh filings for CIK {cik_padded}: {e}")
+        
+        print(f"{len(changed)} of {len(ciks)} companies have new filings")
+        return changed
+    
+    def _new_filings(self, cik_padded, store, forms):
+        """
+        Filings listed in the submissions index that are newer than the last one ingested.
+        
+        Returns:
+            list: [{'accession', 'form', 'filed'}], newest first
+        """
+        url = self.SEC_SUBMISSION_BASE.format(cik_padded)
+        response = self._http_get(url, headers=self.sec_headers)
+        self._raise_for_transient_status(response, url)
+        if response.status_code != 200:
+            print(f"Error fetching submissions for CIK {cik_padded}: Status {response.status_code}")
+            return []
+        
+        recent = response.json().get('filings', {}).get('recent', {})
+        last = store.last_filing(cik_padded)
+        new_filings = []
+        # The recent filings arrays are ordered newest first
+        for accession, form, filed in zip(recent.get('accessionNumber', []), recent.get('form', []),
+                                          recent.get('filingDate', [])):
+            if last and (accession == last['accession'] or (last.get('filed') and filed < last['filed'])):
+                break
+            if form in forms:
+                new_filings.append({'accession': accession, 'form': form, 'filed': filed})
+        return new_filings
+    
+    def _apply_new_filings(self, cik_padded, new_filings, store):
+        """
+        Invalidate cached data for a company that filed, and ingest facts from the new filings only.
+        
+        The newest accession is recorded only once its facts are in the store, so a company
+        whose facts could not be fetched (or whose ticker is unknown) is retried next time.
+        
+        Returns:
+            bool: True if the new filings were ingested
+        """
+        ticker = self.ticker_index.ticker_for_cik(cik_padded) if self.ticker_index else None
+        ticker = ticker or store.ticker_for_cik(cik_padded)
+        if not ticker:
+            print(f"No ticker known for CIK {cik_padded}, leaving its stored fundamentals as they are")
+            return False
+        
+        # Cached SEC responses for this company are stale now; fetch the facts fresh
+        facts_url = self.SEC_COMPANY_FACTS.format(cik_padded)
+        if self.http_cache:
+            self.http_cache.invalidate(facts_url)
+            for concept in self.SEC_FUNDAMENTAL_CONCEPTS:
+                self.http_cache.invalidate(self.SEC_COMPANY_CONCEPT.format(cik_padded, concept))
+        self._company_facts_index.pop(cik_padded, None)
+        
+        response = self._sec_get(facts_url)
+        self._raise_for_transient_status(response, facts_url)
+        if response.status_code != 200:
+            print(f"Error fetching company facts for CIK {cik_padded}: Status {response.status_code}")
+            return False
+        
+        document = response.json()
+        facts = document.get('facts', {}).get('us-gaap', {})
+        self._remember_company_facts_index(
+            cik_padded, {concept: data.get('units', {}) for concept, data in facts.items()})
+        if self.facts_store:
+            self.facts_store.ingest_company_facts(document)
+        
+        # Other providers' statements predate the new filings; drop them only now the SEC facts are in hand
+        store.invalidate(ticker=ticker, cik=cik_padded,
+                         sources=[source for source in store.SOURCE_PRIORITY if source != 'SEC EDGAR'])
+        
+        accessions = {filing['accession'] for filing in new_filings}
+        records = []
+        for concept, (line_item, statement, sign, unit) in self.SEC_FUNDAMENTAL_CONCEPTS.items():
+            unit_list = facts.get(concept, {}).get('units', {}).get(unit, [])
+            new_facts = [fact for fact in unit_list if fact.get('accn') in accessions]
+            records += self._sec_fundamentals(ticker, cik_padded, new_facts, line_item, statement, sign, unit)
+            # Quarters need the earlier year-to-date facts to de-cumulate, so pass them all
+            records += self._sec_quarterly_fundamentals(ticker, cik_padded, unit_list, line_item, statement,
+                                                        sign, unit, new_accessions=accessions)
+        ingest_fundamentals(records)
+        
+        def unit_facts(*concepts):
+            for concept in concepts:
+                unit_list = facts.get(concept, {}).get('units', {}).get('USD')
+                if unit_list:
+                    return unit_list
+            return None
+        self._load_sec_quarters(
+            ticker,
+            unit_facts('NetCashProvidedByUsedInOperatingActivities', 'CashProvidedByUsedInOperatingActivities'),
+            unit_facts('PaymentsToAcquirePropertyPlantAndEquipment', 'CapitalExpenditures'),
+            unit_facts('Revenues', 'RevenueFromContractWithCustomerExcludingAssessedTax'))
+        
+        newest = new_filings[0]
+        store.record_filing(cik_padded, newest['accession'], newest['form'], newest['filed'])
+        return True
+    
+    def _sec_quarterly_fundamentals(self, ticker, cik_padded, facts, concept, statement, sign=1, unit='USD',
+                                    new_accessions=None):
+        """
+        FundamentalsStore rows for the quarters of one SEC concept (see sec_quarterly_values).
+        
+        Args:
+            facts (list): Concept facts, 10-Q and 10-K
+            sign (int): -1 to store the value as negative
+            new_accessions (set): Only keep quarters reported in these filings
+        
+        Returns:
+            list: Row dicts, one per quarter
+        """
+        frame = pd.DataFrame.from_records(facts or [], columns=list(SECFactFrame.FIELDS)).dropna(subset=['end', 'val'])
+        if frame.empty:
+            return []
+        frame['end'] = pd.to_datetime(frame['end'], errors='coerce')
+        latest = frame.sort_values('filed', kind='stable').drop_duplicates('end', keep='last').set_index('end')
+        
+        if frame['start'].notna().any():
+            values = sec_quarterly_values(facts)
+        else:
+            # Point-in-time concepts (share counts) are reported as of each quarter end
+            values = latest.loc[latest['form'].isin(('10-Q', '10-Q/A') + SECFactFrame.ANNUAL_FORMS), 'val'].astype(float)
+        if new_accessions is not None:
+            values = values[values.index.isin(frame.loc[frame['accn'].isin(new_accessions), 'end'])]
+        if sign < 0:
+            values = -values.abs()
+        
+        return [{
+            'cik': cik_padded, 'ticker': ticker, 'statement': statement, 'concept': concept,
+            'period_type': 'quarterly', 'period_end': end, 'fiscal_year': latest.at[end, 'fy'],
+            'fiscal_period': latest.at[end, 'fp'], 'value': value, 'unit': unit, 'source': 'SEC EDGAR',
+            'filed': latest.at[end, 'filed'], 'accession': latest.at[end, 'accn']
+        } for end, value in values.items() if end in latest.index]
+    
+    def _sec_fundamentals(self, ticker, cik_padded, facts, concept, statement, sign=1, unit='USD'):
+        """
+        FundamentalsStore rows for the annual (10-K, full-year) facts of one SEC concept.
+        
+        Args:
+            facts (SECFactFrame or list): Concept facts
+            sign (int): -1 to store the value as negative (outflows such as capex, like yfinance)
+        
+        Returns:
+            list: Row dicts, one per fiscal year
+        """
+        if not isinstance(facts, SECFactFrame):
+            facts = SECFactFrame(facts, annual_forms=('10-K',))
+        if not len(facts) or not facts.frame['form'].isin(SECFactFrame.ANNUAL_FORMS).all():
+            return []
+        
+        frame = facts.frame
+        values = -facts.values.abs() if sign < 0 else facts.values
+        return [{
+            'cik': cik_padded, 'ticker': ticker, 'statement': statement, 'concept': concept,
+            'period_type': 'annual', 'period_end': end, 'fiscal_year': fy, 'fiscal_period': fp,
+            'value': value, 'unit': unit, 'source': 'SEC EDGAR', 'filed': filed, 'accession': accession
+        } for end, fy, fp, value, filed, accession in zip(frame.index, frame['fy'], frame['fp'], values,
+                                                           frame['filed'], frame['accn'])]
+    
+    def _provider_fundamentals(self, ticker, rows, date_field, fields, source, filed_field=None):
+        """
+        FundamentalsStore rows from provider statement records (FMP lists, Alpha Vantage annualReports).
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            rows (list): Statement records, one per fiscal year
+            date_field (str): Field holding the period end date
+            fields (dict): {concept: (statement, field, sign)}, sign -1 stores the value as negative
+            source (str): Provider name
+            filed_field (str): Field holding the filing date, if any
+        
+        Returns:
+            list: Row dicts
+        """
+        records = []
+        for row in rows or []:
+            for concept, (statement, field, sign) in fields.items():
+                try:
+                    value = float(row.get(field))
+                except (TypeError, ValueError):
+                    continue
+                records.append({
+                    'ticker': ticker, 'statement': statement, 'concept': concept, 'period_type': 'annual',
+                    'period_end': row.get(date_field), 'fiscal_period': 'FY',
+                    'value': -abs(value) if sign < 0 else value, 'unit': 'USD', 'source': source,
+                    'filed': row.get(filed_field) if filed_field else None
+                })
+        return records
+    
+    def _concept_unit(self, concept):
+        """XBRL unit a concept is reported in ('shares' for share counts, else 'USD')"""
+        return self.SEC_FUNDAMENTAL_CONCEPTS.get(concept, (None, None, 1, 'USD'))[3]
+    
+    def _get_sec_concept_data(self, cik_padded, concept, unit=None):
         """Get specific concept data from SEC API"""
+        unit = unit or self._concept_unit(concept)
+        # Answer from the companyfacts index when available (covers fallback concepts too)
+        if self.use_company_facts or self.facts_store:
+            index = self._get_company_facts_index(cik_padded)
+            if index is not None:
+                units = index.get(concept)
+                if units and unit in units:
+                    return units[unit]
+                return None
+        
+        return self._fetch_sec_concept_data(cik_padded, concept, unit)
+    
+    def _fetch_sec_concept_data(self, cik_padded, concept, unit=None):
+        """Request a single concept from the SEC companyconcept endpoint"""
+        unit = unit or self._concept_unit(concept)
         url = self.SEC_COMPANY_CONCEPT.format(cik_padded, concept)
         
         try:
-            response = requests.get(url, headers=self.sec_headers)
-            
+            response = self._sec_get(url)
+            self._raise_for_transient_status(response, url)
+            
+            if response.status_code == 200:
+                result = response.json()
+                if 'units' in result and unit in result['units']:
+                    return result['units'][unit]
+                return None
+            else:
+                print(f"Error fetching {concept} data: Status {response.status_code}")
+                return None
+        except TransientHTTPError:
+            raise
+        except Exception as e:
+            print(f"Exception while fetching {concept}: {e}")
+            return None
+    
+    def _get_company_facts_index(self, cik_padded):
+        """
+        Get the us-gaap concept index for a company, fetching companyfacts once per CIK.
+        
+        Returns:
+            dict: {concept: {unit: [facts]}}, or None if companyfacts is unavailable
+        """
+        if cik_padded in self._company_facts_index:
+            self._company_facts_index.move_to_end(cik_padded)
+            return self._company_facts_index[cik_padded]
+        
+        # Local bulk store first, no network needed
+        index = self.facts_store.get_company_facts_index(cik_padded) if self.facts_store else None
+        if index is not None or not self.use_company_facts:
+            return self._remember_company_facts_index(cik_padded, index)
+        
+        url = self.SEC_COMPANY_FACTS.format(cik_padded)
+        try:
+            response = self._sec_get(url)
+            # Throttled: don't fall back to one request per concept against the same host
+            self._raise_for_transient_status(response, url)
             if response.status_code == 200:
-                result = response.json()
-                if 'units' in result and 'USD' in result['units']:
-                    return result['units']['USD']
-                return None
+                facts = response.json().get('facts', {}).get('us-gaap', {})
+                index = {concept: data.get('units', {}) for concept, data in facts.items()}
             else:
-                print(f"Error fetching {concept} data: Status {response.status_code}")
-                return None
+                print(f"Error fetching company facts: Status {response.status_code}, using per-concept requests")
+        except TransientHTTPError:
+            raise
         except Exception as e:
-            print(f"Exception while fetching {concept}: {e}")
-            return None
+            print(f"Exception while fetching company facts: {e}, using per-concept requests")
+        
+        return self._remember_company_facts_index(cik_padded, index)
+    
+    def _remember_company_facts_index(self, cik_padded, index):
+        """Keep a concept index for the most recently used CIKs"""
+        self._company_facts_index[cik_padded] = index
+        if len(self._company_facts_index) > self._company_facts_index_size:
+            self._company_facts_index.popitem(last=False)
+        return index
+    
+    def _sec_get(self, url):
+        """GET an SEC endpoint, through the persistent response cache when enabled"""
+        if self.http_cache:
+            return self.http_cache.get(url, headers=self.sec_headers, fetch=self._http_get)
+        return self._http_get(url, headers=self.sec_headers)
+    
+    def _http_get(self, url, **kwargs):
+        """GET a URL over the pooled keep-alive session for its host, within its provider's rate limit"""
+        self.rate_limiter.acquire_for_url(url)
+        return self.session_pool.get(url, **kwargs)
     
     def _extract_latest_annual_value(self, concept_data):
         """Extract the most recent annual value from SEC concept data"""
         if not concept_data:
             return None
-            
-        # Filter for annual reports (10-K)
-        annual_data = [item for item in concept_data if item.get('form') == '10-K']
-        
-        if not annual_data:
-            # Try to use any data as fallback
-            annual_data = concept_data
-            
-        # Sort by end date (most recent first)
-        sorted_data = sorted(annual_data, key=lambda x: x.get('end', '1900-01-01'), reverse=True)
-        
-        if sorted_data:
-            return sorted_data[0].get('val')
-            
-        return None
+        return SECFactFrame(concept_data).latest()
     
     def _get_historical_annual_values(self, concept_data, years=5):
-        """Get historical annual values for a concept"""
+        """Get historical annual values for a concept, one per fiscal year, most recent first"""
         if not concept_data:
             return []
-            
-        # Filter for annual reports (10-K)
-        annual_data = [item for item in concept_data if item.get('form') == '10-K']
-        
-        if not annual_data:
-            # Try to use any data as fallback
-            annual_data = concept_data
-            
-        # Sort by end date (most recent first)
-        sorted_data = sorted(annual_data, key=lambda x: x.get('end', '1900-01-01'), reverse=True)
-        
-        # Get the values for the specified number of years
-        values = []
-        for i, data in enumerate(sorted_data):
-            if i >= years:
-                break
-            values.append(data.get('val'))
-            
-        return values
+        return SECFactFrame(concept_data).history(years)
     
+    @_provider_call('fmp')
     def _get_data_from_fmp(self, ticker, retry_count=3):
         """Get financial data from Financial Modeling Prep API"""
-        if not self.fmp_api_key:
+        if not self.fmp_api_key or not self._provider_available('fmp'):
             return None
             
         for attempt in range(retry_count):
             try:
                 # Get cash flow statement
                 cash_flow_url = f"{self.FMP_BASE_URL}/cash-flow-statement/{ticker}?period=annual&limit=5&apikey={self.fmp_api_key}"
-                cf_response = requests.get(cash_flow_url)
+                cf_response = self._http_get(cash_flow_url)
                 
                 if cf_response.status_code != 200:
                     print(f"FMP API error: {cf_response.status_code}")
-                    if attempt < retry_count - 1:
-                        time.sleep(2)
+                    if self._retry_or_give_up('fmp', attempt, retry_count, response=cf_response):
                         continue
                     return None
                     
@@ -309,19 +2734,15 @@ class FinancialDataAcquisition:
                 
                 if not cash_flow_data:
                     print("No cash flow data from FMP")
-                    if attempt < retry_count - 1:
-                        time.sleep(2)
-                        continue
                     return None
                 
                 # Get current company profile for shares and price
                 profile_url = f"{self.FMP_BASE_URL}/profile/{ticker}?apikey={self.fmp_api_key}"
-                profile_response = requests.get(profile_url)
+                profile_response = self._http_get(profile_url)
                 
                 if profile_response.status_code != 200:
                     print(f"FMP API profile error: {profile_response.status_code}")
-                    if attempt < retry_count - 1:
-                        time.sleep(2)
+                    if self._retry_or_give_up('fmp', attempt, retry_count, response=profile_response):
                         continue
                     return None
                     
@@ -329,9 +2750,6 @@ class FinancialDataAcquisition:
                 
                 if not profile_data or len(profile_data) == 0:
                     print("No profile data from FMP")
-                    if attempt < retry_count - 1:
-                        time.sleep(2)
-                        continue
                     return None
                 
                 # Extract the necessary data
@@ -361,18 +2779,31 @@ class FinancialDataAcquisition:
                 
                 # Get revenue data
                 income_stmt_url = f"{self.FMP_BASE_URL}/income-statement/{ticker}?period=annual&limit=5&apikey={self.fmp_api_key}"
-                income_response = requests.get(income_stmt_url)
+                income_response = self._http_get(income_stmt_url)
                 
                 historical_revenue = []
+                income_data = []
                 if income_response.status_code == 200:
                     income_data = income_response.json()
                     historical_revenue = [stmt.get('revenue') for stmt in income_data]
                 
+                ingest_fundamentals(
+                    self._provider_fundamentals(ticker, cash_flow_data, 'date', {
+                        'Operating Cash Flow': ('cashflow', 'netCashProvidedByOperatingActivities', 1),
+                        'Capital Expenditure': ('cashflow', 'capitalExpenditure', -1),
+                        'Free Cash Flow': ('cashflow', 'freeCashFlow', 1),
+                    }, 'Financial Modeling Prep', 'fillingDate') +
+                    self._provider_fundamentals(ticker, income_data, 'date', {
+                        'Total Revenue': ('income', 'revenue', 1),
+                    }, 'Financial Modeling Prep', 'fillingDate'))
+                
                 # Extract profile information
                 profile = profile_data[0]
                 shares_outstanding = profile.get('mktCap') / profile.get('price') if profile.get('price', 0) > 0 else None
                 current_price = profile.get('price')
+                get_price_service().prime(ticker, current_price)
                 
+                self.circuit_breakers['fmp'].record_success()
                 return {
                     'free_cash_flow': free_cash_flow,
                     'shares_outstanding': shares_outstanding,
@@ -385,66 +2816,73 @@ class FinancialDataAcquisition:
                 
             except Exception as e:
                 print(f"FMP data attempt {attempt + 1} failed: {e}")
-                if attempt < retry_count - 1:
-                    print(f"Retrying in 2 seconds...")
-                    time.sleep(2)
+                if not self._retry_or_give_up('fmp', attempt, retry_count, error=e):
+                    return None
         
         return None
     
+    @_provider_call('alpha_vantage')
     def _get_data_from_alpha_vantage(self, ticker, retry_count=3):
         """Get financial data from Alpha Vantage API"""
-        if not self.alpha_vantage_key:
+        if not self.alpha_vantage_key or not self._provider_available('alpha_vantage'):
             return None
             
         for attempt in range(retry_count):
             try:
                 # Get cash flow statement
                 cf_url = f"{self.ALPHA_VANTAGE_BASE}?function=CASH_FLOW&symbol={ticker}&apikey={self.alpha_vantage_key}"
-                cf_response = requests.get(cf_url)
+                cf_response = self._http_get(cf_url)
                 
                 if cf_response.status_code != 200:
                     print(f"Alpha Vantage API error: {cf_response.status_code}")
-                    if attempt < retry_count - 1:
-                        time.sleep(2)
+                    if self._retry_or_give_up('alpha_vantage', attempt, retry_count, response=cf_response):
                         continue
                     return None
                     
                 cf_data = cf_response.json()
                 
+                # Alpha Vantage reports throttling as a 200 with a Note/Information message
+                if 'Note' in cf_data or 'Information' in cf_data:
+                    print(f"Alpha Vantage rate limit: {cf_data.get('Note') or cf_data.get('Information')}")
+                    if self._retry_or_give_up('alpha_vantage', attempt, retry_count,
+                                              error=TransientHTTPError(429, cf_url)):
+                        continue
+                    return None
+                
                 if 'annualReports' not in cf_data or not cf_data['annualReports']:
                     print("No cash flow data from Alpha Vantage")
-                    if attempt < retry_count - 1:
-                        time.sleep(2)
-                        continue
                     return None
                 
                 # Get overview for shares outstanding
                 overview_url = f"{self.ALPHA_VANTAGE_BASE}?function=OVERVIEW&symbol={ticker}&apikey={self.alpha_vantage_key}"
-                overview_response = requests.get(overview_url)
+                overview_response = self._http_get(overview_url)
                 
                 if overview_response.status_code != 200:
                     print(f"Alpha Vantage API overview error: {overview_response.status_code}")
-                    if attempt < retry_count - 1:
-                        time.sleep(2)
+                    if self._retry_or_give_up('alpha_vantage', attempt, retry_count, response=overview_response):
                         continue
                     return None
                     
                 overview_data = overview_response.json()
                 
-                # Get current price
-                quote_url = f"{self.ALPHA_VANTAGE_BASE}?function=GLOBAL_QUOTE&symbol={ticker}&apikey={self.alpha_vantage_key}"
-                quote_response = requests.get(quote_url)
-                current_price = None
+                # Get current price, skipping the quote request when a batched price is cached
+                current_price = get_price_service().cached_price(ticker)
+                stock = None
                 
-                if quote_response.status_code == 200:
-                    quote_data = quote_response.json()
-                    if 'Global Quote' in quote_data and '05. price' in quote_data['Global Quote']:
-                        current_price = float(quote_data['Global Quote']['05. price'])
+                if not current_price:
+                    quote_url = f"{self.ALPHA_VANTAGE_BASE}?function=GLOBAL_QUOTE&symbol={ticker}&apikey={self.alpha_vantage_key}"
+                    quote_response = self._http_get(quote_url)
+                    
+                    if quote_response.status_code == 200:
+                        quote_data = quote_response.json()
+                        if 'Global Quote' in quote_data and '05. price' in quote_data['Global Quote']:
+                            current_price = float(quote_data['Global Quote']['05. price'])
+                            get_price_service().prime(ticker, current_price)
                 
                 if not current_price:
                     # Fallback to Yahoo Finance for price
-                    stock = yf.Ticker(ticker)
-                    current_price = stock.history(period="1d")["Close"].iloc[-1]
+                    stock = TickerSnapshot(ticker)
+                    current_price = get_price_service().get_price(ticker, stock)
                 
                 # Extract financial data
                 latest_cf = cf_data['annualReports'][0]
@@ -468,13 +2906,24 @@ class FinancialDataAcquisition:
                 
                 # Get revenue data
                 income_url = f"{self.ALPHA_VANTAGE_BASE}?function=INCOME_STATEMENT&symbol={ticker}&apikey={self.alpha_vantage_key}"
-                income_response = requests.get(income_url)
+                income_response = self._http_get(income_url)
                 
                 historical_revenue = []
+                income_reports = []
                 if income_response.status_code == 200:
                     income_data = income_response.json()
                     if 'annualReports' in income_data:
-                        historical_revenue = [float(stmt.get('totalRevenue', 0)) for stmt in income_data['annualReports']]
+                        income_reports = income_data['annualReports']
+                        historical_revenue = [float(stmt.get('totalRevenue', 0)) for stmt in income_reports]
+                
+                ingest_fundamentals(
+                    self._provider_fundamentals(ticker, cf_data['annualReports'], 'fiscalDateEnding', {
+                        'Operating Cash Flow': ('cashflow', 'operatingCashflow', 1),
+                        'Capital Expenditure': ('cashflow', 'capitalExpenditures', -1),
+                    }, 'Alpha Vantage') +
+                    self._provider_fundamentals(ticker, income_reports, 'fiscalDateEnding', {
+                        'Total Revenue': ('income', 'totalRevenue', 1),
+                    }, 'Alpha Vantage'))
                 
                 # Get shares outstanding
                 shares_outstanding = float(overview_data.get('SharesOutstanding', 0))
@@ -485,6 +2934,7 @@ class FinancialDataAcquisition:
                     if market_cap > 0 and current_price > 0:
                         shares_outstanding = market_cap / current_price
                 
+                self.circuit_breakers['alpha_vantage'].record_success()
                 return {
                     'free_cash_flow': free_cash_flow,
                     'shares_outstanding': shares_outstanding,
@@ -492,24 +2942,29 @@ class FinancialDataAcquisition:
                     'ticker': ticker,
                     'historical_fcf': historical_fcf,
                     'historical_revenue': historical_revenue,
-                    'data_source': 'Alpha Vantage'
+                    'data_source': 'Alpha Vantage',
+                    'stock': stock or TickerSnapshot(ticker)
                 }
                 
             except Exception as e:
                 print(f"Alpha Vantage data attempt {attempt + 1} failed: {e}")
-                if attempt < retry_count - 1:
-                    print(f"Retrying in 2 seconds...")
-                    time.sleep(2)
+                if not self._retry_or_give_up('alpha_vantage', attempt, retry_count, error=e):
+                    return None
         
         return None
     
+    @_provider_call('yahoo')
     def _get_data_from_yahoo(self, ticker, retry_count=3):
         """Fallback to Yahoo Finance (your original method, but enhanced)"""
+        if not self._provider_available('yahoo'):
+            return None
+        
         for attempt in range(retry_count):
             try:
-                stock = yf.Ticker(ticker)
+                stock = TickerSnapshot(ticker)
                 
                 # Get cash flow statements with better error handling
+                cash_flow_error = None
                 try:
                     cash_flow = stock.cashflow
                     if cash_flow is None or cash_flow.empty:
@@ -522,12 +2977,11 @@ class FinancialDataAcquisition:
                 except Exception as e:
                     print(f"Error fetching cash flow: {e}")
                     cash_flow = None
+                    cash_flow_error = e
                 
                 if cash_flow is None or cash_flow.empty:
                     print("Could not retrieve cash flow data")
-                    if attempt < retry_count - 1:
-                        print(f"Retrying ({attempt + 1}/{retry_count})...")
-                        time.sleep(2)
+                    if self._retry_or_give_up('yahoo', attempt, retry_count, error=cash_flow_error):
                         continue
                     return None
                 
@@ -542,10 +2996,20 @@ class FinancialDataAcquisition:
                 
                 if free_cash_flow is None or np.isnan(free_cash_flow):
                     print(f"Cannot calculate FCF for {ticker}")
-                    if attempt < retry_count - 1:
-                        continue
                     return None
                 
+                # Trailing twelve months from the quarterly statement when newer than the last annual one
+                fcf_basis = 'annual'
+                fcf_period_end = cash_flow.columns[0] if isinstance(cash_flow.columns[0], pd.Timestamp) else None
+                try:
+                    get_ttm_engine().load_statement(ticker, stock.quarterly_cashflow)
+                    ttm = ttm_free_cash_flow(ticker)
+                    if ttm and (fcf_period_end is None or ttm[0] > fcf_period_end):
+                        fcf_period_end, free_cash_flow = ttm
+                        fcf_basis = 'TTM'
+                except Exception as e:
+                    print(f"Could not compute TTM cash flow for {ticker}: {e}")
+                
                 # Get historical FCF for better growth calculations
                 historical_fcf = []
                 try:
@@ -560,8 +3024,7 @@ class FinancialDataAcquisition:
                         else:
                             break
                         
-                        if not np.isnan(fcf):
-                            historical_fcf.append(fcf)
+                        historical_fcf.append(fcf)
                 except:
                     # If we can't get historical data, just use the latest
                     if free_cash_flow is not None and not np.isnan(free_cash_flow):
@@ -569,13 +3032,12 @@ class FinancialDataAcquisition:
                 
                 # Get historical revenue
                 historical_revenue = []
+                income_stmt = None
                 try:
                     income_stmt = stock.income_stmt
                     if income_stmt is not None and not income_stmt.empty and 'Total Revenue' in income_stmt.index:
                         for i in range(min(5, income_stmt.shape[1])):
-                            rev = income_stmt.loc['Total Revenue'].iloc[i]
-                            if not np.isnan(rev):
-                                historical_revenue.append(rev)
+                            historical_revenue.append(income_stmt.loc['Total Revenue'].iloc[i])
                 except:
                     pass
                 
@@ -602,7 +3064,7 @@ class FinancialDataAcquisition:
                 if shares_outstanding is None or np.isnan(shares_outstanding):
                     try:
                         market_cap = stock.info.get('marketCap')
-                        last_price = stock.history(period="1d")["Close"].iloc[-1]
+                        last_price = get_price_service().get_price(ticker, stock)
                         if market_cap and last_price and last_price > 0:
                             shares_outstanding = market_cap / last_price
                     except:
@@ -610,19 +3072,18 @@ class FinancialDataAcquisition:
                 
                 if shares_outstanding is None or np.isnan(shares_outstanding):
                     print(f"Could not determine shares outstanding for {ticker}")
-                    if attempt < retry_count - 1:
-                        continue
                     return None
                 
                 # Get current price
                 try:
-                    current_price = stock.history(period="1d")["Close"].iloc[-1]
-                except:
+                    current_price = get_price_service().get_price(ticker, stock)
+                except Exception as e:
                     print(f"Could not fetch current price for {ticker}")
-                    if attempt < retry_count - 1:
+                    if self._retry_or_give_up('yahoo', attempt, retry_count, error=e):
                         continue
                     return None
                 
+                self.circuit_breakers['yahoo'].record_success()
                 return {
                     'free_cash_flow': free_cash_flow,
                     'shares_outstanding': shares_outstanding,
@@ -630,40 +3091,767 @@ class FinancialDataAcquisition:
                     'ticker': ticker,
                     'historical_fcf': historical_fcf,
                     'historical_revenue': historical_revenue,
-                    'data_source': 'Yahoo Finance'
+                    'data_source': 'Yahoo Finance',
+                    'fcf_basis': fcf_basis,
+                    'fcf_period_end': fcf_period_end,
+                    'cash_flow': cash_flow if isinstance(cash_flow.columns[0], pd.Timestamp) else None,
+                    'income_stmt': income_stmt,
+                    'stock': stock
                 }
             
             except Exception as e:
                 print(f"Yahoo Finance attempt {attempt + 1} failed: {e}")
-                if attempt < retry_count - 1:
-                    print(f"Retrying in 2 seconds...")
-                    time.sleep(2)
-                else:
-                    print(f"All {retry_count} attempts failed for {ticker}")
+                if not self._retry_or_give_up('yahoo', attempt, retry_count, error=e):
+                    print(f"Giving up on Yahoo Finance for {ticker}")
+                    return None
+        
+        return None
+
+    """
+    Enhanced financial data acquisition module with multiple data sources
+    and fallback mechanisms for reliable DCF analysis.
+    """
+
+
+class AsyncFinancialDataAcquisition(FinancialDataAcquisition):
+    """
+    Asyncio variant of FinancialDataAcquisition.
+    
+    The SEC concepts (operating cash flow, capex, shares and revenue with their
+    fallbacks) and the current price are requested concurrently, with at most
+    max_concurrency_per_host requests in flight per host. Blocking HTTP calls run in a
+    thread pool on the shared keep-alive sessions, so no extra HTTP client is needed.
+    """
+    
+    # (primary, fallback) SEC concepts for each input of the SEC result
+    SEC_CONCEPTS = {
+        'cash_flow': ("NetCashProvidedByUsedInOperatingActivities", "CashProvidedByUsedInOperatingActivities"),
+        'capex': ("PaymentsToAcquirePropertyPlantAndEquipment", "CapitalExpenditures"),
+        'shares': ("CommonStockSharesOutstanding", "WeightedAverageNumberOfSharesOutstandingBasic"),
+        'revenue': ("Revenues", "RevenueFromContractWithCustomerExcludingAssessedTax"),
+    }
+    
+    def __init__(self, *args, max_concurrency_per_host=4, **kwargs):
+        """
+        Initialize the async acquisition module.
+        
+        Args:
+            max_concurrency_per_host (int): Maximum concurrent requests per host
+            *args, **kwargs: Passed to FinancialDataAcquisition
+        """
+        super().__init__(*args, **kwargs)
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self._host_semaphores = {}
+        self._semaphore_loop = None
+    
+    async def aget_financial_data(self, ticker, cik=None, retry_count=3):
+        """
+        Async counterpart of get_financial_data with the same source fallbacks.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            cik (str): Company CIK number (will be looked up if not provided)
+            retry_count (int): Number of retry attempts per source
+            
+        Returns:
+            dict: Standardized financial data for DCF analysis
+        """
+        print(f"\nFetching financial data for {ticker}...")
+        
+        if not cik:
+            cik = await self._run_blocking(self._get_cik_for_ticker, ticker)
+        
+        if self.race_providers:
+            return FinancialSnapshot.from_provider(
+                await self._run_blocking(self._race_providers, ticker, cik, retry_count))
+        
+        data = None
+        
+        # 1. SEC Edgar API, concepts fetched concurrently
+        if self.use_sec_edgar:
+            data = await self._aget_data_from_sec(ticker, cik, retry_count)
+        
+        # 2-4. Remaining providers are single-request paths, run off the event loop
+        if not data and self.fmp_api_key:
+            data = await self._run_blocking(self._get_data_from_fmp, ticker, retry_count)
+        
+        if not data and self.alpha_vantage_key:
+            data = await self._run_blocking(self._get_data_from_alpha_vantage, ticker, retry_count)
+        
+        if not data and self.use_yahoo:
+            data = await self._run_blocking(self._get_data_from_yahoo, ticker, retry_count)
+        
+        return FinancialSnapshot.from_provider(data)
+    
+    @_provider_call('sec')
+    async def _aget_data_from_sec(self, ticker, cik, retry_count=3):
+        """Get financial data from SEC EDGAR, requesting all concepts at once"""
+        if not cik:
+            print("Cannot fetch SEC data without CIK")
+            return None
+        
+        if not self._provider_available('sec'):
+            return None
+        
+        cik_padded = cik.lstrip('0').zfill(10)
+        stock = TickerSnapshot(ticker)
+        
+        for attempt in range(retry_count):
+            price_task = None
+            try:
+                # Warm the price while the SEC requests are in flight
+                price_task = asyncio.ensure_future(
+                    self._run_blocking(get_price_service().get_price, ticker, stock))
+                
+                concept_data = await self._aget_sec_concepts(cik_padded)
+                await price_task
+                
+                first = {name: concept_data[primary] or concept_data[fallback]
+                         for name, (primary, fallback) in self.SEC_CONCEPTS.items()}
+                
+                if not first['cash_flow'] or not first['capex'] or not first['shares']:
+                    print(f"Could not retrieve complete SEC data for {ticker}")
+                    return None
+                
+                data = self._build_sec_result(ticker, first['cash_flow'], first['capex'],
+                                              first['shares'], first['revenue'], stock, cik_padded)
+                if not data:
+                    print(f"Missing latest values from SEC data for {ticker}")
+                    return None
+                self.circuit_breakers['sec'].record_success()
+                return data
+            
+            except Exception as e:
+                print(f"SEC data attempt {attempt + 1} failed: {e}")
+                delay = self._retry_delay('sec', attempt, retry_count, error=e)
+                if delay is None:
                     return None
+                print(f"Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+            finally:
+                # Don't leave the price lookup pending when the SEC requests failed first
+                if price_task is not None and not price_task.done():
+                    price_task.cancel()
+        
+        return None
+    
+    async def _aget_sec_concepts(self, cik_padded):
+        """
+        Fetch every primary and fallback SEC concept concurrently.
+        
+        Returns:
+            dict: {concept: facts or None}
+        """
+        concepts = [concept for pair in self.SEC_CONCEPTS.values() for concept in pair]
+        
+        # One companyfacts request answers every concept; fetch it once before the lookups
+        if self.use_company_facts or self.facts_store:
+            url = self.SEC_COMPANY_FACTS.format(cik_padded)
+            async with self._host_semaphore(url):
+                await self._run_blocking(self._get_company_facts_index, cik_padded)
+            if self._company_facts_index.get(cik_padded) is not None:
+                return {concept: self._get_sec_concept_data(cik_padded, concept) for concept in concepts}
+        
+        results = await asyncio.gather(*(self._aget_sec_concept_data(cik_padded, concept)
+                                         for concept in concepts))
+        return dict(zip(concepts, results))
+    
+    async def _aget_sec_concept_data(self, cik_padded, concept):
+        """Fetch one SEC concept under the per-host concurrency limit"""
+        url = self.SEC_COMPANY_CONCEPT.format(cik_padded, concept)
+        async with self._host_semaphore(url):
+            return await self._run_blocking(self._fetch_sec_concept_data, cik_padded, concept)
+    
+    def _host_semaphore(self, url):
+        """Semaphore limiting concurrent requests to the host of a URL"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            # Semaphores belong to one event loop; start fresh for a new one
+            self._semaphore_loop = loop
+            self._host_semaphores = {}
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self._host_semaphores[host]
+    
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call in the default thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+
+####################################################################################################################################################
+############################ END OF FINANCIALDATAACQUISTION ########################################################################################
+####################################################################################################################################################
+############################ Calculation Functions Below    ########################################################################################
+####################################################################################################################################################
+
+####################################################################################################################################################
+#################################    Shared Yahoo Finance Snapshot    ##############################################################################
+####################################################################################################################################################
+
+class TickerSnapshot:
+    """
+    Per-ticker snapshot of Yahoo Finance data shared by every analysis stage.
+    
+    Exposes the same attributes as yf.Ticker (info, balance_sheet, income_stmt,
+    cashflow, history(), ...) so it can be passed wherever a Ticker is expected,
+    but each artifact is fetched at most once per snapshot.
+    """
+    
+    # yf.Ticker attributes that are fetched once and then served from the snapshot
+    CACHED_ARTIFACTS = (
+        'info', 'balance_sheet', 'quarterly_balance_sheet', 'financials', 'quarterly_financials',
+        'income_stmt', 'quarterly_income_stmt', 'cashflow', 'quarterly_cashflow'
+    )
+    
+    # Statement artifacts kept in the FundamentalsStore as (statement, period_type)
+    STATEMENT_ARTIFACTS = {
+        'cashflow': ('cashflow', 'annual'), 'quarterly_cashflow': ('cashflow', 'quarterly'),
+        'income_stmt': ('income', 'annual'), 'quarterly_income_stmt': ('income', 'quarterly'),
+        'financials': ('income', 'annual'), 'quarterly_financials': ('income', 'quarterly'),
+        'balance_sheet': ('balance', 'annual'), 'quarterly_balance_sheet': ('balance', 'quarterly'),
+    }
+    
+    def __init__(self, ticker, stock=None):
+        """
+        Initialize the snapshot. Nothing is fetched until first access.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            stock: Existing yf.Ticker object to wrap (created lazily if not given)
+        """
+        self.ticker = ticker
+        self._stock = stock
+        self._artifacts = {}
+        self._history = {}
+    
+    @property
+    def stock(self):
+        """Underlying yf.Ticker object"""
+        if self._stock is None:
+            self._stock = yf.Ticker(self.ticker)
+        return self._stock
+    
+    def __getattr__(self, name):
+        # Only called for attributes not defined on the snapshot itself
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self.CACHED_ARTIFACTS:
+            return self._fetch_once(self._artifacts, name, lambda: self._load_artifact(name))
+        return getattr(self.stock, name)
+    
+    def _load_artifact(self, name):
+        """Fetch an artifact, serving statements from the shared FundamentalsStore when it has them"""
+        def fetch():
+            return recorded_call(('yf.Ticker', self.ticker, name), lambda: getattr(self.stock, name))
+        
+        store = get_fundamentals_store() if name in self.STATEMENT_ARTIFACTS else None
+        if store is None:
+            return fetch()
+        
+        statement, period_type = self.STATEMENT_ARTIFACTS[name]
+        stored = store.statement(self.ticker, statement, period_type, max_age=store.max_age)
+        if stored is not None:
+            return stored
+        
+        frame = fetch()
+        if isinstance(frame, pd.DataFrame) and not frame.empty:
+            try:
+                store.ingest_statement(self.ticker, statement, period_type, frame)
+            except Exception as e:
+                print(f"Could not store {name} for {self.ticker}: {e}")
+        return frame
+    
+    def history(self, period="1mo", **kwargs):
+        """Price history, fetched once per distinct set of arguments"""
+        key = (period, tuple(sorted(kwargs.items())))
+        return self._fetch_once(self._history, key, lambda: recorded_call(
+            ('yf.Ticker.history', self.ticker) + key, lambda: self.stock.history(period=period, **kwargs)))
+    
+    def _fetch_once(self, store, key, fetch):
+        """Return a stored artifact, fetching it on first use. Failures are remembered too."""
+        if key not in store:
+            try:
+                get_shared_rate_limiter().acquire('yahoo')
+                store[key] = (fetch(), None)
+            except Exception as e:
+                store[key] = (None, e)
+        value, error = store[key]
+        if error is not None:
+            raise error
+        return value
+
+def get_ticker_snapshot(ticker, financial_data=None):
+    """
+    Get the shared TickerSnapshot for a ticker, reusing one attached to financial_data.
+    
+    Args:
+        ticker (str): Stock ticker symbol
+        financial_data (dict, optional): Financial data that may carry a 'stock' entry
+    
+    Returns:
+        TickerSnapshot: Snapshot for the ticker
+    """
+    stock = financial_data.get('stock') if financial_data else None
+    if isinstance(stock, TickerSnapshot):
+        return stock
+    return TickerSnapshot(ticker, stock)
+
+
+class PriceService:
+    """
+    Last close prices for many tickers from batched yf.download calls, cached with a short TTL.
+    
+    prefetch() a whole universe up front and every later get_price() is served from
+    memory, so a screen over thousands of names costs a handful of requests.
+    """
+    
+    def __init__(self, ttl=900, batch_size=200):
+        """
+        Initialize the service.
+        
+        Args:
+            ttl (float): Seconds a fetched price stays fresh
+            batch_size (int): Maximum symbols per yf.download call
+        """
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self._prices = {}
+        self._lock = threading.Lock()
+    
+    def prefetch(self, tickers):
+        """
+        Fetch last close for every ticker not already cached, batch_size symbols per request.
+        
+        Args:
+            tickers (iterable): Ticker symbols
+        
+        Returns:
+            dict: {ticker: price or None}
+        """
+        tickers = list(dict.fromkeys(tickers))
+        missing = [ticker for ticker in tickers if self.cached_price(ticker) is None]
+        for start in range(0, len(missing), self.batch_size):
+            self._download(missing[start:start + self.batch_size])
+        return {ticker: self.cached_price(ticker) for ticker in tickers}
+    
+    def get_price(self, ticker, stock=None):
+        """
+        Last close for one ticker from the cache, or one request for a miss.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            stock (TickerSnapshot): Snapshot whose history answers a miss (created if not given)
+        
+        Returns:
+            float: Last close price
+        """
+        price = self.cached_price(ticker)
+        if price is None:
+            price = self._fetch_one(ticker, stock)
+            self.prime(ticker, price)
+        return price
+    
+    def _fetch_one(self, ticker, stock=None):
+        """Last close for a ticker missing from the cache, in a single request"""
+        stock = stock or TickerSnapshot(ticker)
+        # 5 days so the last close is available over weekends and holidays
+        return float(stock.history(period="5d")["Close"].dropna().iloc[-1])
+    
+    def cached_price(self, ticker):
+        """Fresh cached price for a ticker, or None"""
+        with self._lock:
+            entry = self._prices.get(ticker)
+        if entry and time.time() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+    
+    def prime(self, ticker, price):
+        """Record a price obtained elsewhere (e.g. a provider quote)"""
+        if price is not None and not pd.isna(price) and price > 0:
+            with self._lock:
+                self._prices[ticker] = (float(price), time.time())
+    
+    def invalidate(self, ticker=None):
+        """Forget one ticker's price, or all of them"""
+        with self._lock:
+            if ticker is None:
+                self._prices.clear()
+            else:
+                self._prices.pop(ticker, None)
+    
+    def _download(self, tickers):
+        try:
+            get_shared_rate_limiter().acquire('yahoo')
+            # 5 days so the last close is available over weekends and holidays
+            data = _yf_download(tickers, period="5d", interval="1d", group_by='column',
+                                auto_adjust=False, progress=False, threads=True)
+        except Exception as e:
+            print(f"Batched price download failed for {len(tickers)} tickers: {e}")
+            return
+        
+        if data is None or data.empty or 'Close' not in data:
+            return
+        close = data['Close']
+        if isinstance(close, pd.Series):
+            close = close.to_frame(tickers[0])
+        
+        now = time.time()
+        with self._lock:
+            for symbol in close.columns:
+                series = close[symbol].dropna()
+                if not series.empty:
+                    self._prices[symbol] = (float(series.iloc[-1]), now)
+
+
+# Price service shared across providers and analysis stages
+_price_service = None
+_price_service_lock = threading.Lock()
+
+def get_price_service():
+    """Process-wide PriceService, created on first use"""
+    global _price_service
+    if _price_service is None:
+        with _price_service_lock:
+            if _price_service is None:
+                _price_service = PriceService()
+    return _price_service
+
+def set_price_service(price_service):
+    """Replace the process-wide PriceService (e.g. to change its TTL)"""
+    global _price_service
+    with _price_service_lock:
+        _price_service = price_service
+
+
+def daily_returns(prices):
+    """
+    Daily returns indexed by calendar date (timezone dropped), so series from different
+    exchanges or sources line up on the same dates.
+    
+    Args:
+        prices (pd.Series): Close prices with a DatetimeIndex
+    
+    Returns:
+        pd.Series: Percentage returns
+    """
+    prices = prices.dropna()
+    index = pd.DatetimeIndex(prices.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    prices = pd.Series(prices.values, index=index.normalize())
+    prices = prices[~prices.index.duplicated(keep='last')].sort_index()
+    return prices.pct_change().dropna()
+
+
+class MarketReturnsCache:
+    """
+    Market index daily returns loaded once per process and persisted to disk for beta estimation.
+    """
+    
+    def __init__(self, symbol="^GSPC", period="2y", cache_path=None, max_age=24 * 3600):
+        """
+        Initialize the cache. Nothing is loaded until first use.
+        
+        Args:
+            symbol (str): Market index symbol
+            period (str): History period to download
+            cache_path (str): CSV file for the index closes (defaults under DEFAULT_CACHE_DIR)
+            max_age (float): Seconds before the file on disk is refreshed
+        """
+        self.symbol = symbol
+        self.period = period
+        self.cache_path = cache_path or os.path.join(
+            DEFAULT_CACHE_DIR, f"market_closes_{symbol.strip('^').replace('/', '_')}.csv")
+        self.max_age = max_age
+        self._returns = None
+        self._lock = threading.Lock()
+    
+    def returns(self):
+        """
+        Daily market returns, from memory, the disk cache, or one download.
+        
+        Returns:
+            pd.Series: Returns indexed by date (empty if unavailable)
+        """
+        if self._returns is None:
+            with self._lock:
+                if self._returns is None:
+                    closes = self._read_cache_file()
+                    if closes is None:
+                        closes = self._download()
+                    self._returns = daily_returns(closes) if closes is not None else pd.Series(dtype=float)
+        return self._returns
+    
+    def beta(self, stock_returns, min_observations=30):
+        """
+        Beta of a return series against the market, joined on dates.
+        
+        Args:
+            stock_returns (pd.Series): Stock daily returns (see daily_returns)
+            min_observations (int): Minimum overlapping dates required
+        
+        Returns:
+            float: Beta, or None if there is too little overlap
+        """
+        aligned = pd.concat([stock_returns, self.returns()], axis=1, join='inner').dropna()
+        if len(aligned) <= min_observations:
+            return None
+        stock_values, market_values = aligned.iloc[:, 0].values, aligned.iloc[:, 1].values
+        market_variance = np.var(market_values, ddof=1)
+        if market_variance == 0:
+            return None
+        return float(np.cov(stock_values, market_values, ddof=1)[0, 1] / market_variance)
+    
+    def refresh(self):
+        """Download the index history again and replace the cached copy"""
+        with self._lock:
+            closes = self._download()
+            if closes is not None:
+                self._returns = daily_returns(closes)
+        return self._returns
+    
+    def _read_cache_file(self):
+        try:
+            if time.time() - os.path.getmtime(self.cache_path) > self.max_age:
+                return None
+            closes = pd.read_csv(self.cache_path, index_col=0).iloc[:, 0]
+            # UTC parsing also accepts older files that mix DST offsets
+            closes.index = pd.to_datetime(closes.index, utc=True)
+            return closes if not closes.empty else None
+        except (OSError, ValueError, TypeError, IndexError):
+            return None  # Unreadable file counts as a cache miss
+    
+    def _download(self):
+        try:
+            get_shared_rate_limiter().acquire('yahoo')
+            closes = recorded_call(('yf.Ticker.history', self.symbol, self.period, ()),
+                                   lambda: yf.Ticker(self.symbol).history(period=self.period))['Close']
+        except Exception as e:
+            print(f"Could not download {self.symbol} history: {e}")
+            return None
+        if closes.empty:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            # Exchange-local dates without offsets, so DST changes don't mix timezones in the file
+            saved = closes.rename('Close')
+            if getattr(saved.index, 'tz', None) is not None:
+                saved.index = saved.index.tz_localize(None)
+            saved.to_csv(tmp_path)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not save {self.symbol} history: {e}")
+        return closes
+
+
+# Market returns shared by every beta estimate in the process
+_market_returns_cache = None
+_market_returns_cache_lock = threading.Lock()
+
+def get_market_returns_cache():
+    """Process-wide MarketReturnsCache for the S&P 500, created on first use"""
+    global _market_returns_cache
+    if _market_returns_cache is None:
+        with _market_returns_cache_lock:
+            if _market_returns_cache is None:
+                _market_returns_cache = MarketReturnsCache()
+    return _market_returns_cache
+
+def set_market_returns_cache(market_returns_cache):
+    """Replace the process-wide MarketReturnsCache (e.g. a different index)"""
+    global _market_returns_cache
+    with _market_returns_cache_lock:
+        _market_returns_cache = market_returns_cache
+
+
+def download_close_history(tickers, period="2y", batch_size=200):
+    """
+    Close prices for many tickers from batched yf.download calls.
+    
+    Args:
+        tickers (list): Ticker symbols
+        period (str): History period
+        batch_size (int): Maximum symbols per request
+    
+    Returns:
+        pd.DataFrame: Dates x tickers closes (tickers that failed are absent)
+    """
+    tickers = list(dict.fromkeys(tickers))
+    frames = []
+    for start in range(0, len(tickers), batch_size):
+        batch = tickers[start:start + batch_size]
+        try:
+            get_shared_rate_limiter().acquire('yahoo')
+            data = _yf_download(batch, period=period, interval="1d", group_by='column',
+                                auto_adjust=False, progress=False, threads=True)
+        except Exception as e:
+            print(f"Price history download failed for {len(batch)} tickers: {e}")
+            continue
+        if data is None or data.empty or 'Close' not in data:
+            continue
+        close = data['Close']
+        frames.append(close.to_frame(batch[0]) if isinstance(close, pd.Series) else close)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1)
+
+
+def returns_matrix(prices):
+    """
+    Dates x tickers daily returns with a date-only, timezone-free index (see daily_returns).
+    
+    Args:
+        prices (pd.DataFrame): Close prices, one column per ticker
+    
+    Returns:
+        pd.DataFrame: Returns; NaN where a ticker has no price on a date
+    """
+    index = pd.DatetimeIndex(prices.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    prices = prices.set_axis(index.normalize(), axis=0)
+    prices = prices[~prices.index.duplicated(keep='last')].sort_index()
+    return prices.pct_change(fill_method=None).iloc[1:]
+
+
+def adjust_betas(raw_betas, method='blume', std_errors=None, prior_mean=None, prior_var=None):
+    """
+    Adjust raw betas toward their expected long-run value.
+    
+    Args:
+        raw_betas (pd.Series or pd.DataFrame): OLS betas (a DataFrame is adjusted row by row)
+        method (str): 'blume' (0.67 * beta + 0.33) or 'vasicek' (Bayesian shrinkage toward the
+            cross-sectional mean, weighted by each beta's sampling variance)
+        std_errors: Standard errors of raw_betas, same shape (required for 'vasicek')
+        prior_mean (float): Vasicek prior mean (cross-sectional mean if not given)
+        prior_var (float): Vasicek prior variance (cross-sectional variance if not given)
+    
+    Returns:
+        Adjusted betas, same shape as raw_betas
+    """
+    if method is None:
+        return raw_betas
+    if method == 'blume':
+        return 0.67 * raw_betas + 0.33
+    if method != 'vasicek':
+        raise ValueError(f"Unknown beta adjustment: {method}")
+    if std_errors is None:
+        raise ValueError("Vasicek adjustment needs the standard errors of the raw betas")
+    
+    # Cross-sectional prior, per date for a rolling DataFrame
+    axis = 1 if isinstance(raw_betas, pd.DataFrame) else 0
+    mean = raw_betas.mean(axis=axis) if prior_mean is None else prior_mean
+    var = raw_betas.var(axis=axis) if prior_var is None else prior_var
+    sampling_var = std_errors ** 2
+    if axis:
+        return (raw_betas.mul(var, axis=0) + sampling_var.mul(mean, axis=0)).div(
+            sampling_var.add(var, axis=0))
+    return (var * raw_betas + sampling_var * mean) / (var + sampling_var)
+
 
+def compute_betas(tickers=None, prices=None, period="2y", window=None, adjustment='blume',
+                  min_observations=30, market_cache=None, register=True):
     """
-    Enhanced financial data acquisition module with multiple data sources
-    and fallback mechanisms for reliable DCF analysis.
+    Betas for many tickers against the market in one pass over a dates x tickers returns matrix.
+    
+    Args:
+        tickers (list): Ticker symbols (ignored if prices is given)
+        prices (pd.DataFrame): Close prices, one column per ticker (downloaded in batches if not given)
+        period (str): History period to download
+        window (int): Rolling window in trading days; None for one beta over the whole sample
+        adjustment (str): 'blume', 'vasicek' or None
+        min_observations (int): Minimum dates shared with the market for a beta
+        market_cache (MarketReturnsCache): Market returns (the shared S&P 500 cache if not given)
+        register (bool): Store full-sample raw betas for calculate_wacc (see get_precomputed_beta)
+    
+    Returns:
+        pd.DataFrame: Without a window, one row per ticker with raw_beta, beta, std_error and
+            observations; with a window, dates x tickers adjusted rolling betas
     """
+    if prices is None:
+        prices = download_close_history(tickers or [], period)
+    if prices.empty:
+        return pd.DataFrame()
+    
+    market = (market_cache or get_market_returns_cache()).returns()
+    returns = returns_matrix(prices)
+    returns, market = returns.align(market, join='inner', axis=0)
+    if returns.empty:
+        return pd.DataFrame()
+    
+    if window:
+        market_frame = pd.DataFrame({column: market for column in returns.columns}).where(returns.notna())
+        rolling = returns.rolling(window, min_periods=min_observations)
+        market_rolling = market_frame.rolling(window, min_periods=min_observations)
+        n = returns.notna().astype(float).rolling(window, min_periods=min_observations).sum()
+        covariance = rolling.cov(market_frame, pairwise=False)
+        market_var = market_rolling.var()
+        raw = covariance / market_var
+        std_errors = np.sqrt((rolling.var() - raw ** 2 * market_var).clip(lower=0) / ((n - 2) * market_var))
+        return adjust_betas(raw, adjustment, std_errors)
+    
+    # Full sample: covariance per ticker over the dates it shares with the market, as matrix ops
+    r = returns.to_numpy(dtype=float)
+    m = market.to_numpy(dtype=float)[:, None]
+    mask = ~np.isnan(r)
+    n = mask.sum(axis=0).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r_filled = np.where(mask, r, 0.0)
+        m_masked = np.where(mask, m, 0.0)
+        r_dev = np.where(mask, r_filled - r_filled.sum(axis=0) / n, 0.0)
+        m_dev = np.where(mask, m_masked - m_masked.sum(axis=0) / n, 0.0)
+        covariance = (r_dev * m_dev).sum(axis=0) / (n - 1)
+        market_var = (m_dev ** 2).sum(axis=0) / (n - 1)
+        stock_var = (r_dev ** 2).sum(axis=0) / (n - 1)
+        raw = covariance / market_var
+        std_errors = np.sqrt(np.clip(stock_var - raw ** 2 * market_var, 0, None) / ((n - 2) * market_var))
+    
+    enough = n >= min_observations
+    raw = pd.Series(np.where(enough, raw, np.nan), index=returns.columns)
+    std_errors = pd.Series(np.where(enough, std_errors, np.nan), index=returns.columns)
+    
+    results = pd.DataFrame({
+        'raw_beta': raw,
+        'beta': adjust_betas(raw, adjustment, std_errors),
+        'std_error': std_errors,
+        'observations': n.astype(int)
+    })
+    if register:
+        # Raw, like Yahoo's info['beta'] and the per-ticker regression calculate_wacc falls back to,
+        # so the WACC beta means the same whichever source answered
+        register_betas(results['raw_beta'].dropna())
+    return results
 
-####################################################################################################################################################
-############################ END OF FINANCIALDATAACQUISTION ########################################################################################
-####################################################################################################################################################
-############################ Calculation Functions Below    ########################################################################################
-####################################################################################################################################################
+
+# Raw betas computed in batch, consulted by calculate_wacc before estimating one ticker at a time
+_precomputed_betas = {}
+_precomputed_betas_lock = threading.Lock()
+
+def register_betas(betas):
+    """Store precomputed betas (a Series or dict of ticker -> beta)"""
+    with _precomputed_betas_lock:
+        _precomputed_betas.update({ticker: float(beta) for ticker, beta in dict(betas).items()
+                                   if beta is not None and not np.isnan(beta)})
+
+def get_precomputed_beta(ticker):
+    """Precomputed (unadjusted) beta for a ticker, or None"""
+    with _precomputed_betas_lock:
+        return _precomputed_betas.get(ticker)
 
 ####################################################################################################################################################
 #################################    WACC  Calculation    ##########################################################################################
 ####################################################################################################################################################
 
-def calculate_wacc(ticker, financial_data=None):
+def calculate_wacc(ticker, financial_data=None, stock=None):
     """
     Calculate WACC with improved error handling, data validation and multiple external data sources.
     
     Args:
         ticker (str): Stock ticker symbol
         financial_data (dict): Financial data if already fetched
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
         dict: WACC components and final value
@@ -671,10 +3859,8 @@ def calculate_wacc(ticker, financial_data=None):
     print(f"Calculating WACC for {ticker}...")
     
     try:
-        if financial_data and 'stock' in financial_data:
-            stock = financial_data['stock']
-        else:
-            stock = yf.Ticker(ticker)
+        if stock is None:
+            stock = get_ticker_snapshot(ticker, financial_data)
         
         # Get risk-free rate from Treasury data
         risk_free_rate = get_treasury_yield()  # Implement this function to fetch current 10Y Treasury yield
@@ -682,7 +3868,7 @@ def calculate_wacc(ticker, financial_data=None):
             risk_free_rate = 0.042  # Fallback value if API call fails
         
         # Get industry data from Damodaran dataset
-        industry_data = get_damodaran_industry_data(ticker)  # Implement this to fetch industry beta, risk premium
+        industry_data = get_damodaran_industry_data(ticker, stock)  # Implement this to fetch industry beta, risk premium
         
         # Get balance sheet and financials with expanded timeframes
         try:
@@ -756,7 +3942,7 @@ def calculate_wacc(ticker, financial_data=None):
         # NEW: Check FRED API for total debt data as another data source
         if total_debt == 0:
             try:
-                total_debt = get_fred_corporate_debt(ticker)
+                total_debt = get_fred_corporate_debt(ticker, stock)
             except:
                 pass
         
@@ -784,7 +3970,7 @@ def calculate_wacc(ticker, financial_data=None):
             try:
                 # Estimate from shares outstanding and price
                 shares = stock.info.get('sharesOutstanding')
-                price = stock.history(period="1d")["Close"].iloc[-1]
+                price = get_price_service().get_price(ticker, stock)
                 if shares and price and not pd.isna(shares) and not np.isnan(shares):
                     market_cap = shares * price
             except:
@@ -795,7 +3981,7 @@ def calculate_wacc(ticker, financial_data=None):
             try:
                 if 'Common Stock' in balance_sheet.index:
                     shares = balance_sheet.loc['Common Stock'].iloc[0]
-                    price = stock.history(period="1d")["Close"].iloc[-1]
+                    price = get_price_service().get_price(ticker, stock)
                     if shares and price:
                         market_cap = shares * price
             except:
@@ -804,7 +3990,7 @@ def calculate_wacc(ticker, financial_data=None):
         # NEW: Check another data source for market cap
         if market_cap is None:
             try:
-                market_cap = get_market_cap_from_alternative_source(ticker)
+                market_cap = get_market_cap_from_alternative_source(ticker, stock)
             except:
                 pass
         
@@ -834,7 +4020,7 @@ def calculate_wacc(ticker, financial_data=None):
         
         # NEW: First check bond yield data if available
         try:
-            cost_of_debt = get_corporate_bond_yield(ticker)
+            cost_of_debt = get_corporate_bond_yield(ticker, stock)
             if cost_of_debt is not None and (cost_of_debt < 0.01 or cost_of_debt > 0.15):
                 print(f"Bond yield data questionable: {cost_of_debt:.2%}")
                 cost_of_debt = None
@@ -1118,6 +4304,14 @@ def calculate_wacc(ticker, financial_data=None):
         except Exception as e:
             print(f"Error getting beta from stock info: {e}")
         
+        # Company's own regression beta, computed for the whole universe in one pass (see compute_betas),
+        # before falling back to an industry average
+        if beta is None or beta < 0.2 or beta > 3.0:
+            precomputed_beta = get_precomputed_beta(ticker)
+            if precomputed_beta is not None and 0.2 <= precomputed_beta <= 3.0:
+                print("Using precomputed regression beta")
+                beta = precomputed_beta
+        
         # NEW: Get beta from Damodaran dataset if available
         if (beta is None or beta < 0.2 or beta > 3.0) and industry_data and 'beta' in industry_data:
             print("Using industry beta from Damodaran data")
@@ -1198,32 +4392,14 @@ def calculate_wacc(ticker, financial_data=None):
                     try:
                         # Get stock price history
                         stock_history = stock.history(period="2y")  # Increased to 2 years for more data
+                        stock_returns = daily_returns(stock_history['Close'])
                         
-                        # Get market index (S&P 500) history
-                        market = yf.Ticker("^GSPC")
-                        market_history = market.history(period="2y")
+                        # Regress on the shared S&P 500 returns, matched by date
+                        calculated_beta = get_market_returns_cache().beta(stock_returns)
                         
-                        # Calculate returns
-                        stock_returns = stock_history['Close'].pct_change().dropna()
-                        market_returns = market_history['Close'].pct_change().dropna()
-                        
-                        # Make sure they have the same length
-                        min_len = min(len(stock_returns), len(market_returns))
-                        if min_len > 30:  # Ensure we have enough data points
-                            # Align dates
-                            stock_returns = stock_returns[-min_len:]
-                            market_returns = market_returns[-min_len:]
-                            
-                            # Calculate covariance and variance
-                            covariance = np.cov(stock_returns, market_returns)[0, 1]
-                            market_variance = np.var(market_returns)
-                            
-                            # Calculate beta
-                            calculated_beta = covariance / market_variance
-                            
-                            # Validate beta is reasonable
-                            if 0.2 <= calculated_beta <= 3.0:
-                                beta = calculated_beta
+                        # Validate beta is reasonable
+                        if calculated_beta is not None and 0.2 <= calculated_beta <= 3.0:
+                            beta = calculated_beta
                     except Exception as e:
                         print(f"Error calculating beta from historical data: {e}")
             except Exception as e:
@@ -1295,19 +4471,20 @@ def calculate_wacc(ticker, financial_data=None):
 
 #------------ Perhaps see about making the functions more detailed or use multiple sources ----#
 
-def get_fred_corporate_debt(ticker):
+def get_fred_corporate_debt(ticker, stock=None):
     """
     Fetch corporate debt data from alternative sources.
     
     Args:
         ticker (str): Stock ticker symbol
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
         float: Total corporate debt or 0 if not found
     """
     try:
         # Use yFinance as primary source
-        stock = yf.Ticker(ticker)
+        stock = stock or TickerSnapshot(ticker)
         
         # Try multiple fields for total debt
         debt_fields = [
@@ -1349,19 +4526,20 @@ def get_fred_corporate_debt(ticker):
         print(f"Error fetching corporate debt for {ticker}: {e}")
         return 0
 
-def get_damodaran_industry_data(ticker):
+def get_damodaran_industry_data(ticker, stock=None):
     """
     Fetch industry-specific data from Damodaran's publicly available datasets.
     
     Args:
         ticker (str): Stock ticker symbol
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
         dict: Industry-specific financial metrics
     """
     try:
         # Use yFinance to get industry
-        stock = yf.Ticker(ticker)
+        stock = stock or TickerSnapshot(ticker)
         industry = stock.info.get('industry', '').lower()
         sector = stock.info.get('sector', '').lower()
         
@@ -1416,19 +4594,20 @@ def get_damodaran_industry_data(ticker):
             'avg_cost_of_debt': 0.045
         }
 
-def get_market_cap_from_alternative_source(ticker):
+def get_market_cap_from_alternative_source(ticker, stock=None):
     """
     Fetch market cap from alternative sources.
     
     Args:
         ticker (str): Stock ticker symbol
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
         float: Market capitalization or 0 if not found
     """
     try:
         # Use yFinance as primary source
-        stock = yf.Ticker(ticker)
+        stock = stock or TickerSnapshot(ticker)
         
         # Try multiple methods to get market cap
         market_cap_methods = [
@@ -1444,7 +4623,7 @@ def get_market_cap_from_alternative_source(ticker):
         # Try calculating from shares and price
         try:
             shares = stock.info.get('sharesOutstanding')
-            price = stock.history(period="1d")["Close"].iloc[-1]
+            price = get_price_service().get_price(ticker, stock)
             if shares and price:
                 return float(shares * price)
         except:
@@ -1455,19 +4634,20 @@ def get_market_cap_from_alternative_source(ticker):
         print(f"Error fetching market cap for {ticker}: {e}")
         return 0
 
-def get_corporate_bond_yield(ticker):
+def get_corporate_bond_yield(ticker, stock=None):
     """
     Fetch corporate bond yield from alternative sources.
     
     Args:
         ticker (str): Stock ticker symbol
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
         float: Corporate bond yield or None if not found
     """
     try:
         # Use yFinance to get company info
-        stock = yf.Ticker(ticker)
+        stock = stock or TickerSnapshot(ticker)
         
         # Try to get credit rating or other relevant information
         try:
@@ -1537,39 +4717,194 @@ def get_corporate_bond_yield(ticker):
 
 #-------------------------- This function requires a helper function to get yield data ---------#
 
+class RiskFreeRateCache:
+    """
+    Process-wide and on-disk cache of the 10-year Treasury yield.
+    
+    The yield is looked up at most once per refresh interval and shared by every ticker
+    (and by later runs through a small JSON file). The FRED DGS10 history is stored as a
+    CSV that is extended with only the observations added since its last date.
+    """
+    
+    def __init__(self, cache_dir=None, refresh_interval=6 * 3600, series_id='DGS10'):
+        """
+        Initialize the cache. Nothing is fetched until first use.
+        
+        Args:
+            cache_dir (str): Directory for the cached yield and history (defaults to DEFAULT_CACHE_DIR)
+            refresh_interval (float): Seconds before the yield is looked up again
+            series_id (str): FRED series with the yield in percent
+        """
+        cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.series_id = series_id
+        self.refresh_interval = refresh_interval
+        self.value_path = os.path.join(cache_dir, f"risk_free_rate_{series_id}.json")
+        self.history_path = os.path.join(cache_dir, f"fred_{series_id}.csv")
+        self._value = None
+        self._source = None
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+    
+    def latest_yield(self):
+        """
+        Current yield as a decimal, from memory, disk, or one lookup per refresh interval.
+        
+        Returns:
+            float: 10-year Treasury yield
+        """
+        if self._value is not None and time.time() - self._fetched_at < self.refresh_interval:
+            return self._value
+        with self._lock:
+            if self._value is None or time.time() - self._fetched_at >= self.refresh_interval:
+                if not self._read_value_file():
+                    value, source = _fetch_treasury_yield(self.history)
+                    self._value, self._source, self._fetched_at = value, source, time.time()
+                    # Only persist real observations so the next run retries after a fallback
+                    if source != 'estimate':
+                        self._save_value()
+            return self._value
+    
+    def warm(self):
+        """Start the lookup in the background so the first ticker doesn't wait for it"""
+        thread = threading.Thread(target=self.latest_yield, daemon=True)
+        thread.start()
+        return thread
+    
+    def history(self):
+        """
+        Stored FRED history (percent), extended incrementally from the last stored date.
+        
+        Returns:
+            pd.Series: Yield observations indexed by date
+        """
+        stored = self._read_history_file()
+        if stored is not None and time.time() - os.path.getmtime(self.history_path) < self.refresh_interval:
+            return stored
+        
+        # Overlap a week so late revisions to recent observations are picked up
+        start = stored.index[-1] - pd.Timedelta(days=7) if stored is not None else None
+        try:
+            fetched = _get_data_fred(self.series_id, start=start).iloc[:, 0].dropna()
+        except Exception as e:
+            if stored is None:
+                raise
+            print(f"FRED update failed ({e}), using stored {self.series_id} history")
+            return stored
+        history = fetched.combine_first(stored) if stored is not None else fetched
+        self._save_history(history)
+        return history
+    
+    def invalidate(self):
+        """Force the next latest_yield() to look the yield up again"""
+        with self._lock:
+            self._value = None
+            self._fetched_at = 0
+            try:
+                os.remove(self.value_path)
+            except OSError:
+                pass
+    
+    def _read_value_file(self):
+        try:
+            with open(self.value_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if time.time() - cached.get('fetched_at', 0) >= self.refresh_interval:
+            return False
+        self._value, self._source, self._fetched_at = cached['value'], cached.get('source'), cached['fetched_at']
+        return True
+    
+    def _save_value(self):
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump({'value': self._value, 'source': self._source, 'fetched_at': self._fetched_at}, f)
+        self._write_atomic(self.value_path, write)
+    
+    def _read_history_file(self):
+        try:
+            history = pd.read_csv(self.history_path, index_col=0, parse_dates=True).iloc[:, 0].dropna()
+            return history if not history.empty else None
+        except (OSError, ValueError, IndexError):
+            return None
+    
+    def _save_history(self, history):
+        self._write_atomic(self.history_path, lambda path: history.rename(self.series_id).to_csv(path))
+    
+    def _write_atomic(self, path, write):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not save {path}: {e}")
+
+
+# Risk-free rate shared by every WACC calculation in the process
+_risk_free_rate_cache = None
+_risk_free_rate_cache_lock = threading.Lock()
+
+def get_risk_free_rate_cache():
+    """Process-wide RiskFreeRateCache, created on first use"""
+    global _risk_free_rate_cache
+    if _risk_free_rate_cache is None:
+        with _risk_free_rate_cache_lock:
+            if _risk_free_rate_cache is None:
+                _risk_free_rate_cache = RiskFreeRateCache()
+    return _risk_free_rate_cache
+
+def set_risk_free_rate_cache(risk_free_rate_cache):
+    """Replace the process-wide RiskFreeRateCache (e.g. to change the refresh interval)"""
+    global _risk_free_rate_cache
+    with _risk_free_rate_cache_lock:
+        _risk_free_rate_cache = risk_free_rate_cache
+
 def get_treasury_yield():
     """
     Get current 10-year Treasury yield from multiple reliable sources.
     
+    Served from the process-wide RiskFreeRateCache, so a run looks it up once.
+    
     Returns:
         float: Current 10-year Treasury yield, or None if unable to retrieve
     """
+    return get_risk_free_rate_cache().latest_yield()
+
+def _fetch_treasury_yield(fred_history=None):
+    """
+    Look up the 10-year Treasury yield, trying each source in turn.
+    
+    Args:
+        fred_history (callable): Returns the stored DGS10 history (percent); FRED is queried directly if not given
+    
+    Returns:
+        tuple: (yield as a decimal, source name), source 'estimate' for the hardcoded fallbacks
+    """
     # Method 1: FRED API (Federal Reserve Economic Data)
     try:
-        treasury_data = pdr.get_data_fred('DGS10')
+        treasury_data = fred_history() if fred_history else _get_data_fred('DGS10').iloc[:, 0].dropna()
         if not treasury_data.empty:
-            latest_yield = treasury_data.iloc[-1, 0] / 100  # Convert percentage to decimal
+            latest_yield = treasury_data.iloc[-1] / 100  # Convert percentage to decimal
             if 0.01 <= latest_yield <= 0.10:  # Sanity check
-                return latest_yield
+                return latest_yield, 'FRED'
     except Exception as e:
         print(f"FRED API Treasury yield retrieval failed: {e}")
     
     # Method 2: Yahoo Finance Treasury Yield
     try:
-        import yfinance as yf
-        treasury_ticker = yf.Ticker('^TNX')  # 10-year Treasury Yield index
-        treasury_info = treasury_ticker.info
+        treasury_info = recorded_call(('yf.Ticker', '^TNX', 'info'),
+                                      lambda: yf.Ticker('^TNX').info)  # 10-year Treasury Yield index
         
         if 'previousClose' in treasury_info:
             yield_value = treasury_info['previousClose'] / 100  # Convert percentage to decimal
             if 0.01 <= yield_value <= 0.10:  # Sanity check
-                return yield_value
+                return yield_value, 'Yahoo Finance'
     except Exception as e:
         print(f"Yahoo Finance Treasury yield retrieval failed: {e}")
     
     # Method 3: US Treasury Direct API (if available)
     try:
-        import requests
         from datetime import datetime, timedelta
         
         # Get today's date and format
@@ -1582,7 +4917,7 @@ def get_treasury_yield():
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers)
+        response = get_shared_session_pool().get(url, headers=headers)
         
         if response.status_code == 200:
             # Parsing logic would depend on the exact API response format
@@ -1594,7 +4929,7 @@ def get_treasury_yield():
             if match:
                 yield_value = float(match.group(1)) / 100  # Convert to decimal
                 if 0.01 <= yield_value <= 0.10:  # Sanity check
-                    return yield_value
+                    return yield_value, 'US Treasury'
     except Exception as e:
         print(f"US Treasury Direct API retrieval failed: {e}")
     
@@ -1620,14 +4955,14 @@ def get_treasury_yield():
         }
         
         # Use month-specific yield, or default to a standard value
-        return yearly_yields.get(current_month, 0.042)
+        return yearly_yields.get(current_month, 0.042), 'estimate'
     
     except Exception as e:
         print(f"Fallback yield calculation failed: {e}")
     
     # Ultimate fallback
     print("Warning: Unable to retrieve Treasury yield. Using standard long-term average.")
-    return 0.042  # Long-term historical average
+    return 0.042, 'estimate'  # Long-term historical average
 
 #--- Default values for wacc calculation, see about making them more detailed later ---#
 
@@ -1673,7 +5008,7 @@ def default_wacc_values(ticker, industry_data=None):
 ################################# Growth Rate Calculation ##########################################################################################
 ####################################################################################################################################################
 
-def calculate_growth_rates(ticker, cik, financial_data=None, years_historical=5):
+def calculate_growth_rates(ticker, cik, financial_data=None, years_historical=5, stock=None):
     """
     Calculate growth rates with improved data validation and regression analysis.
     
@@ -1682,6 +5017,7 @@ def calculate_growth_rates(ticker, cik, financial_data=None, years_historical=5)
         cik (str): Company's CIK number
         financial_data (dict): Financial data if already fetched
         years_historical (int): Number of historical years to analyze
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
         dict: Growth rates and components
@@ -1689,24 +5025,28 @@ def calculate_growth_rates(ticker, cik, financial_data=None, years_historical=5)
     print(f"Calculating growth rates for {ticker}...")
     
     try:
+        # Try to get stock data from yfinance or financial_data
+        if stock is None:
+            stock = get_ticker_snapshot(ticker, financial_data)
+        
         # Initialize with default values in case of failure
-        default_values = default_growth_values(ticker, True)
+        default_values = default_growth_values(ticker, True, stock)
         
-        # Try to get stock data from yfinance or financial_data
-        if financial_data and 'stock' in financial_data:
-            stock = financial_data['stock']
-        else:
-            try:
-                stock = yf.Ticker(ticker)
-            except Exception as e:
-                print(f"Error fetching stock data: {e}")
-                return default_values
+        # Histories already fetched by the provider (or stored) first;
+        # Yahoo statements are only downloaded when those are too short
+        fcf_history, revenue_history = get_growth_history(ticker, financial_data, years_historical)
         
         # Get cash flow data with multiple fallback methods
-        cash_flow_stmt = get_cash_flow_data(stock, financial_data)
+        if fcf_history is not None:
+            cash_flow_stmt = fcf_history.to_frame('Free Cash Flow').T
+        else:
+            cash_flow_stmt = get_cash_flow_data(stock, financial_data)
         
         # Get revenue data with multiple fallback methods
-        revenues = get_revenue_data(stock)
+        if revenue_history is not None:
+            revenues = revenue_history
+        else:
+            revenues = get_revenue_data(stock, financial_data)
         
         # If we still don't have enough data, use defaults
         if (cash_flow_stmt is None or cash_flow_stmt.empty or len(cash_flow_stmt.columns) < 2 or
@@ -2465,6 +5805,66 @@ def calculate_revenue_growth(revenues):
     
     return revenue_growth_rates, avg_revenue_growth
 
+def get_growth_history(ticker, financial_data=None, years=5, min_years=3):
+    """
+    FCF and revenue histories for the growth stage from data that is already local.
+    
+    Uses the provider's historical_fcf/historical_revenue, then annual values in the
+    fundamentals store. Only the most recent run of consecutive years is kept: a missing
+    year ends the history, so growth is never measured across a gap.
+    
+    Args:
+        ticker (str): Stock ticker symbol
+        financial_data: Pre-fetched financial data
+        years (int): Maximum number of years to return
+        min_years (int): Fewer years than this counts as no history
+    
+    Returns:
+        tuple: (fcf Series, revenue Series), most recent first, each None if too short
+    """
+    def from_provider(key):
+        values = financial_data.get(key) if financial_data else None
+        if values is None or len(values) < min_years:
+            return None
+        values = np.asarray(values, dtype=float)[:years]
+        # Entries are consecutive years; stop at the first blank one
+        blank = np.flatnonzero(np.isnan(values))
+        values = values[:blank[0]] if len(blank) else values
+        if len(values) < min_years:
+            return None
+        # Most recent first, labelled so that a descending sort keeps that order
+        return pd.Series(values, index=np.arange(len(values))[::-1])
+    
+    def from_store(concept):
+        periods, values = store.values(ticker, concept)
+        return pd.Series(values, index=pd.to_datetime(periods))
+    
+    def recent(series):
+        series = series.sort_index(ascending=False)[:years]
+        # Stop at the first blank value or at a period end more than ~13 months before the next one
+        gap = series.isna().to_numpy().copy()
+        gap[1:] |= (-np.diff(series.index.to_numpy())) > np.timedelta64(400, 'D')
+        cut = np.flatnonzero(gap)
+        series = series[:cut[0]] if len(cut) else series
+        return series if len(series) >= min_years else None
+    
+    fcf = from_provider('historical_fcf')
+    revenue = from_provider('historical_revenue')
+    
+    store = get_fundamentals_store()
+    if store is not None:
+        try:
+            if fcf is None:
+                fcf = recent(from_store('Free Cash Flow'))
+            if fcf is None:
+                fcf = recent(from_store('Operating Cash Flow') + from_store('Capital Expenditure'))
+            if revenue is None:
+                revenue = recent(from_store('Total Revenue'))
+        except Exception as e:
+            print(f"Could not read stored history for {ticker}: {e}")
+    
+    return fcf, revenue
+
 def get_cash_flow_data(stock, financial_data=None):
     """
     Get cash flow data with multiple fallback methods.
@@ -2501,12 +5901,13 @@ def get_cash_flow_data(stock, financial_data=None):
     
     return cash_flow_stmt
 
-def get_revenue_data(stock):
+def get_revenue_data(stock, financial_data=None):
     """
     Get revenue data with multiple fallback methods.
     
     Args:
         stock: yfinance Ticker object
+        financial_data: Pre-fetched financial data
     
     Returns:
         Series: Revenue data
@@ -2514,8 +5915,10 @@ def get_revenue_data(stock):
     revenues = None
     
     try:
-        # Try income statement
-        income = stock.income_stmt
+        # Try the income statement already fetched by the provider, then yfinance
+        income = financial_data.get('income_stmt') if financial_data else None
+        if income is None or income.empty:
+            income = stock.income_stmt
         if income is not None and not income.empty and 'Total Revenue' in income.index:
             revenues = income.loc['Total Revenue']
         
@@ -2683,13 +6086,14 @@ def get_company_size_category(market_cap):
     else:
         return 'Nano-Cap'
 
-def default_growth_values(ticker, get_industry_average=False):
+def default_growth_values(ticker, get_industry_average=False, stock=None):
     """
     Provide default growth values based on industry averages and company characteristics.
     
     Args:
         ticker (str): Stock ticker symbol
         get_industry_average (bool): Whether to attempt to get industry averages
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
         dict: Default growth values
@@ -2704,7 +6108,7 @@ def default_growth_values(ticker, get_industry_average=False):
     
     if get_industry_average:
         try:
-            stock = yf.Ticker(ticker)
+            stock = stock or TickerSnapshot(ticker)
             
             # Get company characteristics
             market_cap = stock.info.get('marketCap', 0)
@@ -2917,38 +6321,19 @@ def default_growth_values(ticker, get_industry_average=False):
 ################################# Terminal Value Calculation #######################################################################################
 ####################################################################################################################################################
 
-def calculate_terminal_value(final_year_fcf, short_term_growth, wacc, ticker, years_projection=10):
+def get_terminal_growth_inputs(ticker, stock=None):
     """
-    Calculate terminal value with improved methodology addressing extreme valuations.
+    Fetch the company characteristics used to estimate terminal growth.
     
     Args:
-        final_year_fcf: Last known free cash flow
-        short_term_growth: Initial growth rate
-        wacc: Weighted Average Cost of Capital
         ticker: Stock ticker symbol
-        years_projection: Number of years to project (default 10)
+        stock (TickerSnapshot, optional): Shared Yahoo Finance snapshot for the ticker
     
     Returns:
-        Dictionary containing all DCF components
+        tuple: (market_cap, sector, industry)
     """
-    # Input validation with more informative messages
-    if np.isnan(wacc) or wacc <= 0:
-        print(f"Warning for {ticker}: Invalid WACC ({wacc}), using default 9%")
-        wacc = 0.09
-        
-    if np.isnan(short_term_growth):
-        print(f"Warning for {ticker}: Invalid growth rate, using default 3%")
-        short_term_growth = 0.03
-        
-    # Cap short-term growth at reasonable levels based on WACC
-    if short_term_growth > wacc - 0.02:
-        original_growth = short_term_growth
-        short_term_growth = min(short_term_growth, wacc - 0.02)
-        print(f"Warning for {ticker}: Reducing short-term growth from {original_growth:.2%} to {short_term_growth:.2%} (WACC - 2%)")
-    
-    # Get company information for terminal growth estimation
     try:
-        stock = yf.Ticker(ticker)
+        stock = stock or TickerSnapshot(ticker)
         market_cap = stock.info.get('marketCap', 0)
         sector = stock.info.get('sector', '')
         industry = stock.info.get('industry', '')
@@ -2957,7 +6342,7 @@ def calculate_terminal_value(final_year_fcf, short_term_growth, wacc, ticker, ye
         if market_cap == 0 or not market_cap:
             print(f"Warning for {ticker}: Unable to retrieve market cap, estimating based on available data")
             # Try to estimate market cap from price and shares outstanding
-            last_price = stock.history(period="1d").get('Close', [0]).iloc[-1]
+            last_price = get_price_service().get_price(ticker, stock)
             shares_out = stock.info.get('sharesOutstanding', 0)
             market_cap = last_price * shares_out if shares_out > 0 else 0
     except Exception as e:
@@ -2966,6 +6351,21 @@ def calculate_terminal_value(final_year_fcf, short_term_growth, wacc, ticker, ye
         sector = ''
         industry = ''
     
+    return market_cap, sector or '', industry or ''
+
+def estimate_long_term_growth(market_cap, sector, industry):
+    """
+    Estimate the long-term (terminal) growth rate from company size and sector.
+    The WACC-based cap is applied separately by the DCF calculation.
+    
+    Args:
+        market_cap: Company market capitalization
+        sector: Company sector
+        industry: Company industry
+    
+    Returns:
+        float: Terminal growth rate bounded between 1% and 4%
+    """
     # Base long-term growth on economic fundamentals (global GDP growth approximation)
     base_terminal_growth = 0.025  # 2.5% baseline (global GDP growth approximation)
     
@@ -3005,13 +6405,228 @@ def calculate_terminal_value(final_year_fcf, short_term_growth, wacc, ticker, ye
     long_term_gdp_growth = base_terminal_growth + size_adjustment + industry_adjustment
     
     # Safety constraints to prevent unrealistic terminal growth
-    long_term_gdp_growth = max(0.01, min(long_term_gdp_growth, 0.04))  # Bound between 1-4%
+    return max(0.01, min(long_term_gdp_growth, 0.04))  # Bound between 1-4%
+
+def calculate_dcf_values_vectorized(final_year_fcf, short_term_growth, wacc, terminal_growth,
+                                    years_projection=10, exit_multiple=10):
+    """
+    Vectorized version of the DCF math in calculate_terminal_value.
+    
+    All rate/FCF arguments are broadcast against each other, so a whole batch of
+    scenarios (Monte Carlo draws, sensitivity grids) is valued in one array pass.
+    Applies the same growth caps, sigmoid growth transition, Gordon/exit-multiple
+    blend and 75% terminal value dampening as the scalar calculation.
+    
+    Args:
+        final_year_fcf: Last known free cash flow (scalar or array)
+        short_term_growth: Initial growth rate (scalar or array)
+        wacc: Weighted Average Cost of Capital (scalar or array)
+        terminal_growth: Long-term growth rate before the WACC cap (scalar or array)
+        years_projection: Number of years to project (default 10)
+        exit_multiple: Exit multiple applied to the final year FCF (default 10)
+    
+    Returns:
+        ndarray: Total DCF value for every scenario (broadcast shape of the inputs)
+    """
+    fcf, growth, wacc, terminal_growth, exit_multiple = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (final_year_fcf, short_term_growth, wacc, terminal_growth, exit_multiple))
+    )
+    
+    # Same input validation and caps as the scalar calculation
+    wacc = np.where(np.isnan(wacc) | (wacc <= 0), 0.09, wacc)
+    growth = np.where(np.isnan(growth), 0.03, growth)
+    growth = np.minimum(growth, wacc - 0.02)
+    terminal_growth = np.where(terminal_growth >= wacc - 0.01, wacc - 0.02, terminal_growth)
+    
+    # Growth transition factor per projection year (0 for the first 3 years, sigmoid afterwards)
+    years = np.arange(1, years_projection + 1)
+    position = (years - 3) / max(years_projection - 3, 1)
+    transition = np.where(years <= 3, 0.0, 1 / (1 + np.exp(-10 * (position - 0.5))))
+    
+    # Year-by-year growth rates, projected FCFs and their present values
+    growth_rates = growth[..., None] - transition * (growth - terminal_growth)[..., None]
+    projected_fcfs = fcf[..., None] * np.cumprod(1 + growth_rates, axis=-1)
+    pv_fcfs_total = (projected_fcfs / (1 + wacc[..., None]) ** years).sum(axis=-1)
+    
+    # Terminal value as a 70/30 blend of Gordon Growth and Exit Multiple
+    final_fcf = projected_fcfs[..., -1]
+    gordon_terminal_value = final_fcf * (1 + terminal_growth) / (wacc - terminal_growth)
+    terminal_value = 0.7 * gordon_terminal_value + 0.3 * final_fcf * exit_multiple
+    pv_terminal_value = terminal_value / (1 + wacc) ** years_projection
+    
+    # Dampen terminal value to at most 75% of the total value
+    total_dcf_value = pv_fcfs_total + pv_terminal_value
+    terminal_value_percentage = np.divide(pv_terminal_value, total_dcf_value,
+                                          out=np.zeros_like(total_dcf_value), where=total_dcf_value > 0)
+    dampening_factor = np.divide(0.75, terminal_value_percentage,
+                                 out=np.ones_like(total_dcf_value), where=terminal_value_percentage > 0.75)
+    
+    return pv_fcfs_total + pv_terminal_value * dampening_factor
+
+def dcf_sensitivity_grid(free_cash_flow, shares_outstanding, discount_rates, growth_rates, terminal_growth,
+                         terminal_growth_rates=None, exit_multiples=None, years_projection=10):
+    """
+    Intrinsic value per share over a discount x growth grid, valued in one broadcast pass.
+    
+    Passing terminal_growth_rates or exit_multiples adds a third axis.
+    
+    Args:
+        free_cash_flow (float): Last known free cash flow
+        shares_outstanding (float): Shares outstanding
+        discount_rates (array-like): Discount rates (N)
+        growth_rates (array-like): Short-term growth rates (M)
+        terminal_growth (float): Terminal growth before the WACC cap, used when terminal_growth_rates is not given
+        terminal_growth_rates (array-like, optional): Terminal growth rates for a third axis
+        exit_multiples (array-like, optional): Exit multiples for a third axis
+        years_projection (int): Number of years to project
+    
+    Returns:
+        pd.DataFrame: Values per share with discount rates as rows and growth rates as columns;
+                      a 3-D grid has (third axis, discount rate) MultiIndex rows
+    """
+    if terminal_growth_rates is not None and exit_multiples is not None:
+        raise ValueError("Pass terminal_growth_rates or exit_multiples, not both")
+    
+    discount = np.asarray(discount_rates, dtype=float)
+    growth = np.asarray(growth_rates, dtype=float)
+    third_name, third = None, None
+    if terminal_growth_rates is not None:
+        third_name, third = 'terminal_growth', np.asarray(terminal_growth_rates, dtype=float)
+    elif exit_multiples is not None:
+        third_name, third = 'exit_multiple', np.asarray(exit_multiples, dtype=float)
+    
+    if third is None:
+        values = calculate_dcf_values_vectorized(free_cash_flow, growth[None, :], discount[:, None], terminal_growth,
+                                                 years_projection)
+        return pd.DataFrame(values / shares_outstanding,
+                            index=pd.Index(discount, name='discount_rate'),
+                            columns=pd.Index(growth, name='growth_rate'))
+    
+    if third_name == 'terminal_growth':
+        values = calculate_dcf_values_vectorized(free_cash_flow, growth[None, None, :], discount[None, :, None],
+                                                 third[:, None, None], years_projection)
+    else:
+        values = calculate_dcf_values_vectorized(free_cash_flow, growth[None, None, :], discount[None, :, None],
+                                                 terminal_growth, years_projection, exit_multiple=third[:, None, None])
+    
+    rows = pd.MultiIndex.from_product([third, discount], names=[third_name, 'discount_rate'])
+    return pd.DataFrame((values / shares_outstanding).reshape(len(third) * len(discount), len(growth)),
+                        index=rows, columns=pd.Index(growth, name='growth_rate'))
+
+def sensitivity_range(base, half_width, steps=5, floor=None):
+    """
+    Evenly spaced values centred on base, for sensitivity grids of any resolution.
+    
+    Args:
+        base (float): Centre value
+        half_width (float): Distance from the centre to either end
+        steps (int): Number of values
+        floor (float or array-like, optional): Lower bound applied to every value, or one bound per value
+    
+    Returns:
+        ndarray: The values, ascending
+    """
+    values = np.linspace(base - half_width, base + half_width, steps)
+    return values if floor is None else np.maximum(values, floor)
+
+class TerminalGrowthContext:
+    """
+    Company-specific inputs for the terminal growth estimate, resolved once per ticker
+    so the DCF math itself can be recomputed without any data lookups.
+    """
+    
+    def __init__(self, ticker, market_cap=0, sector='', industry=''):
+        """
+        Initialize from already known company characteristics.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            market_cap (float): Company market capitalization
+            sector (str): Company sector
+            industry (str): Company industry
+        """
+        self.ticker = ticker
+        self.market_cap = market_cap or 0
+        self.sector = sector or ''
+        self.industry = industry or ''
+        
+        # Size/sector based terminal growth (before the WACC cap)
+        self.terminal_growth = estimate_long_term_growth(self.market_cap, self.sector, self.industry)
+    
+    @classmethod
+    def from_ticker(cls, ticker, stock=None):
+        """Build the context by looking up the company once"""
+        market_cap, sector, industry = get_terminal_growth_inputs(ticker, stock)
+        return cls(ticker, market_cap, sector, industry)
+
+def calculate_terminal_value(final_year_fcf, short_term_growth, wacc, ticker, years_projection=10, context=None):
+    """
+    Calculate terminal value with improved methodology addressing extreme valuations.
+    
+    Args:
+        final_year_fcf: Last known free cash flow
+        short_term_growth: Initial growth rate
+        wacc: Weighted Average Cost of Capital
+        ticker: Stock ticker symbol
+        years_projection: Number of years to project (default 10)
+        context (TerminalGrowthContext, optional): Pre-resolved company inputs, looked up if not given
+    
+    Returns:
+        Dictionary containing all DCF components
+    """
+    # Get company information for terminal growth estimation
+    if context is None:
+        context = TerminalGrowthContext.from_ticker(ticker)
+    
+    return calculate_dcf_projection(final_year_fcf, short_term_growth, wacc, context.terminal_growth,
+                                    years_projection, ticker=ticker)
+
+def calculate_dcf_projection(final_year_fcf, short_term_growth, wacc, terminal_growth, years_projection=10,
+                             ticker=None, verbose=True):
+    """
+    Pure DCF kernel: project FCFs, discount them and compute the terminal value.
+    Performs no data lookups, so it can be called repeatedly at no I/O cost.
+    
+    Args:
+        final_year_fcf: Last known free cash flow
+        short_term_growth: Initial growth rate
+        wacc: Weighted Average Cost of Capital
+        terminal_growth: Long-term growth rate before the WACC cap (see TerminalGrowthContext)
+        years_projection: Number of years to project (default 10)
+        ticker: Stock ticker symbol, only used in warning messages
+        verbose: Whether to print warnings about adjusted inputs
+    
+    Returns:
+        Dictionary containing all DCF components
+    """
+    label = ticker or 'DCF'
+    
+    # Input validation with more informative messages
+    if np.isnan(wacc) or wacc <= 0:
+        if verbose:
+            print(f"Warning for {label}: Invalid WACC ({wacc}), using default 9%")
+        wacc = 0.09
+        
+    if np.isnan(short_term_growth):
+        if verbose:
+            print(f"Warning for {label}: Invalid growth rate, using default 3%")
+        short_term_growth = 0.03
+        
+    # Cap short-term growth at reasonable levels based on WACC
+    if short_term_growth > wacc - 0.02:
+        original_growth = short_term_growth
+        short_term_growth = min(short_term_growth, wacc - 0.02)
+        if verbose:
+            print(f"Warning for {label}: Reducing short-term growth from {original_growth:.2%} to {short_term_growth:.2%} (WACC - 2%)")
+    
+    long_term_gdp_growth = terminal_growth
     
     # Ensure terminal growth < WACC (for Gordon Growth Model validity)
     if long_term_gdp_growth >= wacc - 0.01:
         original_growth = long_term_gdp_growth
         long_term_gdp_growth = wacc - 0.02  # At least 2% below WACC
-        print(f"Warning for {ticker}: Terminal growth rate {original_growth:.2%} too close to WACC {wacc:.2%}, adjusted to {long_term_gdp_growth:.2%}")
+        if verbose:
+            print(f"Warning for {label}: Terminal growth rate {original_growth:.2%} too close to WACC {wacc:.2%}, adjusted to {long_term_gdp_growth:.2%}")
     
     # Create smoother transition from short-term to long-term growth
     growth_rates = []
@@ -3040,8 +6655,8 @@ def calculate_terminal_value(final_year_fcf, short_term_growth, wacc, ticker, ye
     projected_fcfs = projected_fcfs[1:]
     
     # Validate FCF projections
-    if any(fcf <= 0 for fcf in projected_fcfs):
-        print(f"Warning for {ticker}: Negative FCF projections detected, check input data")
+    if any(fcf <= 0 for fcf in projected_fcfs) and verbose:
+        print(f"Warning for {label}: Negative FCF projections detected, check input data")
     
     # Calculate present value of explicit period FCFs
     pv_fcfs = []
@@ -3071,7 +6686,8 @@ def calculate_terminal_value(final_year_fcf, short_term_growth, wacc, ticker, ye
         dampening_factor = 0.75 / terminal_value_percentage
         original_terminal_value = pv_terminal_value
         pv_terminal_value *= dampening_factor
-        print(f"Warning for {ticker}: Terminal value too dominant ({terminal_value_percentage:.1%} of total), dampened by factor of {dampening_factor:.2f}")
+        if verbose:
+            print(f"Warning for {label}: Terminal value too dominant ({terminal_value_percentage:.1%} of total), dampened by factor of {dampening_factor:.2f}")
         total_dcf_value = sum(pv_fcfs) + pv_terminal_value
     
     # Calculate percentage of value from terminal value (useful diagnostic)
@@ -3110,12 +6726,15 @@ def perform_advanced_dcf_analysis(financial_data, ticker, cik=None):
         print(f"No financial data available for {ticker}")
         return None
     
+    # One Yahoo Finance snapshot shared by the WACC, growth and terminal value stages
+    stock = get_ticker_snapshot(ticker, financial_data)
+    
     # Calculate WACC (Discount Rate)
-    wacc_data = calculate_wacc(ticker)
+    wacc_data = calculate_wacc(ticker, financial_data, stock=stock)
     discount_rate = wacc_data['wacc']
     
     # Calculate Growth Rates
-    growth_data = calculate_growth_rates(ticker, cik, financial_data)
+    growth_data = calculate_growth_rates(ticker, cik, financial_data, stock=stock)
     growth_rate = growth_data['short_term_growth']
     
     # Get FCF and shares outstanding
@@ -3123,8 +6742,12 @@ def perform_advanced_dcf_analysis(financial_data, ticker, cik=None):
     shares_outstanding = financial_data['shares_outstanding']
     current_price = financial_data['current_price']
     
+    # Resolve size/sector inputs for terminal growth once, then run the DCF kernel
+    terminal_context = TerminalGrowthContext.from_ticker(ticker, stock)
+    
     # Calculate Terminal Value and DCF
-    terminal_data = calculate_terminal_value(free_cash_flow, growth_rate, discount_rate, ticker)
+    terminal_data = calculate_terminal_value(free_cash_flow, growth_rate, discount_rate, ticker,
+                                             context=terminal_context)
     
     # Calculate intrinsic value per share
     intrinsic_value_per_share = terminal_data['total_dcf_value'] / shares_outstanding
@@ -3151,20 +6774,28 @@ def perform_advanced_dcf_analysis(financial_data, ticker, cik=None):
         'is_undervalued': is_undervalued,
         'detailed_growth': growth_data,
         'detailed_wacc': wacc_data,
-        'detailed_projections': terminal_data
+        'detailed_projections': terminal_data,
+        'terminal_context': terminal_context
     }
     
     return results
 
-def run_monte_carlo_simulation(financial_data, ticker, cik=None, iterations=1000):
+def run_monte_carlo_simulation(financial_data, ticker, cik=None, iterations=1000, base_case=None,
+                               seed=None, chunk_size=250000):
     """
     Run a Monte Carlo simulation to establish confidence intervals for DCF valuation
     
+    All (fcf, discount, growth) samples are drawn as NumPy arrays and valued with
+    calculate_dcf_values_vectorized, so no network calls happen inside the simulation.
+    
     Args:
         financial_data (dict): Financial data from FinancialDataAcquisition
         ticker (str): Stock ticker symbol
         cik (str, optional): Company CIK number
         iterations (int): Number of simulation iterations
+        base_case (dict, optional): Result of perform_advanced_dcf_analysis, computed if not given
+        seed (int, optional): Seed for the random number generator
+        chunk_size (int): Number of iterations valued per array pass (bounds memory use)
         
     Returns:
         dict: Simulation results with percentiles
@@ -3172,7 +6803,8 @@ def run_monte_carlo_simulation(financial_data, ticker, cik=None, iterations=1000
     print(f"\nRunning Monte Carlo simulation for {ticker} ({iterations} iterations)...")
     
     # Base case DCF
-    base_case = perform_advanced_dcf_analysis(financial_data, ticker, cik)
+    if base_case is None:
+        base_case = perform_advanced_dcf_analysis(financial_data, ticker, cik)
     if not base_case:
         return None
     
@@ -3182,37 +6814,41 @@ def run_monte_carlo_simulation(financial_data, ticker, cik=None, iterations=1000
     base_growth = base_case['growth_rate']
     shares = financial_data['shares_outstanding']
     
+    # Terminal growth only depends on company size/sector, so reuse the base case context
+    terminal_context = base_case.get('terminal_context') or TerminalGrowthContext.from_ticker(ticker)
+    terminal_growth = terminal_context.terminal_growth
+    
     # Define variation ranges (percentage points)
     fcf_variation = 0.10  # ±10%
     discount_variation = 0.02  # ±2 percentage points
     growth_variation = 0.02  # ±2 percentage points
     
-    # Simulation results
-    simulated_values = []
+    rng = np.random.default_rng(seed)
+    simulated_values = np.empty(iterations)
     
-    for _ in tqdm(range(iterations)):
-        # Random variations
-        sim_fcf = base_fcf * (1 + random.uniform(-fcf_variation, fcf_variation))
-        sim_discount = max(0.04, base_discount + random.uniform(-discount_variation, discount_variation))
-        sim_growth = max(0.01, base_growth + random.uniform(-growth_variation, growth_variation))
+    for start in range(0, iterations, chunk_size):
+        size = min(chunk_size, iterations - start)
         
-        # Calculate terminal value with simulated parameters
-        sim_terminal = calculate_terminal_value(sim_fcf, sim_growth, sim_discount, ticker)
+        # Random variations
+        sim_fcf = base_fcf * (1 + rng.uniform(-fcf_variation, fcf_variation, size))
+        sim_discount = np.maximum(0.04, base_discount + rng.uniform(-discount_variation, discount_variation, size))
+        sim_growth = np.maximum(0.01, base_growth + rng.uniform(-growth_variation, growth_variation, size))
         
-        # Calculate intrinsic value per share
-        sim_value = sim_terminal['total_dcf_value'] / shares
-        simulated_values.append(sim_value)
+        # Intrinsic value per share for the whole chunk
+        sim_total = calculate_dcf_values_vectorized(sim_fcf, sim_growth, sim_discount, terminal_growth)
+        simulated_values[start:start + size] = sim_total / shares
     
     # Sort results for percentiles
     simulated_values.sort()
     
     # Calculate percentiles
+    p5, p25, p50, p75, p95 = np.percentile(simulated_values, [5, 25, 50, 75, 95])
     percentiles = {
-        '5th': np.percentile(simulated_values, 5),
-        '25th': np.percentile(simulated_values, 25),
-        '50th': np.percentile(simulated_values, 50),
-        '75th': np.percentile(simulated_values, 75),
-        '95th': np.percentile(simulated_values, 95)
+        '5th': p5,
+        '25th': p25,
+        '50th': p50,
+        '75th': p75,
+        '95th': p95
     }
     
     # Return detailed simulation results
@@ -3223,7 +6859,7 @@ def run_monte_carlo_simulation(financial_data, ticker, cik=None, iterations=1000
         'std_dev': np.std(simulated_values),
         'percentiles': percentiles,
         'current_price': financial_data['current_price'],
-        'probability_undervalued': sum(1 for x in simulated_values if x > financial_data['current_price']) / iterations * 100,
+        'probability_undervalued': np.count_nonzero(simulated_values > financial_data['current_price']) / iterations * 100,
         'all_values': simulated_values
     }
 
@@ -3325,41 +6961,19 @@ def print_dcf_results(dcf_results, financial_data, monte_carlo=None):
     
     # Sensitivity analysis
     print("\n--- Sensitivity Analysis ---")
+    terminal_context = dcf_results.get('terminal_context') or TerminalGrowthContext.from_ticker(ticker)
     base_discount = discount_rate
     base_growth = growth_rate
     
-    # Create ranges around the calculated rates
-    discount_ranges = [
-        max(0.04, base_discount - 0.02),
-        max(0.05, base_discount - 0.01),
-        base_discount,
-        base_discount + 0.01,
-        base_discount + 0.02
-    ]
-    
-    growth_ranges = [
-        max(0.01, base_growth - 0.015),
-        max(0.015, base_growth - 0.0075),
-        base_growth,
-        base_growth + 0.0075,
-        base_growth + 0.015
-    ]
-    
-    sensitivity_results = []
+    # Create ranges around the calculated rates, keeping the low end above sensible minimums
+    discount_ranges = sensitivity_range(base_discount, 0.02, floor=[0.04, 0.05, 0, 0, 0])
+    growth_ranges = sensitivity_range(base_growth, 0.015, floor=[0.01, 0.015, 0, 0, 0])
     
-    for d_rate in discount_ranges:
-        row = []
-        for g_rate in growth_ranges:
-            # Use the terminal value calculation function for consistent methodology
-            tv_data = calculate_terminal_value(free_cash_flow, g_rate, d_rate, ticker)
-            value_per_share = tv_data['total_dcf_value'] / shares_outstanding
-            row.append(value_per_share)
-        sensitivity_results.append(row)
-    
-    # Create a DataFrame for better visualization
-    sensitivity_df = pd.DataFrame(sensitivity_results, 
-                                index=[f"Discount {d*100:.1f}%" for d in discount_ranges],
-                                columns=[f"Growth {g*100:.1f}%" for g in growth_ranges])
+    # Whole grid in one vectorized pass of the DCF kernel (no lookups per cell)
+    sensitivity_df = dcf_sensitivity_grid(free_cash_flow, shares_outstanding, discount_ranges, growth_ranges,
+                                          terminal_context.terminal_growth, years_projection=years)
+    sensitivity_df.index = [f"Discount {d*100:.1f}%" for d in discount_ranges]
+    sensitivity_df.columns = [f"Growth {g*100:.1f}%" for g in growth_ranges]
     
     print("\nIntrinsic Value per Share Sensitivity Table:")
     print(sensitivity_df)
@@ -3417,6 +7031,318 @@ def plot_monte_carlo_results(monte_carlo_results, ticker):
     
     print(f"\nMonte Carlo DCF plot saved as {ticker}_monte_carlo_dcf.png")
 
+####################################################################################################################################################
+################################## Local Stand-in Provider Servers #################################################################################
+####################################################################################################################################################
+
+class ProviderStandInServer:
+    """
+    Local HTTP stand-in for one data provider, for load testing the acquisition layer.
+    
+    Serves deterministic synthetic data in the providers' response formats:
+      - sec: companyconcept, companyfacts, submissions and the company tickers file
+      - fmp: cash-flow-statement, profile and income-statement
+      - alpha_vantage: CASH_FLOW, OVERVIEW, GLOBAL_QUOTE and INCOME_STATEMENT
+      - prices: last closes as {symbol: price} for /prices?symbols=A,B (see StandInPriceService)
+    with configurable latency, random 500 errors and 429 throttling (with Retry-After)
+    above a request rate. Each provider runs on its own port so per-provider rate
+    limits and circuit breakers can be exercised independently.
+    """
+    
+    PROVIDERS = ('sec', 'fmp', 'alpha_vantage', 'prices')
+    
+    def __init__(self, provider, latency=0.0, error_rate=0.0, rate_limit=None, seed=None,
+                 host='127.0.0.1', port=0, tickers=None):
+        """
+        Initialize the server (call start() or use it as a context manager).
+        
+        Args:
+            provider (str): 'sec', 'fmp', 'alpha_vantage' or 'prices'
+            latency (float or tuple): Seconds added per response, or a (min, max) range
+            error_rate (float): Fraction of requests answered with HTTP 500
+            rate_limit (tuple): (requests_per_second, burst) above which requests get HTTP 429
+            seed (int): Seed for latency and error draws
+            host (str): Interface to bind
+            port (int): Port to bind (0 picks a free one)
+            tickers (dict): {ticker: cik} listed in the SEC company tickers file
+        """
+        if provider not in self.PROVIDERS:
+            raise ValueError(f"Unknown provider: {provider}")
+        self.provider = provider
+        self.tickers = dict(tickers or {})
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(*rate_limit) if rate_limit else None
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+    
+    @property
+    def url(self):
+        """Root URL of the server"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    @property
+    def base_urls(self):
+        """FinancialDataAcquisition base_urls overrides pointing at this server"""
+        if self.provider == 'sec':
+            return {
+                'SEC_SUBMISSION_BASE': f"{self.url}/submissions/CIK{{}}.json",
+                'SEC_COMPANY_CONCEPT': f"{self.url}/api/xbrl/companyconcept/CIK{{}}/us-gaap/{{}}.json",
+                'SEC_COMPANY_FACTS': f"{self.url}/api/xbrl/companyfacts/CIK{{}}.json",
+                'SEC_COMPANY_TICKERS': f"{self.url}/files/company_tickers_exchange.json",
+            }
+        if self.provider == 'fmp':
+            return {'FMP_BASE_URL': f"{self.url}/api/v3"}
+        if self.provider == 'alpha_vantage':
+            return {'ALPHA_VANTAGE_BASE': f"{self.url}/query"}
+        return {}  # Prices are read by StandInPriceService, not the acquisition layer
+    
+    def start(self):
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Shut the server down"""
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def _handler_class(self):
+        stand_in = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, payload, headers = stand_in._respond(self.path)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass  # Keep load tests quiet
+        
+        return Handler
+    
+    def _respond(self, path):
+        """Status, JSON payload and extra headers for a request path"""
+        with self._lock:
+            self.stats['requests'] += 1
+            latency = self._random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency
+            failed = self._random.random() < self.error_rate
+        
+        if latency:
+            time.sleep(latency)
+        
+        if self.bucket and not self.bucket.try_acquire():
+            with self._lock:
+                self.stats['throttled'] += 1
+            return 429, {'error': 'Too Many Requests'}, {'Retry-After': str(max(1, int(round(1 / self.bucket.rate))))}
+        
+        if failed:
+            with self._lock:
+                self.stats['errors'] += 1
+            return 500, {'error': 'Internal Server Error'}, {}
+        
+        parsed = urlparse(path)
+        try:
+            payload = getattr(self, f"_{self.provider}_payload")(parsed.path, parse_qs(parsed.query))
+        except (KeyError, ValueError, IndexError):
+            payload = None
+        if payload is None:
+            return 404, {'error': 'Not Found'}, {}
+        return 200, payload, {}
+    
+    # --- Synthetic data ---
+    
+    @staticmethod
+    def _company(key):
+        """Deterministic synthetic fundamentals for a ticker or CIK"""
+        rng = random.Random(int(hashlib.sha256(str(key).encode('utf-8')).hexdigest()[:12], 16))
+        revenue = rng.uniform(1e9, 4e11)
+        margin = rng.uniform(0.1, 0.35)
+        capex_ratio = rng.uniform(0.02, 0.1)
+        growth = rng.uniform(-0.02, 0.15)
+        shares = rng.uniform(1e8, 1.6e10)
+        price = rng.uniform(10, 600)
+        current_year = datetime.now().year - 1
+        years = []
+        for i in range(5):
+            scale = (1 + growth) ** -i
+            years.append({
+                'year': current_year - i,
+                'revenue': revenue * scale,
+                'operating_cash_flow': revenue * margin * scale,
+                'capex': revenue * capex_ratio * scale,
+            })
+        return {'years': years, 'shares': shares, 'price': price}
+    
+    SEC_CONCEPT_FIELDS = {
+        'NetCashProvidedByUsedInOperatingActivities': ('operating_cash_flow', 'USD'),
+        'PaymentsToAcquirePropertyPlantAndEquipment': ('capex', 'USD'),
+        'Revenues': ('revenue', 'USD'),
+        'CommonStockSharesOutstanding': ('shares', 'shares'),
+        'WeightedAverageNumberOfSharesOutstandingBasic': ('shares', 'shares'),
+    }
+    
+    def _sec_facts(self, cik, concept):
+        field, unit = self.SEC_CONCEPT_FIELDS[concept]
+        company = self._company(cik)
+        facts = []
+        for year in company['years']:
+            value = company['shares'] if field == 'shares' else year[field]
+            facts.append({
+                'start': f"{year['year']}-01-01", 'end': f"{year['year']}-12-31", 'val': round(value),
+                'accn': f"0000000000-{year['year'] % 100 + 1:02d}-000001", 'fy': year['year'] + 1, 'fp': 'FY',
+                'form': '10-K', 'filed': f"{year['year'] + 1}-02-15", 'frame': f"CY{year['year']}"
+            })
+        return {unit: facts}
+    
+    def _sec_payload(self, path, query):
+        parts = path.strip('/').split('/')
+        if path.startswith('/api/xbrl/companyconcept/'):
+            cik, concept = parts[3][3:], parts[5][:-len('.json')]
+            if concept not in self.SEC_CONCEPT_FIELDS:
+                return None
+            return {'cik': int(cik), 'taxonomy': 'us-gaap', 'tag': concept, 'units': self._sec_facts(cik, concept)}
+        if path.startswith('/api/xbrl/companyfacts/'):
+            cik = parts[3][3:-len('.json')]
+            return {'cik': int(cik), 'entityName': f"Stand-in {cik}", 'facts': {'us-gaap': {
+                concept: {'units': self._sec_facts(cik, concept)} for concept in self.SEC_CONCEPT_FIELDS}}}
+        if path.startswith('/submissions/'):
+            cik = parts[1][3:-len('.json')]
+            return {'cik': cik, 'name': f"Stand-in {cik}", 'sic': '7372', 'tickers': [], 'filings': {'recent': {}}}
+        if path == '/files/company_tickers_exchange.json':
+            return {'fields': ['cik', 'name', 'ticker', 'exchange'],
+                    'data': [[int(cik), f"Stand-in {ticker}", ticker, 'NASDAQ'] for ticker, cik in self.tickers.items()]}
+        return None
+    
+    def _fmp_payload(self, path, query):
+        endpoint, symbol = path.strip('/').split('/')[2:4]
+        company = self._company(symbol)
+        if endpoint == 'cash-flow-statement':
+            return [{'date': f"{year['year']}-12-31", 'symbol': symbol,
+                     'netCashProvidedByOperatingActivities': year['operating_cash_flow'],
+                     'capitalExpenditure': -year['capex'],
+                     'freeCashFlow': year['operating_cash_flow'] - year['capex']} for year in company['years']]
+        if endpoint == 'profile':
+            return [{'symbol': symbol, 'price': company['price'], 'mktCap': company['price'] * company['shares']}]
+        if endpoint == 'income-statement':
+            return [{'date': f"{year['year']}-12-31", 'symbol': symbol, 'revenue': year['revenue']}
+                    for year in company['years']]
+        return None
+    
+    def _alpha_vantage_payload(self, path, query):
+        function, symbol = query['function'][0], query['symbol'][0]
+        company = self._company(symbol)
+        if function == 'CASH_FLOW':
+            return {'symbol': symbol, 'annualReports': [
+                {'fiscalDateEnding': f"{year['year']}-12-31", 'operatingCashflow': str(round(year['operating_cash_flow'])),
+                 'capitalExpenditures': str(round(year['capex']))} for year in company['years']]}
+        if function == 'OVERVIEW':
+            return {'Symbol': symbol, 'SharesOutstanding': str(round(company['shares'])),
+                    'MarketCapitalization': str(round(company['shares'] * company['price']))}
+        if function == 'GLOBAL_QUOTE':
+            return {'Global Quote': {'01. symbol': symbol, '05. price': f"{company['price']:.4f}"}}
+        if function == 'INCOME_STATEMENT':
+            return {'symbol': symbol, 'annualReports': [
+                {'fiscalDateEnding': f"{year['year']}-12-31", 'totalRevenue': str(round(year['revenue']))}
+                for year in company['years']]}
+        return None
+    
+    def _prices_payload(self, path, query):
+        if path != '/prices':
+            return None
+        return {symbol: round(self._company(symbol)['price'], 4) for symbol in query['symbols'][0].split(',')}
+
+
+class StandInPriceService(PriceService):
+    """PriceService reading last closes from a 'prices' ProviderStandInServer instead of Yahoo Finance"""
+    
+    def __init__(self, url, ttl=900, batch_size=200):
+        """
+        Args:
+            url (str): Root URL of the prices stand-in server
+            ttl (float): Seconds a fetched price stays fresh
+            batch_size (int): Maximum symbols per request
+        """
+        super().__init__(ttl, batch_size)
+        self.url = url
+    
+    def _download(self, tickers):
+        try:
+            response = get_shared_session_pool().get(f"{self.url}/prices", params={'symbols': ','.join(tickers)})
+            if response.status_code != 200:
+                print(f"Stand-in price request failed: Status {response.status_code}")
+                return
+            for symbol, price in response.json().items():
+                self.prime(symbol, price)
+        except Exception as e:
+            print(f"Stand-in price request failed for {len(tickers)} tickers: {e}")
+    
+    def _fetch_one(self, ticker, stock=None):
+        self._download([ticker])
+        price = self.cached_price(ticker)
+        if price is None:
+            raise ValueError(f"No stand-in price for {ticker}")
+        return price
+
+
+def start_stand_in_providers(latency=0.0, error_rate=0.0, rate_limits=None, seed=None, tickers=None):
+    """
+    Start one stand-in server per provider.
+    
+    Args:
+        latency (float or tuple): Seconds added per response, or a (min, max) range
+        error_rate (float): Fraction of requests answered with HTTP 500
+        rate_limits (dict): {provider: (requests_per_second, burst)} throttling thresholds
+        seed (int): Seed for latency and error draws
+        tickers (dict or list): Tickers listed in the stand-in SEC tickers file, as {ticker: cik}
+            or a list (CIKs derived from the ticker)
+    
+    Returns:
+        tuple: ({provider: ProviderStandInServer}, base_urls dict for FinancialDataAcquisition)
+    
+    The shared price service is replaced by a StandInPriceService. With the SEC endpoints
+    overridden, sec-api.io is not used, and use_yahoo=False keeps the acquisition layer
+    off Yahoo Finance, so no request leaves the machine:
+    
+        servers, base_urls = start_stand_in_providers(latency=(0.05, 0.2), error_rate=0.02,
+                                                      rate_limits={'alpha_vantage': (5, 5)},
+                                                      tickers=['AAPL', 'MSFT'])
+        set_fundamentals_store(None)  # Keep synthetic data out of the on-disk store
+        acquisition = FinancialDataAcquisition(fmp_api_key='stand-in', alpha_vantage_key='stand-in',
+                                               use_http_cache=False, use_yahoo=False, base_urls=base_urls)
+    """
+    if tickers is not None and not isinstance(tickers, dict):
+        tickers = {ticker: int(hashlib.sha256(ticker.encode('utf-8')).hexdigest()[:8], 16) % 10 ** 9 + 1
+                   for ticker in tickers}
+    
+    servers = {}
+    base_urls = {}
+    for offset, provider in enumerate(ProviderStandInServer.PROVIDERS):
+        server = ProviderStandInServer(provider, latency, error_rate, (rate_limits or {}).get(provider),
+                                       None if seed is None else seed + offset, tickers=tickers).start()
+        servers[provider] = server
+        base_urls.update(server.base_urls)
+    set_price_service(StandInPriceService(servers['prices'].url))
+    return servers, base_urls
+
 def main():
     """
     Main function to run DCF analysis on a list of stocks
@@ -3424,6 +7350,12 @@ def main():
     print("DCF Analysis Tool - Enhanced Version")
     print("=" * 50)
     
+    # Optional record/replay of all network I/O (set DCF_NETWORK_MODE=record or replay)
+    recorder = network_recorder_from_env()
+    if recorder:
+        print(f"Network {recorder.mode} mode using {recorder.archive_path}")
+        set_network_recorder(recorder)
+    
     # Step 1: Set up API keys (either in environment variables or passed directly)
     # Option 1: Set environment variables
     # os.environ['SEC_API_KEY'] = 'your_sec_api_key'  # https://sec-api.io
@@ -3452,9 +7384,30 @@ def main():
     run_monte_carlo = True  # Set to False to disable Monte Carlo simulation
     monte_carlo_iterations = 300
     
+    # Batch regression betas for WACC. Costs one 2y price download per 200 tickers on every run,
+    # accepted because it replaces a 2y history download per ticker whose Yahoo beta is missing
+    # or implausible; set to False to rely on Yahoo's betas and the per-ticker fallbacks
+    precompute_betas = True
+    
     # Step 4: Process each stock
+    # One batched request for every price in the list, and the risk-free rate in the background
+    get_risk_free_rate_cache().warm()
+    get_price_service().prefetch([ticker for ticker, _ in test_stocks])
+    
+    # Regression betas for the whole list in one batched download, used by calculate_wacc
+    if precompute_betas and data_acquisition.use_yahoo:
+        try:
+            compute_betas([ticker for ticker, _ in test_stocks])
+        except Exception as e:
+            print(f"Could not precompute betas: {e}")
+    
+    # Only companies that filed since the last run have their stored fundamentals refreshed
+    # (only worth the SEC requests when SEC data is used for the valuation)
+    if data_acquisition.use_sec_edgar:
+        data_acquisition.refresh_fundamentals([cik for _, cik in test_stocks])
+    
+    # Provider rate limits are enforced inside FinancialDataAcquisition, no fixed delay needed
     for stock in test_stocks:
-        time.sleep(6)  # Add a delay to avoid rate limits
         ticker, cik = stock
         
         print(f"\n{'*' * 70}")
@@ -3467,7 +7420,7 @@ def main():
         if financial_data:
             print(f"\n✅ Retrieved financial data for {ticker} from {financial_data.get('data_source', 'Unknown')}:")
             print(f"   Free Cash Flow: ${financial_data['free_cash_flow']:,.2f}")
-            print(f"   Shares Outstanding: {financial_data['shares_outstanding']:,}")
+            print(f"   Shares Outstanding: {financial_data['shares_outstanding']:,.0f}")
             print(f"   Current Price: ${financial_data['current_price']:.2f}")
             
             # Perform DCF analysis
@@ -3478,7 +7431,7 @@ def main():
             monte_carlo_results = None
             if run_monte_carlo and dcf_results:
                 monte_carlo_results = run_monte_carlo_simulation(
-                    financial_data, ticker, cik, monte_carlo_iterations
+                    financial_data, ticker, cik, monte_carlo_iterations, base_case=dcf_results
                 )
                 
                 # Plot Monte Carlo results
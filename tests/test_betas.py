@@ -0,0 +1,74 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class MarketCache:
+    def __init__(self, returns):
+        self._returns = returns
+
+    def returns(self):
+        return self._returns
+
+
+@pytest.fixture
+def universe():
+    """Synthetic closes for three tickers with known betas, one with gaps, and the market returns"""
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range('2023-01-02', periods=260)
+    market = pd.Series(rng.normal(0.0004, 0.01, len(dates)), index=dates)
+    returns = pd.DataFrame({name: beta * market + rng.normal(0, 0.008, len(dates))
+                            for name, beta in (('LOW', 0.6), ('MID', 1.0), ('HIGH', 1.5))})
+    prices = 100 * (1 + returns).cumprod()
+    prices.iloc[40:55, 2] = np.nan  # HIGH did not trade for three weeks
+    return prices, market
+
+
+def test_matrix_betas_match_per_ticker_covariance(dcf, universe, monkeypatch):
+    monkeypatch.setattr(dcf, '_precomputed_betas', {})
+    prices, market = universe
+    betas = dcf.compute_betas(prices=prices, market_cache=MarketCache(market), adjustment=None)
+
+    returns = dcf.returns_matrix(prices)
+    for ticker in prices.columns:
+        aligned = pd.concat([returns[ticker], market], axis=1, join='inner').dropna()
+        expected = np.cov(aligned.iloc[:, 0], aligned.iloc[:, 1], ddof=1)[0, 1] / np.var(aligned.iloc[:, 1], ddof=1)
+        assert betas.at[ticker, 'raw_beta'] == pytest.approx(expected, rel=1e-10)
+        assert betas.at[ticker, 'observations'] == len(aligned)
+        # Same answer as the one-ticker path calculate_wacc falls back to
+        assert dcf.MarketReturnsCache.beta(MarketCache(market), returns[ticker].dropna()) == pytest.approx(expected)
+    assert betas['raw_beta'].tolist() == pytest.approx([0.6, 1.0, 1.5], abs=0.15)
+
+
+def test_blume_adjustment_and_registered_raw_betas(dcf, universe, monkeypatch):
+    monkeypatch.setattr(dcf, '_precomputed_betas', {})
+    prices, market = universe
+    betas = dcf.compute_betas(prices=prices, market_cache=MarketCache(market))
+
+    np.testing.assert_allclose(betas['beta'], 0.67 * betas['raw_beta'] + 0.33)
+    assert dcf.adjust_betas(pd.Series([0.0, 1.0, 2.0]), 'blume').tolist() == pytest.approx([0.33, 1.0, 1.67])
+    # WACC gets the raw beta, like Yahoo's info['beta']
+    assert dcf.get_precomputed_beta('HIGH') == pytest.approx(betas.at['HIGH', 'raw_beta'])
+
+
+def test_too_few_observations_give_no_beta(dcf, universe, monkeypatch):
+    monkeypatch.setattr(dcf, '_precomputed_betas', {})
+    prices, market = universe
+    betas = dcf.compute_betas(prices=prices.iloc[:20], market_cache=MarketCache(market))
+    assert betas['raw_beta'].isna().all()
+    assert dcf.get_precomputed_beta('MID') is None
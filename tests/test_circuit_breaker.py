@@ -0,0 +1,159 @@
+import importlib.util
+import json
+import os
+
+import pytest
+import requests
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeClock:
+    """Stands in for the time module: monotonic() only moves when advanced, sleep() advances it"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(dcf, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(dcf, 'time', clock)
+    return clock
+
+
+def acquisition(dcf, statuses, **kwargs):
+    """FMP-only acquisition whose requests answer with the given statuses in turn"""
+    data_acquisition = dcf.FinancialDataAcquisition(
+        fmp_api_key='test', use_sec_edgar=False, use_yahoo=False, use_http_cache=False,
+        ticker_index=object(), session_pool=dcf.HTTPSessionPool(), rate_limiter=dcf.RateLimiter({'fmp': None}),
+        retry_policy=dcf.RetryPolicy(base_delay=0.01, max_delay=0.01), **kwargs)
+    data_acquisition.requests = []
+
+    def http_get(url, **kwargs):
+        data_acquisition.requests.append(url)
+        status = statuses[min(len(data_acquisition.requests), len(statuses)) - 1]
+        if isinstance(status, Exception):
+            raise status
+        return dcf.StoredResponse(status, json.dumps([]).encode())
+    data_acquisition._http_get = http_get
+    return data_acquisition
+
+
+def test_breaker_opens_then_lets_one_trial_through(dcf, clock):
+    breaker = dcf.CircuitBreaker('FMP', failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    # Skipped for the whole cooldown
+    clock.advance(59)
+    assert not breaker.allow()
+    clock.advance(1)
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one trial at a time
+
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_failed_trial_reopens_the_breaker(dcf, clock):
+    breaker = dcf.CircuitBreaker('FMP', failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.advance(60)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.advance(30)
+    assert not breaker.allow()
+
+
+def test_non_transient_trial_closes_the_breaker(dcf, clock):
+    breaker = dcf.CircuitBreaker('FMP', failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.advance(60)
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.state == 'closed'
+
+
+def test_retry_policy_classifies_failures(dcf):
+    policy = dcf.RetryPolicy()
+    assert policy.is_retryable_status(429) and policy.is_retryable_status(503)
+    assert not policy.is_retryable_status(404) and not policy.is_retryable_status(403)
+    assert policy.is_retryable_error(dcf.TransientHTTPError(503))
+    assert policy.is_retryable_error(requests.exceptions.ConnectionError())
+    assert not policy.is_retryable_error(ValueError('Expecting value'))
+    assert policy.delay(0, retry_after='7') == 7.0
+
+
+@pytest.mark.parametrize('status', [404, ValueError('Expecting value')])
+def test_not_found_and_parse_errors_are_not_retried(dcf, clock, status):
+    data_acquisition = acquisition(dcf, [status])
+    assert data_acquisition._get_data_from_fmp('ACME') is None
+    assert len(data_acquisition.requests) == 1
+    assert clock.sleeps == []
+    assert data_acquisition.circuit_breakers['fmp'].state == 'closed'
+
+
+def test_breaker_counts_calls_not_attempts(dcf, clock):
+    data_acquisition = acquisition(dcf, [503], breaker_threshold=3, breaker_cooldown=300)
+    breaker = data_acquisition.circuit_breakers['fmp']
+
+    # One ticker's three attempts are one failure
+    assert data_acquisition._get_data_from_fmp('ACME', retry_count=3) is None
+    assert len(data_acquisition.requests) == 3
+    assert breaker.state == 'closed'
+
+    data_acquisition._get_data_from_fmp('ACME', retry_count=3)
+    data_acquisition._get_data_from_fmp('ACME', retry_count=3)
+    assert breaker.state == 'open'
+
+    # Skipped without a request while open
+    data_acquisition._get_data_from_fmp('ACME')
+    assert len(data_acquisition.requests) == 9
+
+
+def test_half_open_trial_is_not_retried(dcf, clock):
+    data_acquisition = acquisition(dcf, [503, 503, 503, 404], breaker_threshold=1, breaker_cooldown=300)
+    breaker = data_acquisition.circuit_breakers['fmp']
+    data_acquisition._get_data_from_fmp('ACME', retry_count=2)
+    assert breaker.state == 'open'
+
+    clock.advance(301)
+    data_acquisition._get_data_from_fmp('ACME', retry_count=2)
+    assert len(data_acquisition.requests) == 3
+    assert breaker.state == 'open'
+
+    # The next trial gets an answer (404), which closes the breaker
+    clock.advance(301)
+    data_acquisition._get_data_from_fmp('ACME', retry_count=2)
+    assert breaker.state == 'closed'
@@ -0,0 +1,58 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+# (final_year_fcf, short_term_growth, wacc, terminal_growth), covering the caps and the dampening
+SCENARIOS = [
+    (1.0e9, 0.06, 0.09, 0.025),      # Plain case
+    (5.0e8, 0.25, 0.10, 0.03),       # Short-term growth capped at WACC - 2%
+    (2.0e9, 0.05, 0.07, 0.065),      # Terminal growth too close to WACC, terminal value dampened to 75%
+    (3.0e9, 0.06, 0.055, 0.03),      # Low WACC caps short-term growth
+    (1.0e9, float('nan'), 0.085, 0.02),  # Missing growth defaults to 3%
+    (1.0e9, 0.04, float('nan'), 0.02),   # Missing WACC defaults to 9%
+    (-2.0e8, 0.03, 0.095, 0.02),     # Negative FCF, no dampening
+]
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('fcf, growth, wacc, terminal_growth', SCENARIOS)
+@pytest.mark.parametrize('years', [10, 5])
+def test_vectorized_kernel_matches_scalar_projection(dcf, fcf, growth, wacc, terminal_growth, years):
+    expected = dcf.calculate_dcf_projection(fcf, growth, wacc, terminal_growth, years, verbose=False)
+    actual = dcf.calculate_dcf_values_vectorized(fcf, growth, wacc, terminal_growth, years_projection=years)
+    assert float(actual) == pytest.approx(expected['total_dcf_value'], rel=1e-12)
+
+
+def test_batch_matches_scalar_terminal_value(dcf):
+    context = dcf.TerminalGrowthContext('ACME', market_cap=5e10, sector='Technology', industry='Software')
+    fcf, growth, wacc, _ = (np.array(values) for values in zip(*SCENARIOS))
+
+    batch = dcf.calculate_dcf_values_vectorized(fcf, growth, wacc, context.terminal_growth)
+    expected = [dcf.calculate_terminal_value(*scenario[:3], 'ACME', context=context)['total_dcf_value']
+                for scenario in SCENARIOS]
+    np.testing.assert_allclose(batch, expected, rtol=1e-12)
+
+
+def test_grid_broadcasts_like_nested_loops(dcf):
+    wacc = np.array([0.07, 0.09, 0.11])[:, None]
+    growth = np.array([0.02, 0.05, 0.08, 0.12])[None, :]
+    grid = dcf.calculate_dcf_values_vectorized(1.0e9, growth, wacc, 0.025)
+
+    assert grid.shape == (3, 4)
+    for i, discount in enumerate(wacc[:, 0]):
+        for j, rate in enumerate(growth[0]):
+            expected = dcf.calculate_dcf_projection(1.0e9, rate, discount, 0.025, verbose=False)['total_dcf_value']
+            assert grid[i, j] == pytest.approx(expected, rel=1e-12)
@@ -0,0 +1,132 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+PERIODS = pd.to_datetime(['2023-12-31', '2022-12-31', '2021-12-31'])
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def cash_flow(scale=1.0):
+    """yfinance-shaped annual cash flow statement, latest period first"""
+    return pd.DataFrame([[300.0, 200.0, 100.0], [-30.0, -20.0, -10.0], [90.0, 80.0, 70.0]],
+                        index=['Operating Cash Flow', 'Capital Expenditure', 'Net Income'],
+                        columns=PERIODS) * scale
+
+
+def income():
+    return pd.DataFrame([[1000.0, 900.0, 800.0], [95.0, 85.0, 75.0]],
+                        index=['Total Revenue', 'Net Income'], columns=PERIODS)
+
+
+def test_ingest_then_values(dcf, tmp_path):
+    store = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.pkl'))
+    assert store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow()) == 9
+    # A later ingest of the same keys replaces the earlier rows
+    store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow(2.0))
+
+    periods, values = store.values('ACME', 'Operating Cash Flow')
+    assert list(periods) == sorted(PERIODS)
+    np.testing.assert_array_equal(values, [200.0, 400.0, 600.0])
+
+    empty_periods, empty_values = store.values('ACME', 'Free Cash Flow')
+    assert len(empty_periods) == 0 and len(empty_values) == 0
+
+
+def test_values_follow_source_and_statement_priority(dcf, tmp_path):
+    store = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.pkl'))
+    store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow())
+    store.ingest_statement('ACME', 'income', 'annual', income())
+    store.ingest_statement('ACME', 'income', 'annual', income() * 1.1, source='SEC EDGAR')
+
+    # SEC EDGAR outranks Yahoo Finance unless a source is asked for
+    np.testing.assert_allclose(store.values('ACME', 'Total Revenue')[1], [880.0, 990.0, 1100.0])
+    np.testing.assert_allclose(store.values('ACME', 'Total Revenue', source='Yahoo Finance')[1],
+                               [800.0, 900.0, 1000.0])
+
+    # A line item in two statements is read from one of them, not both
+    periods, values = store.values('ACME', 'Net Income', source='Yahoo Finance')
+    assert len(periods) == 3
+    np.testing.assert_array_equal(values, [75.0, 85.0, 95.0])
+    np.testing.assert_array_equal(
+        store.values('ACME', 'Net Income', source='Yahoo Finance', statement='cashflow')[1], [70.0, 80.0, 90.0])
+
+
+def test_statement_rebuilds_the_ingested_frame(dcf, tmp_path):
+    store = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.pkl'))
+    original = cash_flow()
+    store.ingest_statement('ACME', 'cashflow', 'annual', original)
+    store.ingest_statement('ACME', 'income', 'annual', income())
+    store.ingest_statement('OTHER', 'cashflow', 'annual', cash_flow(3.0))
+
+    rebuilt = store.statement('ACME', 'cashflow')
+    pd.testing.assert_frame_equal(rebuilt.loc[original.index], original, check_freq=False, check_index_type=False)
+    assert store.statement('ACME', 'cashflow', 'quarterly') is None
+    assert store.statement('ACME', 'cashflow', source='SEC EDGAR') is None
+    assert store.statement('ACME', 'cashflow', max_age=-1) is None
+
+
+def test_invalidate_by_ticker_cik_and_source(dcf, tmp_path):
+    store = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.pkl'))
+    store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow())
+    store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow(), source='SEC EDGAR', cik='0000000042')
+    store.ingest_statement('OTHER', 'cashflow', 'annual', cash_flow())
+    store.ingest_statement('THIRD', 'income', 'annual', income(), source='SEC EDGAR', cik='0000000099')
+
+    store.invalidate(ticker='ACME', sources=['Yahoo Finance'])
+    assert store.statement('ACME', 'cashflow') is None
+    assert store.statement('ACME', 'cashflow', source='SEC EDGAR') is not None
+
+    store.invalidate(cik=42)
+    assert store.statement('ACME', 'cashflow', source='SEC EDGAR') is None
+    assert store.ticker_for_cik('0000000099') == 'THIRD'
+
+    store.invalidate(ticker='OTHER')
+    assert store.statement('OTHER', 'cashflow') is None
+    assert store.statement('THIRD', 'income', source='SEC EDGAR') is not None
+
+
+def test_save_and_reload(dcf, tmp_path):
+    store = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.pkl'))
+    store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow())
+    store.record_filing('42', 'A-1', '10-K', '2024-02-01')
+    store.save()
+
+    reloaded = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.pkl'))
+    pd.testing.assert_frame_equal(reloaded.statement('ACME', 'cashflow'), store.statement('ACME', 'cashflow'))
+    assert reloaded.last_filing('0000000042') == {'accession': 'A-1', 'form': '10-K', 'filed': '2024-02-01'}
+
+
+def test_default_path_falls_back_to_pickle_without_pyarrow(dcf, tmp_path, monkeypatch):
+    monkeypatch.setattr(dcf, 'pyarrow', None)
+    monkeypatch.setattr(dcf, 'DEFAULT_CACHE_DIR', str(tmp_path))
+    store = dcf.FundamentalsStore()
+    assert store.path == os.path.join(str(tmp_path), 'fundamentals.pkl')
+
+    store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow())
+    store.save()
+    np.testing.assert_array_equal(dcf.FundamentalsStore().values('ACME', 'Operating Cash Flow')[1],
+                                  [100.0, 200.0, 300.0])
+
+
+def test_parquet_round_trip(dcf, tmp_path):
+    pytest.importorskip('pyarrow')
+    store = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.parquet'))
+    store.ingest_statement('ACME', 'cashflow', 'annual', cash_flow())
+    store.save()
+
+    reloaded = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.parquet'))
+    pd.testing.assert_frame_equal(reloaded.statement('ACME', 'cashflow'), store.statement('ACME', 'cashflow'))
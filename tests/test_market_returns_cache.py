@@ -0,0 +1,46 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_market_closes_round_trip_across_dst(dcf, tmp_path, monkeypatch):
+    # Two years of New York closes span several DST changes (-05:00 and -04:00)
+    index = pd.date_range('2023-01-03', periods=500, freq='B', tz='America/New_York')
+    closes = pd.Series(np.linspace(3800.0, 5200.0, len(index)), index=index, name='Close')
+    monkeypatch.setattr(dcf, 'recorded_call', lambda key, func: pd.DataFrame({'Close': closes}))
+
+    cache_path = str(tmp_path / 'market_closes.csv')
+    downloaded = dcf.MarketReturnsCache(cache_path=cache_path).returns()
+
+    # A second cache instance is served from the file written by the first
+    monkeypatch.setattr(dcf, 'recorded_call', lambda key, func: pytest.fail('cache file not used'))
+    reloaded = dcf.MarketReturnsCache(cache_path=cache_path).returns()
+
+    assert len(reloaded) == len(closes) - 1
+    pd.testing.assert_series_equal(reloaded, downloaded, check_names=False, check_freq=False)
+
+
+def test_mixed_offset_cache_file_is_read(dcf, tmp_path):
+    # Files written before offsets were dropped mix -05:00 and -04:00
+    cache_path = tmp_path / 'market_closes.csv'
+    cache_path.write_text('Date,Close\n'
+                          '2024-03-08 00:00:00-05:00,5100.0\n'
+                          '2024-03-11 00:00:00-04:00,5110.0\n'
+                          '2024-03-12 00:00:00-04:00,5120.0\n')
+    returns = dcf.MarketReturnsCache(cache_path=str(cache_path)).returns()
+    assert list(returns.index) == [pd.Timestamp('2024-03-11'), pd.Timestamp('2024-03-12')]
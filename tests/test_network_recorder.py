@@ -0,0 +1,63 @@
+import importlib.util
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def offline(*args, **kwargs):
+    raise AssertionError('replay reached the network')
+
+
+def test_record_then_replay(dcf, tmp_path, monkeypatch):
+    archive_path = str(tmp_path / 'fixtures.zip')
+    closes = pd.DataFrame({'Close': [101.0, 102.5]}, index=pd.to_datetime(['2024-01-02', '2024-01-03']))
+    url = 'https://financialmodelingprep.com/api/v3/profile/ACME?apikey=SECRET'
+
+    recorder = dcf.NetworkRecorder(archive_path, mode='record')
+    monkeypatch.setattr(dcf, '_network_recorder', recorder)
+    assert dcf.recorded_call(('yf.history', 'ACME'), lambda: closes) is closes
+    with pytest.raises(KeyError):
+        dcf.recorded_call(('yf.info', 'GONE'), lambda: {}['beta'])
+    response = recorder.http_get(url, lambda: dcf.StoredResponse(200, b'[{"price": 5}]',
+                                                                 {'Content-Type': 'application/json'}))
+    assert response.status_code == 200
+    recorder.save()
+
+    # The API key is not written to the archive
+    with zipfile.ZipFile(archive_path) as archive:
+        assert all(b'SECRET' not in archive.read(name) for name in archive.namelist())
+
+    replayer = dcf.NetworkRecorder(archive_path, mode='replay')
+    monkeypatch.setattr(dcf, '_network_recorder', replayer)
+    pd.testing.assert_frame_equal(dcf.recorded_call(('yf.history', 'ACME'), offline), closes)
+    # Recorded failures are raised again
+    with pytest.raises(KeyError):
+        dcf.recorded_call(('yf.info', 'GONE'), offline)
+    # Replayed with a placeholder key
+    replayed = replayer.http_get(url.replace('SECRET', 'placeholder'), offline)
+    assert (replayed.status_code, replayed.json()) == (200, [{'price': 5}])
+
+
+def test_unrecorded_call_fails_in_replay(dcf, tmp_path, monkeypatch):
+    archive_path = str(tmp_path / 'fixtures.zip')
+    dcf.NetworkRecorder(archive_path, mode='record').save()
+
+    monkeypatch.setattr(dcf, '_network_recorder', dcf.NetworkRecorder(archive_path, mode='replay'))
+    with pytest.raises(dcf.ReplayMissError):
+        dcf.recorded_call(('yf.history', 'NEVER'), offline)
+    with pytest.raises(dcf.ReplayMissError):
+        dcf.get_network_recorder().http_get('https://data.sec.gov/submissions/CIK0000000042.json', offline)
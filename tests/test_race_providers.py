@@ -0,0 +1,94 @@
+import importlib.util
+import os
+import threading
+import time
+
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+HEDGE_DELAY = 0.2
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def result(source):
+    return {'free_cash_flow': 1.0, 'shares_outstanding': 10.0, 'current_price': 5.0, 'data_source': source}
+
+
+def acquisition(dcf, hedge_grace):
+    """FMP (preferred) and Yahoo Finance, raced; FMP's bucket allows one request a second"""
+    return dcf.FinancialDataAcquisition(
+        fmp_api_key='test', use_sec_edgar=False, use_http_cache=False, race_providers=True,
+        hedge_delay=HEDGE_DELAY, hedge_grace=hedge_grace, ticker_index=object(),
+        session_pool=dcf.HTTPSessionPool(), rate_limiter=dcf.RateLimiter({'fmp': (1, 1)}))
+
+
+def slow_fmp(dcf, data_acquisition, answer_after, outcome):
+    """FMP stub making rate-limited requests until answer_after seconds have passed"""
+    def fetch(ticker, retry_count=3):
+        outcome['fmp_started'] = time.monotonic()
+        try:
+            while time.monotonic() - outcome['fmp_started'] < answer_after:
+                data_acquisition.rate_limiter.acquire('fmp')
+                time.sleep(0.01)
+        except dcf.ProviderCallCancelled:
+            outcome['fmp_cancelled'].set()
+            raise
+        return result('Financial Modeling Prep')
+    return fetch
+
+
+def fast_yahoo(outcome):
+    def fetch(ticker, retry_count=3):
+        outcome['yahoo_started'] = time.monotonic()
+        return result('Yahoo Finance')
+    return fetch
+
+
+def race(dcf, answer_after, hedge_grace):
+    data_acquisition = acquisition(dcf, hedge_grace)
+    outcome = {'fmp_cancelled': threading.Event()}
+    data_acquisition._get_data_from_fmp = slow_fmp(dcf, data_acquisition, answer_after, outcome)
+    data_acquisition._get_data_from_yahoo = fast_yahoo(outcome)
+
+    started = time.monotonic()
+    data = data_acquisition._race_providers('ACME', None)
+    outcome['elapsed'] = time.monotonic() - started
+    outcome['started'] = started
+    return data, outcome
+
+
+def test_hedge_starts_after_delay_and_loser_is_cancelled(dcf):
+    data, outcome = race(dcf, answer_after=5.0, hedge_grace=0.1)
+
+    assert data['data_source'] == 'Yahoo Finance'
+    assert outcome['yahoo_started'] - outcome['started'] >= HEDGE_DELAY
+    assert outcome['elapsed'] < 1.0
+    # The slow provider stops at its next rate-limited request instead of running on
+    assert outcome['fmp_cancelled'].wait(2.0)
+
+
+def test_preferred_provider_answering_within_grace_wins(dcf):
+    data, outcome = race(dcf, answer_after=HEDGE_DELAY + 0.1, hedge_grace=1.0)
+
+    assert data['data_source'] == 'Financial Modeling Prep'
+    assert 'yahoo_started' in outcome
+    assert outcome['elapsed'] < HEDGE_DELAY + 1.0
+    assert not outcome['fmp_cancelled'].is_set()
+
+
+def test_preferred_result_without_hedging(dcf):
+    data, outcome = race(dcf, answer_after=0.0, hedge_grace=1.0)
+
+    assert data['data_source'] == 'Financial Modeling Prep'
+    assert 'yahoo_started' not in outcome
+    assert outcome['elapsed'] < HEDGE_DELAY
@@ -0,0 +1,127 @@
+import importlib.util
+import json
+import os
+
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+CIK = '0000000042'
+TICKER = 'ACME'
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TickerIndex:
+    def ticker_for_cik(self, cik):
+        return TICKER if cik == CIK else None
+
+
+def response(dcf, status_code, payload=None):
+    return dcf.StoredResponse(status_code, json.dumps(payload or {}).encode())
+
+
+def submissions(*filings):
+    """Submissions document listing (accession, form, filed) tuples, newest first"""
+    accessions, forms, dates = zip(*filings)
+    return {'filings': {'recent': {'accessionNumber': list(accessions), 'form': list(forms),
+                                   'filingDate': list(dates)}}}
+
+
+def company_facts():
+    # FY2022 annual operating cash flow from the 10-K already ingested, Q1 2023 from a new 10-Q
+    cash_flow = [
+        {'start': '2022-01-01', 'end': '2022-12-31', 'val': 400.0, 'fy': 2022, 'fp': 'FY',
+         'form': '10-K', 'filed': '2023-02-01', 'accn': 'A-2'},
+        {'start': '2023-01-01', 'end': '2023-03-31', 'val': 110.0, 'fy': 2023, 'fp': 'Q1',
+         'form': '10-Q', 'filed': '2023-05-01', 'accn': 'A-3'},
+    ]
+    return {'facts': {'us-gaap': {'NetCashProvidedByUsedInOperatingActivities': {'units': {'USD': cash_flow}}}}}
+
+
+@pytest.fixture
+def store(dcf, tmp_path, monkeypatch):
+    store = dcf.FundamentalsStore(path=str(tmp_path / 'fundamentals.pkl'))
+    monkeypatch.setattr(dcf, '_fundamentals_store', store)
+    monkeypatch.setattr(dcf, '_fundamentals_store_enabled', True)
+    monkeypatch.setattr(dcf, '_ttm_engine', dcf.TTMEngine())
+    # Yahoo rows stored without a CIK, as the Yahoo provider does
+    store.ingest_statement(TICKER, 'cashflow', 'annual',
+                           pd.DataFrame({pd.Timestamp('2022-12-31'): [390.0]}, index=['Operating Cash Flow']))
+    store.record_filing(CIK, 'A-2', '10-K', '2023-02-01')
+    return store
+
+
+def acquisition(dcf, submissions_document, facts_response):
+    data_acquisition = dcf.FinancialDataAcquisition(
+        use_http_cache=False, use_sec_edgar=True, ticker_index=TickerIndex(),
+        session_pool=dcf.HTTPSessionPool(), rate_limiter=dcf.RateLimiter())
+    data_acquisition.facts_requests = []
+    data_acquisition._http_get = lambda url, **kwargs: response(dcf, 200, submissions_document)
+
+    def sec_get(url):
+        data_acquisition.facts_requests.append(url)
+        return facts_response
+    data_acquisition._sec_get = sec_get
+    return data_acquisition
+
+
+def test_only_filings_newer_than_the_last_one_are_parsed(dcf, store):
+    data_acquisition = acquisition(
+        dcf, submissions(('A-3', '10-Q', '2023-05-01'), ('A-2', '10-K', '2023-02-01'), ('A-1', '10-K', '2022-02-01')),
+        response(dcf, 200, company_facts()))
+
+    assert data_acquisition._new_filings(CIK, store, data_acquisition.REFRESH_FORMS) == [
+        {'accession': 'A-3', 'form': '10-Q', 'filed': '2023-05-01'}]
+    assert data_acquisition.refresh_fundamentals([42]) == [CIK]
+    assert store.last_filing(CIK)['accession'] == 'A-3'
+
+    # The quarter from the new 10-Q is stored; the 10-K year ingested earlier is not parsed again
+    periods, values = store.values(TICKER, 'Operating Cash Flow', 'quarterly', source='SEC EDGAR')
+    assert list(periods) == [pd.Timestamp('2023-03-31')] and list(values) == [110.0]
+    assert not len(store.values(TICKER, 'Operating Cash Flow', source='SEC EDGAR')[0])
+    # Statements from other providers predate the new filing
+    assert store.statement(TICKER, 'cashflow') is None
+
+
+def test_unchanged_company_is_not_invalidated(dcf, store):
+    data_acquisition = acquisition(dcf, submissions(('A-2', '10-K', '2023-02-01'), ('A-1', '10-K', '2022-02-01')),
+                                   response(dcf, 200, company_facts()))
+
+    assert data_acquisition.refresh_fundamentals([CIK]) == []
+    assert data_acquisition.facts_requests == []
+    assert store.statement(TICKER, 'cashflow') is not None
+    assert store.last_filing(CIK)['accession'] == 'A-2'
+
+
+def test_failed_company_facts_fetch_is_retried_next_time(dcf, store):
+    # SEC throttles with 403, which is not retried
+    data_acquisition = acquisition(dcf, submissions(('A-3', '10-Q', '2023-05-01'), ('A-2', '10-K', '2023-02-01')),
+                                   response(dcf, 403))
+
+    assert data_acquisition.refresh_fundamentals([CIK]) == []
+    assert len(data_acquisition.facts_requests) == 1
+    assert store.last_filing(CIK)['accession'] == 'A-2'
+    assert store.statement(TICKER, 'cashflow') is not None
+
+    # The next refresh still sees the filing as new
+    assert [filing['accession'] for filing in
+            data_acquisition._new_filings(CIK, store, data_acquisition.REFRESH_FORMS)] == ['A-3']
+
+
+def test_company_without_ticker_is_left_as_is(dcf, store):
+    data_acquisition = acquisition(dcf, submissions(('B-2', '10-K', '2023-03-01'), ('B-1', '10-K', '2022-03-01')),
+                                   response(dcf, 200, company_facts()))
+
+    assert data_acquisition.refresh_fundamentals(['77']) == []
+    assert data_acquisition.facts_requests == []
+    assert store.last_filing('77') is None
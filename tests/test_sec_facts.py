@@ -0,0 +1,69 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def annual(year, val, fy, filed, form='10-K', accn=None):
+    """Full-year fact for calendar `year`, reported in the filing for fiscal year `fy`"""
+    return {'start': f'{year}-01-01', 'end': f'{year}-12-31', 'val': val, 'fy': fy, 'fp': 'FY',
+            'form': form, 'filed': filed, 'accn': accn or f'{form}-{filed}'}
+
+
+def test_amendment_replaces_the_original_filing(dcf):
+    facts = dcf.SECFactFrame([
+        annual(2022, 100.0, 2022, '2023-02-10'),
+        annual(2022, 105.0, 2022, '2023-06-01', form='10-K/A'),
+    ])
+    assert len(facts) == 1
+    assert facts.value_at('2022-12-31') == 105.0
+
+
+def test_restated_comparatives_keep_every_year(dcf):
+    # Each 10-K repeats the two prior years as comparatives, tagged with its own fiscal year
+    facts = dcf.SECFactFrame([
+        annual(2020, 80.0, 2020, '2021-02-10'),
+        annual(2021, 90.0, 2021, '2022-02-10'),
+        annual(2020, 80.0, 2021, '2022-02-10'),
+        annual(2022, 100.0, 2022, '2023-02-10'),
+        annual(2021, 92.0, 2022, '2023-02-10'),
+        annual(2020, 81.0, 2022, '2023-02-10'),
+        annual(2023, 110.0, 2023, '2024-02-10'),
+        annual(2022, 101.0, 2023, '2024-02-10'),
+        annual(2021, 93.0, 2023, '2024-02-10'),
+    ])
+    # One value per year, the latest filed, and no year crowded out by the restatements
+    assert facts.history(5) == [110.0, 101.0, 93.0, 81.0]
+    assert facts.latest() == 110.0
+
+
+def test_quarter_durations_inside_a_10k_are_dropped(dcf):
+    fourth_quarter = {'start': '2022-10-01', 'end': '2022-12-31', 'val': 30.0, 'fy': 2022, 'fp': 'FY',
+                      'form': '10-K', 'filed': '2023-02-10', 'accn': 'K-2022'}
+    facts = dcf.SECFactFrame([annual(2022, 100.0, 2022, '2023-02-10', accn='K-2022'), fourth_quarter])
+    assert facts.history() == [100.0]
+
+
+def test_cash_flow_and_capex_align_on_period_end(dcf):
+    cash_flow = dcf.SECFactFrame([annual(year, 100.0 + year % 10, year, f'{year + 1}-02-10')
+                                  for year in (2020, 2021, 2022, 2023)])
+    # Capex is missing 2021, so position 1 of each list belongs to different years
+    capex = dcf.SECFactFrame([annual(year, 10.0 + year % 10, year, f'{year + 1}-02-10')
+                              for year in (2020, 2022, 2023)])
+
+    aligned = dcf.align_sec_facts(cash_flow=cash_flow, capex=capex)
+    assert list(aligned.index) == list(pd.to_datetime(['2020-12-31', '2022-12-31', '2023-12-31']))
+    assert list(aligned['cash_flow'] - aligned['capex']) == [90.0, 90.0, 90.0]
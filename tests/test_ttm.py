@@ -0,0 +1,97 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main_3.7.py')
+
+QUARTER_ENDS = ['2022-03-31', '2022-06-30', '2022-09-30', '2022-12-31', '2023-03-31', '2023-06-30']
+
+
+@pytest.fixture(scope='module')
+def dcf():
+    for dependency in ('yfinance', 'sec_api', 'pandas_datareader', 'scipy', 'matplotlib'):
+        pytest.importorskip(dependency)
+    spec = importlib.util.spec_from_file_location('dcf_main', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fact(start, end, val, fp, form, filed):
+    return {'start': start, 'end': end, 'val': val, 'fy': 2022, 'fp': fp, 'form': form,
+            'filed': filed, 'accn': f'{form}-{filed}'}
+
+
+def test_fourth_quarter_is_full_year_minus_nine_months(dcf):
+    # 10-Q cash flows are year-to-date; the 10-K holds the full year
+    quarters = dcf.sec_quarterly_values([
+        fact('2022-01-01', '2022-03-31', 100.0, 'Q1', '10-Q', '2022-05-01'),
+        fact('2022-01-01', '2022-06-30', 210.0, 'Q2', '10-Q', '2022-08-01'),
+        fact('2022-01-01', '2022-09-30', 330.0, 'Q3', '10-Q', '2022-11-01'),
+        fact('2022-01-01', '2022-12-31', 480.0, 'FY', '10-K', '2023-02-10'),
+    ])
+    assert list(quarters.index) == list(pd.to_datetime(QUARTER_ENDS[:4]))
+    assert list(quarters) == [100.0, 110.0, 120.0, 150.0]
+
+
+def test_reported_quarter_wins_over_derived_one(dcf):
+    quarters = dcf.sec_quarterly_values([
+        fact('2022-01-01', '2022-03-31', 100.0, 'Q1', '10-Q', '2022-05-01'),
+        fact('2022-01-01', '2022-06-30', 210.0, 'Q2', '10-Q', '2022-08-01'),
+        fact('2022-04-01', '2022-06-30', 111.0, 'Q2', '10-Q', '2022-08-01'),
+    ])
+    assert quarters[pd.Timestamp('2022-06-30')] == 111.0
+
+
+def test_window_rolls_four_quarters(dcf):
+    window = dcf.TTMWindow()
+    for period_end, value in zip(QUARTER_ENDS[:3], (1.0, 2.0, 3.0)):
+        window.add(period_end, value)
+    assert window.value is None
+
+    window.add(QUARTER_ENDS[3], 4.0)
+    assert window.value == 10.0
+    window.add(QUARTER_ENDS[4], 5.0)
+    assert (window.period_end, window.value) == (pd.Timestamp(QUARTER_ENDS[4]), 14.0)
+
+
+def test_restatement_in_place_keeps_the_sum_right(dcf):
+    window = dcf.TTMWindow()
+    for period_end, value in zip(QUARTER_ENDS[:5], (1.0, 2.0, 3.0, 4.0, 5.0)):
+        window.add(period_end, value)
+
+    window.add(QUARTER_ENDS[2], 30.0)
+    assert window.value == 2.0 + 30.0 + 4.0 + 5.0 == sum(value for _, value in window.quarters)
+    # A quarter that already rolled out of the window is ignored
+    window.add(QUARTER_ENDS[0], 100.0)
+    assert window.value == 41.0
+
+
+def test_missing_quarter_starts_a_new_window(dcf):
+    window = dcf.TTMWindow()
+    for period_end, value in zip(QUARTER_ENDS[:4], (1.0, 2.0, 3.0, 4.0)):
+        window.add(period_end, value)
+    assert window.value == 10.0
+
+    # 2023-03-31 is missing
+    window.add(QUARTER_ENDS[5], 6.0)
+    assert window.value is None
+    assert list(window.quarters) == [(pd.Timestamp(QUARTER_ENDS[5]), 6.0)]
+
+    window.add(QUARTER_ENDS[4], None)
+    assert len(window.quarters) == 0
+
+
+def test_engine_free_cash_flow_needs_matching_windows(dcf, monkeypatch):
+    engine = dcf.TTMEngine()
+    monkeypatch.setattr(dcf, '_ttm_engine', engine)
+    operating = pd.Series([100.0, 110.0, 120.0, 130.0, 140.0], index=pd.to_datetime(QUARTER_ENDS[:5]))
+    engine.load('ACME', 'Operating Cash Flow', operating)
+    engine.load('ACME', 'Capital Expenditure', -operating.iloc[:4] / 10)
+    # Windows ending on different quarters are not combined
+    assert dcf.ttm_free_cash_flow('ACME') is None
+
+    assert engine.update('ACME', 'Capital Expenditure', QUARTER_ENDS[4], -14.0) == -50.0
+    assert dcf.ttm_free_cash_flow('ACME') == (pd.Timestamp(QUARTER_ENDS[4]), 500.0 - 50.0)